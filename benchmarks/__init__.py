@@ -0,0 +1 @@
+"""Benchmarks and fixtures for mfdl hot paths."""
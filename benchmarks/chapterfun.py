@@ -0,0 +1,89 @@
+"""Generated ``chapterfun.ashx`` payloads and the original unpacker, for parity checks."""
+
+from __future__ import annotations
+
+import re
+from collections import Counter
+
+from mfdl import packer_token
+
+DEFAULT_PIX = "//zjcdn.mangafox.me/store/manga/12345/01-001.0/compressed"
+
+
+def chapterfun_source(pages: int = 2, start: int = 1, pix: str = DEFAULT_PIX) -> str:
+    """Return the unpacked JavaScript a ``chapterfun.ashx`` response evaluates."""
+    values = ",".join(
+        f'"/q{page:03d}.jpg?token=a{page}b7c9e2&ttl=1700000000"'
+        for page in range(start, start + pages)
+    )
+    return (
+        "function dm5imagefun(){var cid=398501;var key='8f1c0b2a';"
+        f'var pix="{pix}";'
+        f"var pvalue=[{values}];"
+        "for(var i=0;i<pvalue.length;i++){if(pvalue[i].indexOf('//')==0)"
+        "{pvalue[i]='https:'+pvalue[i]}else{pvalue[i]=pix+pvalue[i]}}return pvalue}"
+        "var d;d=dm5imagefun();"
+    )
+
+
+def pack(source: str, base: int = 36) -> str:
+    """Pack ``source`` the way Dean Edwards' p.a.c.k.e.r does (bases up to 36)."""
+    counts = Counter(re.findall(r"\b\w+\b", source))
+    words = [word for word, _count in counts.most_common()]
+    index = {word: position for position, word in enumerate(words)}
+    packed = re.sub(r"\b\w+\b", lambda match: packer_token(index[match.group(0)], base), source)
+    packed = packed.replace("\\", "\\\\").replace("'", "\\'")
+    keywords = "|".join(
+        "" if word == packer_token(position, base) else word for position, word in enumerate(words)
+    )
+    return (
+        "eval(function(p,a,c,k,e,d){e=function(c){return c.toString(36)};"
+        "if(!''.replace(/^/,String)){while(c--)d[c.toString(a)]=k[c]||c.toString(a);"
+        "k=[function(e){return d[e]}];e=function(){return'\\\\w+'};c=1;};"
+        "while(c--)if(k[c])p=p.replace(new RegExp('\\\\b'+e(c)+'\\\\b','g'),k[c]);return p;}"
+        f"('{packed}',{base},{len(words)},'{keywords}'.split('|'),0,{{}}))"
+    )
+
+
+def legacy_unpack_eval_packer(source: str) -> str:
+    """The unpacker as it was before the lookup table and fast path."""
+    match = re.search(r"\}\('(.*)',(\d+),(\d+),'(.*)'\.split\('\|'\),0,\{\}\)\)", source, re.S)
+    if match is None:
+        raise SystemExit("Error: Unable to parse chapter image payload")
+
+    payload, base, _count, symbols = match.groups()
+    base_int = int(base)
+    words = symbols.split("|")
+    payload = payload.replace("\\'", "'").replace("\\\\", "\\")
+
+    def replace_token(token_match: re.Match[str]) -> str:
+        token = token_match.group(0)
+        try:
+            index = int(token, base_int if base_int <= 36 else 36)
+        except ValueError:
+            return token
+        if index < len(words) and words[index]:
+            return words[index]
+        return token
+
+    return re.sub(r"\b\w+\b", replace_token, payload)
+
+
+def legacy_parse_chapterfun_payload(payload: str) -> list[str]:
+    unpacked = legacy_unpack_eval_packer(payload)
+    base_match = re.search(r'var\s+pix\s*=\s*"([^"]+)";', unpacked)
+    values_match = re.search(r"var\s+pvalue\s*=\s*\[(.*?)\];", unpacked, re.S)
+    if base_match is None or values_match is None:
+        return []
+    base_path = base_match.group(1)
+    image_urls: list[str] = []
+    for value in re.findall(r'"([^"]+)"', values_match.group(1)):
+        if value.startswith("http://") or value.startswith("https://"):
+            image_urls.append(value)
+        elif value.startswith("//"):
+            image_urls.append(f"https:{value}")
+        elif value.startswith("/"):
+            image_urls.append(f"{base_path}{value}")
+        else:
+            image_urls.append(value)
+    return image_urls
@@ -0,0 +1,354 @@
+"""A local stand-in for Fanfox: series pages, chapter pages, ``chapterfun.ashx`` and a CDN.
+
+``FakeFanfox`` serves two hosts from ``ThreadingHTTPServer``s on loopback ports,
+the site (``URL_BASE`` and ``DESKTOP_URL_BASE``) and the image CDN, and counts
+the requests and bytes each one served. A ``FaultConfig`` makes the CDN fail
+some image requests. ``patched_site`` points ``mfdl`` at it.
+"""
+
+from __future__ import annotations
+
+import http.server
+import random
+import re
+import socket
+import struct
+import threading
+import time
+import urllib.parse
+from collections import Counter
+from collections.abc import Generator
+from contextlib import contextmanager
+
+import mfdl
+from benchmarks.chapterfun import chapterfun_source, pack
+
+SERIES_PATTERN = re.compile(r"^/manga/(?P<slug>[\w-]+)/$")
+CHAPTER_PATTERN = re.compile(r"^/manga/(?P<slug>[\w-]+)/c(?P<chapter>\d+)/(?P<page>\d+)\.html$")
+IMAGE_PATTERN = re.compile(r"^/store/(?P<slug>[\w-]+)/c(?P<chapter>\d+)/q(?P<page>\d+)\.jpg$")
+CHAPTERFUN_VALUES = 2
+
+
+class FakeFanfoxConfig:
+    """Shape of the fake series and how slowly the fake hosts answer.
+
+    ``mode`` picks which chapters need the desktop ``chapterfun.ashx`` flow:
+    ``mobile`` (none), ``desktop`` (all) or ``mixed`` (every other chapter).
+    ``latency`` is added before every response and ``bandwidth`` (bytes per
+    second, per response) paces response bodies.
+    """
+
+    def __init__(
+        self,
+        chapters: int = 4,
+        pages: int = 10,
+        image_size: int = 200_000,
+        latency: float = 0.0,
+        bandwidth: float | None = None,
+        mode: str = "mixed",
+    ) -> None:
+        if mode not in ("mobile", "desktop", "mixed"):
+            raise ValueError(f"unknown mode: {mode}")
+        self.chapters = chapters
+        self.pages = pages
+        self.image_size = image_size
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.mode = mode
+
+    def is_desktop(self, chapter: int) -> bool:
+        return self.mode == "desktop" or (self.mode == "mixed" and chapter % 2 == 0)
+
+
+class FaultConfig:
+    """How often image (CDN) responses fail, and how.
+
+    Each ``rate_*`` is the probability that an image request gets that fault:
+    a 429 with ``Retry-After: retry_after``, the first of ``burst_503``
+    consecutive 503s, a body dripped at ``slow_bandwidth`` bytes per second, a
+    body cut off halfway, an HTML page instead of an image, or a connection
+    reset before any response. Faults are drawn from a generator seeded with
+    ``seed``, so runs are repeatable.
+    """
+
+    def __init__(
+        self,
+        rate_429: float = 0.0,
+        retry_after: int = 1,
+        rate_503: float = 0.0,
+        burst_503: int = 3,
+        rate_slow: float = 0.0,
+        slow_bandwidth: float = 32 * 1024,
+        rate_truncate: float = 0.0,
+        rate_wrong_type: float = 0.0,
+        rate_reset: float = 0.0,
+        seed: int = 0,
+    ) -> None:
+        self.rates = {
+            "429": rate_429,
+            "503": rate_503,
+            "slow": rate_slow,
+            "truncate": rate_truncate,
+            "wrong_type": rate_wrong_type,
+            "reset": rate_reset,
+        }
+        if sum(self.rates.values()) > 1:
+            raise ValueError("fault rates must add up to at most 1")
+        self.retry_after = retry_after
+        self.burst_503 = burst_503
+        self.slow_bandwidth = slow_bandwidth
+        self.seed = seed
+
+
+class FaultInjector:
+    """Draws the fault, if any, for each image request."""
+
+    def __init__(self, config: FaultConfig) -> None:
+        self.config = config
+        self.injected: Counter[str] = Counter()
+        self._random = random.Random(config.seed)
+        self._burst_remaining = 0
+        self._lock = threading.Lock()
+
+    def draw(self) -> str | None:
+        with self._lock:
+            fault = None
+            if self._burst_remaining:
+                self._burst_remaining -= 1
+                fault = "503"
+            else:
+                roll = self._random.random()
+                for kind, rate in self.config.rates.items():
+                    if roll < rate:
+                        fault = kind
+                        break
+                    roll -= rate
+                if fault == "503":
+                    self._burst_remaining = self.config.burst_503 - 1
+            if fault is not None:
+                self.injected[fault] += 1
+            return fault
+
+
+class FakeFanfoxHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: FakeFanfoxHTTPServer
+
+    def do_GET(self) -> None:
+        site = self.server.site
+        path, _, query = self.path.partition("?")
+        routed = site.route(self.server.role, path, urllib.parse.parse_qs(query))
+        fault = None
+        if routed is not None and self.server.role == "cdn" and site.faults is not None:
+            fault = site.faults.draw()
+        if site.config.latency:
+            time.sleep(site.config.latency)
+        site.record(self.server.role, path)
+
+        if routed is None:
+            self.send_body(404, "text/plain", b"not found")
+        elif fault is None:
+            self.send_body(200, *routed)
+        elif fault == "reset":
+            # SO_LINGER with a zero timeout makes close() send a RST.
+            self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+            self.close_connection = True
+        elif fault == "429":
+            retry_after = {"Retry-After": str(site.faults.config.retry_after)}
+            self.send_body(429, "text/plain", b"Too Many Requests", retry_after)
+        elif fault == "503":
+            self.send_body(503, "text/plain", b"Service Unavailable")
+        elif fault == "wrong_type":
+            self.send_body(200, "text/html", b"<html><body>Please try again</body></html>")
+        elif fault == "slow":
+            self.send_body(200, *routed, bandwidth=site.faults.config.slow_bandwidth)
+        else:
+            content_type, body = routed
+            self.send_body(200, content_type, body, limit=len(body) // 2)
+            self.close_connection = True
+
+    def send_body(
+        self,
+        status: int,
+        content_type: str,
+        body: bytes,
+        headers: dict[str, str] | None = None,
+        bandwidth: float | None = None,
+        limit: int | None = None,
+    ) -> None:
+        """Send ``body``, paced at ``bandwidth`` and cut off after ``limit`` bytes if given."""
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        bandwidth = bandwidth or self.server.site.config.bandwidth
+        payload = body if limit is None else body[:limit]
+        # Counted up front: the client may finish reading before this thread resumes.
+        self.server.site.record_bytes(self.server.role, len(payload))
+        try:
+            if not bandwidth:
+                self.wfile.write(payload)
+            else:
+                for offset in range(0, len(payload), mfdl.CHUNK_SIZE):
+                    chunk = payload[offset : offset + mfdl.CHUNK_SIZE]
+                    self.wfile.write(chunk)
+                    time.sleep(len(chunk) / bandwidth)
+        except OSError:
+            self.close_connection = True
+
+    def log_message(self, *_args: object) -> None:
+        pass
+
+
+class FakeFanfoxHTTPServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, site: FakeFanfox, role: str) -> None:
+        super().__init__(("127.0.0.1", 0), FakeFanfoxHandler)
+        self.site = site
+        self.role = role
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/"
+
+
+class FakeFanfox:
+    """Context manager running the fake site and CDN for one series."""
+
+    def __init__(
+        self,
+        config: FakeFanfoxConfig | None = None,
+        manga_name: str = "Bench",
+        faults: FaultConfig | None = None,
+    ) -> None:
+        self.config = config or FakeFanfoxConfig()
+        self.faults = FaultInjector(faults) if faults is not None else None
+        self.manga_name = manga_name
+        self.slug = mfdl.manga_to_slug(manga_name)
+        self.requests: Counter[str] = Counter()
+        self.bytes_sent: Counter[str] = Counter()
+        self.image_paths: set[str] = set()
+        self._lock = threading.Lock()
+        self._servers = {role: FakeFanfoxHTTPServer(self, role) for role in ("site", "cdn")}
+        self._image = random.Random(self.config.image_size).randbytes(self.config.image_size)
+
+    @property
+    def site_url(self) -> str:
+        return self._servers["site"].base_url
+
+    @property
+    def cdn_url(self) -> str:
+        return self._servers["cdn"].base_url
+
+    @property
+    def images(self) -> int:
+        return self.config.chapters * self.config.pages
+
+    def __enter__(self) -> FakeFanfox:
+        for server in self._servers.values():
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *_exc_info: object) -> None:
+        for server in self._servers.values():
+            server.shutdown()
+            server.server_close()
+
+    def record(self, role: str, path: str) -> None:
+        kind = "chapterfun" if path.endswith("chapterfun.ashx") else role
+        if role == "site" and SERIES_PATTERN.match(path):
+            kind = "series"
+        elif role == "site" and CHAPTER_PATTERN.match(path):
+            kind = "page"
+        with self._lock:
+            self.requests[kind] += 1
+            if role == "cdn":
+                self.image_paths.add(path)
+
+    def record_bytes(self, role: str, size: int) -> None:
+        with self._lock:
+            self.bytes_sent[role] += size
+
+    def route(self, role: str, path: str, query: dict[str, list[str]]) -> tuple[str, bytes] | None:
+        if role == "cdn":
+            match = IMAGE_PATTERN.match(path)
+            if match is None or match["slug"] != self.slug:
+                return None
+            return "image/jpeg", self.image_body(path)
+        if path == "/chapterfun.ashx":
+            return self.chapterfun(query)
+        match = SERIES_PATTERN.match(path)
+        if match is not None and match["slug"] == self.slug:
+            return "text/html", self.series_page()
+        match = CHAPTER_PATTERN.match(path)
+        if match is None or match["slug"] != self.slug:
+            return None
+        chapter, page = int(match["chapter"]), int(match["page"])
+        if not 1 <= chapter <= self.config.chapters or not 1 <= page <= self.config.pages:
+            return None
+        if self.config.is_desktop(chapter):
+            return "text/html", self.desktop_chapter_page(chapter)
+        return "text/html", self.chapter_page(chapter, page)
+
+    def image_body(self, path: str) -> bytes:
+        """Return a distinct image per URL (so dedup cannot skew results) of the configured size."""
+        marker = path.encode()[: self.config.image_size]
+        return marker + self._image[len(marker) :]
+
+    def image_base(self, chapter: int) -> str:
+        return f"{self.cdn_url}store/{self.slug}/c{chapter:03d}"
+
+    def series_page(self) -> bytes:
+        links = "".join(
+            f'<li><a href="/manga/{self.slug}/c{chapter:03d}/1.html">Ch.{chapter:03d}</a></li>'
+            for chapter in range(self.config.chapters, 0, -1)
+        )
+        return f"<html><body><ul class='chlist'>{links}</ul></body></html>".encode()
+
+    def chapter_page(self, chapter: int, page: int) -> bytes:
+        options = "".join(
+            f"<option>{number}</option>" for number in range(1, self.config.pages + 1)
+        )
+        return (
+            "<html><body>"
+            f"<select class='mangaread-page'>{options}</select>"
+            f"<div id='viewer'><img src='{self.image_base(chapter)}/q{page:03d}.jpg'></div>"
+            "</body></html>"
+        ).encode()
+
+    def desktop_chapter_page(self, chapter: int) -> bytes:
+        return (
+            "<html><head><script>"
+            f"var chapterid={chapter};var imagecount={self.config.pages};"
+            "</script></head><body>"
+            f"<input type='hidden' id='dm5_key' value='key{chapter}'>"
+            "</body></html>"
+        ).encode()
+
+    def chapterfun(self, query: dict[str, list[str]]) -> tuple[str, bytes] | None:
+        try:
+            chapter = int(query["cid"][0])
+            page = int(query["page"][0])
+        except (KeyError, ValueError):
+            return None
+        if not 1 <= chapter <= self.config.chapters or not 1 <= page <= self.config.pages:
+            return None
+        values = min(CHAPTERFUN_VALUES, self.config.pages - page + 1)
+        source = chapterfun_source(values, start=page, pix=self.image_base(chapter))
+        return "application/javascript", pack(source).encode()
+
+
+@contextmanager
+def patched_site(site: FakeFanfox) -> Generator[None]:
+    """Point ``mfdl``'s hosts and connection pool at ``site`` and restore them afterwards."""
+    saved = mfdl.URL_BASE, mfdl.DESKTOP_URL_BASE, mfdl.HTTP_POOL
+    mfdl.URL_BASE = mfdl.DESKTOP_URL_BASE = site.site_url
+    mfdl.HTTP_POOL = mfdl.HTTPConnectionPool()
+    try:
+        yield
+    finally:
+        mfdl.HTTP_POOL.close()
+        mfdl.URL_BASE, mfdl.DESKTOP_URL_BASE, mfdl.HTTP_POOL = saved
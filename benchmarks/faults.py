@@ -0,0 +1,99 @@
+"""Retry behaviour of each profile against a fake Fanfox CDN that injects faults.
+
+Run with ``python -m benchmarks.faults``; the defaults mix every fault kind.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+from pathlib import Path
+from typing import Any
+
+import mfdl
+from benchmarks.fakefox import FaultConfig
+from benchmarks.throughput import add_server_arguments, current_commit, run_profile, server_config
+
+
+def format_results(results: list[dict[str, Any]]) -> str:
+    lines = [
+        f"{'profile':<11}{'engine':<8}{'images':>7}{'goodput MB/s':>13}{'wasted MB':>10}"
+        f"{'retries':>8}{'slept s':>9}{'total s':>9}"
+    ]
+    for result in results:
+        lines.append(
+            f"{result['profile']:<11}{result['engine']:<8}{result['images']:>7}"
+            f"{result['goodput_mb_per_second']:13.2f}{result['wasted_mb']:10.2f}"
+            f"{result['image_retries']:>8}{result['retry_sleep_seconds']:9.1f}"
+            f"{result['seconds']:9.1f}"
+        )
+    for result in results:
+        injected = ", ".join(f"{kind}: {count}" for kind, count in sorted(result["faults"].items()))
+        lines.append(f"{result['profile']}: injected {injected or 'nothing'}")
+        if result["failed"]:
+            lines.append(f"{result['profile']}: {result['failed']}")
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--profile",
+        action="append",
+        choices=sorted(mfdl.PROFILE_DEFAULTS),
+        help="profile to measure, repeatable (default: all)",
+    )
+    parser.add_argument("--engine", choices=["thread", "async"], default="thread")
+    parser.add_argument(
+        "--unpaced", action="store_true", help="disable the profiles' request rate limits"
+    )
+    add_server_arguments(parser)
+    faults = parser.add_argument_group("faults injected into image responses")
+    faults.add_argument("--rate-429", type=float, default=0.05, help="share answered with 429")
+    faults.add_argument("--retry-after", type=int, default=1, help="Retry-After sent with 429s")
+    faults.add_argument("--rate-503", type=float, default=0.02, help="share starting a 503 burst")
+    faults.add_argument("--burst-503", type=int, default=3, help="consecutive 503s per burst")
+    faults.add_argument("--rate-slow", type=float, default=0.05, help="share of slow-drip bodies")
+    faults.add_argument("--slow-kbps", type=float, default=64, help="KiB/s of slow-drip bodies")
+    faults.add_argument("--rate-truncate", type=float, default=0.03, help="share cut off halfway")
+    faults.add_argument(
+        "--rate-wrong-type", type=float, default=0.03, help="share answered with an HTML page"
+    )
+    faults.add_argument(
+        "--rate-reset", type=float, default=0.03, help="share reset before any response"
+    )
+    faults.add_argument("--seed", type=int, default=0, help="seed of the fault generator")
+    parser.add_argument("--json", type=Path, default=None, help="write results to this file")
+    parser.add_argument("--verbose", action="store_true", help="show download_manga output")
+    args = parser.parse_args(argv)
+
+    config = server_config(args)
+    fault_config = FaultConfig(
+        rate_429=args.rate_429,
+        retry_after=args.retry_after,
+        rate_503=args.rate_503,
+        burst_503=args.burst_503,
+        rate_slow=args.rate_slow,
+        slow_bandwidth=args.slow_kbps * 1024,
+        rate_truncate=args.rate_truncate,
+        rate_wrong_type=args.rate_wrong_type,
+        rate_reset=args.rate_reset,
+        seed=args.seed,
+    )
+    results = [
+        run_profile(profile, config, args.engine, args.unpaced, args.verbose, fault_config)
+        for profile in args.profile or mfdl.PROFILE_DEFAULTS
+    ]
+    print(format_results(results))
+    if args.json is not None:
+        report = {
+            "commit": current_commit(),
+            "config": vars(config),
+            "faults": vars(fault_config),
+            "results": results,
+        }
+        args.json.write_text(json.dumps(report, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
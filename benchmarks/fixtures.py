@@ -0,0 +1,95 @@
+"""Offline fixtures shaped like recorded Fanfox responses, generated deterministically."""
+
+from __future__ import annotations
+
+import random
+from collections import OrderedDict
+from pathlib import Path
+
+from benchmarks.chapterfun import chapterfun_source, pack
+
+SERIES_SLUG = "one_piece"
+SERIES_NAME = "One Piece"
+
+PAGE_HEAD = (
+    "<!DOCTYPE html><html><head><meta charset='utf-8'><title>{title}</title>"
+    "<link rel='stylesheet' href='//static.fanfox.net/v2/css/mobile.css'>"
+    "<script src='//static.fanfox.net/v2/js/jquery.min.js'></script>"
+    "<script>var _gaq=_gaq||[];_gaq.push(['_setAccount','UA-0000000-1']);</script>"
+    "</head><body><header><a href='/'>MangaFox</a><a href='/search'>Search</a>"
+    "<a href='/directory/'>Directory</a></header>"
+)
+PAGE_FOOT = (
+    "<footer><a href='/about'>About</a><a href='/privacy'>Privacy</a></footer>"
+    "<script>window.ads=[{id:1,slot:'top'},{id:2,slot:'bottom'}];</script></body></html>"
+)
+
+
+def chapter_href(chapter: int, slug: str = SERIES_SLUG) -> str:
+    return f"/manga/{slug}/v{chapter // 10 + 1:02d}/c{chapter:03d}/1.html"
+
+
+def series_page(chapters: int = 1100, slug: str = SERIES_SLUG) -> bytes:
+    """A mobile series page listing ``chapters`` chapters, newest first."""
+    items = "".join(
+        f"<li><a href='{chapter_href(chapter, slug)}'><span>Vol.{chapter // 10 + 1:02d} "
+        f"Ch.{chapter:03d}</span><em>Dec 01, 2019</em></a></li>"
+        for chapter in range(chapters, 0, -1)
+    )
+    related = "".join(
+        f"<li><a href='/manga/related_{number}/' class='series_preview'>Related {number}</a></li>"
+        for number in range(20)
+    )
+    return (
+        PAGE_HEAD.format(title="One Piece Manga")
+        + "<div class='manga-detail'><h1>One Piece</h1><p>"
+        + "Gol D. Roger was known as the Pirate King. " * 20
+        + f"</p><a href='{chapter_href(1, slug)}' class='btn'>Read first</a></div>"
+        + f"<ul class='chlist'>{items}</ul><ul class='related'>{related}</ul>"
+        + PAGE_FOOT
+    ).encode()
+
+
+def chapter_page(pages: int = 40, variant: str = "mangaread") -> bytes:
+    """A mobile chapter page with the current (``mangaread``) or old (``m``) page select."""
+    if variant == "mangaread":
+        options = "".join(f"<option>{page}</option>" for page in range(1, pages + 1))
+        select = f"<select class='mangaread-page'>{options}</select>"
+    else:
+        options = "".join(
+            f"<option value='{page}'>Page {page}</option>" for page in range(1, pages + 1)
+        )
+        select = f"<select class='m' onchange='change_page(this)'>{options}</select>"
+    return (
+        PAGE_HEAD.format(title="One Piece 1000 - Page 1")
+        + "<div class='mangaread-top'><a href='/manga/one_piece/'>One Piece</a>"
+        + f"{select}<a class='next' href='2.html'>Next</a></div>"
+        + "<div id='viewer'><img src='//zjcdn.mangafox.me/store/manga/106/01-1000.0/"
+        + "compressed/q001.jpg?token=d41d8cd9&ttl=1700000000' id='image'></div>"
+        + "<script>"
+        + "var comments=["
+        + ",".join(f"{{id:{n},text:'nice'}}" for n in range(200))
+        + "];"
+        + "</script>"
+        + PAGE_FOOT
+    ).encode()
+
+
+def chapterfun_payload(values: int = 2) -> str:
+    """A packed ``chapterfun.ashx`` response carrying ``values`` image URLs."""
+    return pack(chapterfun_source(values, start=1))
+
+
+def chapter_urls(chapters: int = 1100) -> OrderedDict[float, str]:
+    return OrderedDict(
+        (float(chapter), chapter_href(chapter)) for chapter in range(1, chapters + 1)
+    )
+
+
+def chapter_directory(path: Path, images: int = 200, image_size: int = 60_000) -> Path:
+    """Fill ``path`` with ``images`` JPEG-sized files of incompressible bytes."""
+    path.mkdir(parents=True, exist_ok=True)
+    generator = random.Random(images)
+    for index in range(images):
+        (path / f"{index:03d}.jpg").write_bytes(generator.randbytes(image_size))
+    return path
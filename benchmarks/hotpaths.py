@@ -0,0 +1,173 @@
+"""Micro-benchmarks of mfdl's parsing and selection hot paths on offline fixtures.
+
+Run with ``python -m benchmarks.hotpaths``. ``--save`` records a baseline and
+``--compare`` fails (exit status 1) when a case got slower than the baseline by
+more than ``--threshold``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable, Generator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any
+
+import mfdl
+from benchmarks import fixtures
+from benchmarks.throughput import current_commit
+
+
+@contextmanager
+def hotpath_cases(workdir: Path) -> Generator[dict[str, Callable[[], object]]]:
+    """Yield the benchmarked operations by name, with their fixtures already built."""
+    series = fixtures.series_page(1100)
+    mangaread_page = fixtures.chapter_page(40, "mangaread")
+    old_page = fixtures.chapter_page(40, "m")
+    chapterfun = fixtures.chapterfun_payload(2)
+    chapterfun_large = fixtures.chapterfun_payload(40)
+    chapter_urls = fixtures.chapter_urls(1100)
+    hrefs = list(chapter_urls.values())
+    chapter_dir = fixtures.chapter_directory(workdir / "chapter", images=200)
+
+    def series_chapter_links() -> object:
+        soup = mfdl.parse_series_page(series, fixtures.SERIES_SLUG)
+        return mfdl.parse_chapter_urls(soup, fixtures.SERIES_NAME)
+
+    yield {
+        "series_page_1100_chapters": series_chapter_links,
+        "page_numbers_mangaread": lambda: mfdl.get_page_numbers(mfdl.parse_html(mangaread_page)),
+        "page_numbers_old_select": lambda: mfdl.get_page_numbers(mfdl.parse_html(old_page)),
+        "unpack_eval_packer": lambda: mfdl.unpack_eval_packer(chapterfun),
+        "unpack_eval_packer_40_values": lambda: mfdl.unpack_eval_packer(chapterfun_large),
+        "parse_chapterfun_payload": lambda: mfdl.parse_chapterfun_payload(chapterfun, 1),
+        "get_chapter_number_1100": lambda: [mfdl.get_chapter_number(href) for href in hrefs],
+        "select_chapters_range": lambda: mfdl.select_chapters(chapter_urls, 100, 900),
+        "select_chapters_latest": lambda: mfdl.select_chapters(chapter_urls, latest=5),
+        "make_cbz_200_images": lambda: mfdl.make_cbz(str(chapter_dir)),
+    }
+
+
+def ops_per_second(operation: Callable[[], object], min_time: float, repeat: int) -> float:
+    """Best of ``repeat`` timings, each running enough calls to last ``min_time``."""
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            operation()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time:
+            break
+        number *= 2 if elapsed == 0 else max(2, min(10, int(min_time / elapsed) + 1))
+
+    best = elapsed / number
+    for _ in range(repeat - 1):
+        started = time.perf_counter()
+        for _ in range(number):
+            operation()
+        best = min(best, (time.perf_counter() - started) / number)
+    return 1 / best
+
+
+def allocations(operation: Callable[[], object]) -> tuple[int, int]:
+    """Peak traced bytes and bytes still allocated afterwards for one call."""
+    operation()
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        result = operation()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return peak - before, current - before
+
+
+def run_cases(
+    min_time: float = 0.2,
+    repeat: int = 5,
+    only: list[str] | None = None,
+) -> dict[str, dict[str, float]]:
+    results: dict[str, dict[str, float]] = {}
+    with tempfile.TemporaryDirectory() as workdir, hotpath_cases(Path(workdir)) as cases:
+        for name, operation in cases.items():
+            if only and not any(pattern in name for pattern in only):
+                continue
+            peak, retained = allocations(operation)
+            results[name] = {
+                "ops_per_second": ops_per_second(operation, min_time, repeat),
+                "peak_bytes": peak,
+                "retained_bytes": retained,
+            }
+    return results
+
+
+def regressions(
+    results: dict[str, dict[str, float]],
+    baseline: dict[str, dict[str, float]],
+    threshold: float,
+) -> list[str]:
+    """Describe every case whose ops/s fell more than ``threshold`` below the baseline."""
+    slower: list[str] = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        ratio = result["ops_per_second"] / baseline[name]["ops_per_second"]
+        if ratio < 1 - threshold:
+            slower.append(f"{name}: {ratio:.2f}x of baseline ops/s")
+    return slower
+
+
+def format_results(
+    results: dict[str, dict[str, float]],
+    baseline: dict[str, dict[str, float]] | None = None,
+) -> str:
+    lines = [f"{'case':<30}{'ops/s':>12}{'peak KiB':>10}{'kept KiB':>10}{'vs base':>9}"]
+    for name, result in results.items():
+        versus = ""
+        if baseline and name in baseline:
+            versus = f"{result['ops_per_second'] / baseline[name]['ops_per_second']:8.2f}x"
+        lines.append(
+            f"{name:<30}{result['ops_per_second']:12.1f}"
+            f"{result['peak_bytes'] / 1024:10.1f}{result['retained_bytes'] / 1024:10.1f}{versus}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("cases", nargs="*", help="only run cases whose name contains these")
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per timing")
+    parser.add_argument("--repeat", type=int, default=5, help="timings to take the best of")
+    parser.add_argument("--save", type=Path, default=None, help="write results as a baseline")
+    parser.add_argument("--compare", type=Path, default=None, help="baseline to compare with")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="fail when a case is this much slower than --compare (default: 0.25)",
+    )
+    args = parser.parse_args(argv)
+
+    baseline: dict[str, Any] | None = None
+    if args.compare is not None:
+        baseline = json.loads(args.compare.read_text())["results"]
+
+    results = run_cases(args.min_time, args.repeat, args.cases)
+    print(format_results(results, baseline))
+    if args.save is not None:
+        report = {"commit": current_commit(), "results": results}
+        args.save.write_text(json.dumps(report, indent=2) + "\n")
+    if baseline is not None:
+        slower = regressions(results, baseline, args.threshold)
+        if slower:
+            raise SystemExit("Regressions:\n  " + "\n  ".join(slower))
+
+
+if __name__ == "__main__":
+    main()
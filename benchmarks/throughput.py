@@ -0,0 +1,255 @@
+"""End-to-end throughput of ``download_manga`` against the fake Fanfox server.
+
+Run with ``python -m benchmarks.throughput``; ``--json`` writes the results
+(with the commit they were measured on) so runs can be compared across commits.
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import subprocess
+import tempfile
+import time
+from collections.abc import Generator
+from pathlib import Path
+from typing import Any
+
+import mfdl
+from benchmarks.fakefox import FakeFanfox, FakeFanfoxConfig, FaultConfig, patched_site
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    """Nearest-rank percentile; ``0.0`` for no values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, round(fraction * len(ordered) + 0.5))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+@contextlib.contextmanager
+def timed_chapters(durations: list[float]) -> Generator[None]:
+    """Record how long each chapter takes in either download engine."""
+    download_chapter = mfdl.download_chapter
+    download_chapter_async = mfdl.download_chapter_async
+
+    def timed(*args: Any, **kwargs: Any) -> None:
+        started = time.perf_counter()
+        try:
+            download_chapter(*args, **kwargs)
+        finally:
+            durations.append(time.perf_counter() - started)
+
+    async def timed_async(*args: Any, **kwargs: Any) -> None:
+        started = time.perf_counter()
+        try:
+            await download_chapter_async(*args, **kwargs)
+        finally:
+            durations.append(time.perf_counter() - started)
+
+    mfdl.download_chapter, mfdl.download_chapter_async = timed, timed_async
+    try:
+        yield
+    finally:
+        mfdl.download_chapter, mfdl.download_chapter_async = (
+            download_chapter,
+            download_chapter_async,
+        )
+
+
+@contextlib.contextmanager
+def configured_profile(profile: str, unpaced: bool = False) -> Generator[dict[str, Any]]:
+    """Configure ``mfdl``'s process-wide state like ``main`` does for ``--profile``.
+
+    Yields the ``download_manga`` keyword arguments of the profile. The image
+    URL cache is disabled so every run resolves its chapters.
+    """
+    args = argparse.Namespace(
+        profile=profile,
+        delay=None,
+        max_retries=None,
+        workers=None,
+        timeout=mfdl.DEFAULT_TIMEOUT,
+        html_rate=0 if unpaced else None,
+        image_rate=0 if unpaced else None,
+        burst=None,
+        max_inflight_mb=None,
+        chapters_in_flight=None,
+    )
+    avg_delay, max_retries, workers, timeout = mfdl.resolve_runtime_settings(args)
+    mfdl.HTTP_POOL.resize(workers)
+    mfdl.RATE_LIMITER.configure(*mfdl.resolve_rate_limits(args, workers))
+    mfdl.BYTE_BUDGET.configure(mfdl.resolve_inflight_budget(args))
+    mfdl.RESOLUTION_CACHE.configure(None)
+    try:
+        yield {
+            "avg_delay": avg_delay,
+            "max_retries": max_retries,
+            "workers": workers,
+            "timeout": timeout,
+            "chapters_in_flight": mfdl.resolve_chapters_in_flight(args),
+        }
+    finally:
+        mfdl.RATE_LIMITER.configure()
+        mfdl.BYTE_BUDGET.configure(None)
+
+
+@contextlib.contextmanager
+def timed_retry_sleeps(sleeps: list[float]) -> Generator[None]:
+    """Record every delay the retry loops of either engine sleep for."""
+    retry_delay = mfdl.retry_delay
+
+    def recorded(avg_delay: float) -> float:
+        delay = retry_delay(avg_delay)
+        sleeps.append(delay)
+        return delay
+
+    mfdl.retry_delay = recorded
+    try:
+        yield
+    finally:
+        mfdl.retry_delay = retry_delay
+
+
+def run_profile(
+    profile: str,
+    config: FakeFanfoxConfig,
+    engine: str = "thread",
+    unpaced: bool = False,
+    verbose: bool = False,
+    faults: FaultConfig | None = None,
+) -> dict[str, Any]:
+    """Download the fake series once with ``profile`` and return its measurements.
+
+    A chapter that fails does not abort the measurement; its error is kept
+    in ``failed``.
+    """
+    durations: list[float] = []
+    sleeps: list[float] = []
+    failed = None
+    output = io.StringIO()
+    with (
+        FakeFanfox(config, faults=faults) as site,
+        patched_site(site),
+        configured_profile(profile, unpaced) as settings,
+        tempfile.TemporaryDirectory() as output_dir,
+        timed_chapters(durations),
+        timed_retry_sleeps(sleeps),
+        contextlib.nullcontext() if verbose else contextlib.redirect_stdout(output),
+    ):
+        started = time.perf_counter()
+        try:
+            mfdl.download_manga(
+                site.manga_name, output_dir=Path(output_dir), engine=engine, **settings
+            )
+        except SystemExit as error:
+            failed = str(error.code)
+        elapsed = time.perf_counter() - started
+        saved = [path.stat().st_size for path in Path(output_dir).rglob("*.jpg")]
+
+    images = len(saved)
+    requests = sum(site.requests.values())
+    return {
+        "profile": profile,
+        "engine": engine,
+        "seconds": elapsed,
+        "images": images,
+        "images_per_second": images / elapsed,
+        "mb_per_second": site.bytes_sent["cdn"] / 1e6 / elapsed,
+        "goodput_mb_per_second": sum(saved) / 1e6 / elapsed,
+        "wasted_mb": (site.bytes_sent["cdn"] - sum(saved)) / 1e6,
+        "requests_per_image": requests / max(images, 1),
+        "requests": dict(site.requests),
+        "image_retries": site.requests["cdn"] - len(site.image_paths),
+        "retry_sleep_seconds": sum(sleeps),
+        "faults": dict(site.faults.injected) if site.faults is not None else {},
+        "chapter_p50": percentile(durations, 0.50),
+        "chapter_p99": percentile(durations, 0.99),
+        "failed": failed,
+    }
+
+
+def current_commit() -> str | None:
+    try:
+        completed = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return completed.stdout.strip()
+
+
+def format_results(results: list[dict[str, Any]]) -> str:
+    lines = [
+        f"{'profile':<11}{'engine':<8}{'img/s':>8}{'MB/s':>8}{'req/img':>9}{'p50 s':>8}{'p99 s':>8}"
+    ]
+    for result in results:
+        lines.append(
+            f"{result['profile']:<11}{result['engine']:<8}"
+            f"{result['images_per_second']:8.1f}{result['mb_per_second']:8.2f}"
+            f"{result['requests_per_image']:9.2f}"
+            f"{result['chapter_p50']:8.2f}{result['chapter_p99']:8.2f}"
+        )
+    return "\n".join(lines)
+
+
+def add_server_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--chapters", type=int, default=4, help="chapters in the fake series")
+    parser.add_argument("--pages", type=int, default=10, help="pages per chapter")
+    parser.add_argument("--image-kb", type=float, default=200, help="image size in KiB")
+    parser.add_argument("--latency-ms", type=float, default=20, help="delay before each response")
+    parser.add_argument(
+        "--bandwidth-kbps", type=float, default=0, help="KiB/s per response body, 0 for unlimited"
+    )
+    parser.add_argument(
+        "--mode",
+        choices=["mobile", "desktop", "mixed"],
+        default="mixed",
+        help="chapters served as mobile pages, desktop chapterfun.ashx payloads, or both",
+    )
+
+
+def server_config(args: argparse.Namespace) -> FakeFanfoxConfig:
+    return FakeFanfoxConfig(
+        chapters=args.chapters,
+        pages=args.pages,
+        image_size=int(args.image_kb * 1024),
+        latency=args.latency_ms / 1000,
+        bandwidth=args.bandwidth_kbps * 1024 or None,
+        mode=args.mode,
+    )
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--profile",
+        action="append",
+        choices=sorted(mfdl.PROFILE_DEFAULTS),
+        help="profile to measure, repeatable (default: all)",
+    )
+    parser.add_argument("--engine", choices=["thread", "async"], default="thread")
+    parser.add_argument(
+        "--unpaced", action="store_true", help="disable the profiles' request rate limits"
+    )
+    add_server_arguments(parser)
+    parser.add_argument("--json", type=Path, default=None, help="write results to this file")
+    parser.add_argument("--verbose", action="store_true", help="show download_manga output")
+    args = parser.parse_args(argv)
+
+    config = server_config(args)
+    results = [
+        run_profile(profile, config, args.engine, args.unpaced, args.verbose)
+        for profile in args.profile or mfdl.PROFILE_DEFAULTS
+    ]
+    print(format_results(results))
+    if args.json is not None:
+        report = {"commit": current_commit(), "config": vars(config), "results": results}
+        args.json.write_text(json.dumps(report, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Micro-benchmark: ``chapterfun.ashx`` unpacking before and after the fast path.
+
+Run with ``python -m benchmarks.unpacker``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import timeit
+
+from benchmarks.chapterfun import (
+    chapterfun_source,
+    legacy_parse_chapterfun_payload,
+    legacy_unpack_eval_packer,
+    pack,
+)
+from mfdl import parse_chapterfun_payload, unpack_eval_packer
+
+
+def best_of(function, argument, number: int, repeat: int) -> float:
+    timings = timeit.repeat(lambda: function(argument), number=number, repeat=repeat)
+    return min(timings) / number
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=2, help="image values per payload")
+    parser.add_argument("--number", type=int, default=2000, help="calls per timing")
+    parser.add_argument("--repeat", type=int, default=5, help="timings to take the best of")
+    args = parser.parse_args(argv)
+
+    payload = pack(chapterfun_source(args.pages))
+    if unpack_eval_packer(payload) != legacy_unpack_eval_packer(payload):
+        raise SystemExit("Error: unpack_eval_packer output differs from the legacy unpacker")
+    if parse_chapterfun_payload(payload, 1) != legacy_parse_chapterfun_payload(payload):
+        raise SystemExit("Error: parse_chapterfun_payload output differs from the legacy parser")
+
+    cases = (
+        ("full unpack", legacy_unpack_eval_packer, unpack_eval_packer),
+        (
+            "pix/pvalue",
+            legacy_parse_chapterfun_payload,
+            lambda source: parse_chapterfun_payload(source, 1),
+        ),
+    )
+    print(f"payload: {len(payload)} bytes, {args.pages} image values")
+    for name, legacy, current in cases:
+        before = best_of(legacy, payload, args.number, args.repeat)
+        after = best_of(current, payload, args.number, args.repeat)
+        print(
+            f"{name:<12} legacy {before * 1e6:8.1f} us  "
+            f"current {after * 1e6:8.1f} us  speedup {before / after:5.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,62 @@
 #!/usr/bin/env python3
 
 import argparse
+import asyncio
+import collections
 import concurrent.futures
+import contextvars
+import cProfile
+import email.parser
 import gzip
+import hashlib
+import http.client
+import importlib.util
+import io
+import itertools
+import json
+import multiprocessing
 import os
+import pstats
 import random
 import re
+import shlex
 import shutil
+import socket
+import sqlite3
+import ssl
 import sys
+import tempfile
+import threading
 import time
 import urllib.error
 import urllib.parse
 import urllib.request
+import uuid
+import zlib
 from collections import OrderedDict
-from collections.abc import Iterable
-from contextlib import closing
-from functools import reduce
+from collections.abc import (
+    AsyncGenerator,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Generator,
+    Iterable,
+    Iterator,
+)
+from contextlib import (
+    AbstractContextManager,
+    asynccontextmanager,
+    closing,
+    contextmanager,
+    nullcontext,
+    suppress,
+)
+from functools import lru_cache, partial, reduce, wraps
 from pathlib import Path
-from typing import Any
+from typing import IO, Any, ParamSpec, Protocol, TypeVar
 from zipfile import ZipFile
 
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 from tqdm import tqdm
 
 URL_BASE = "https://m.fanfox.net/"
@@ -33,18 +69,1191 @@ DEFAULT_HEADERS = {
     "Referer": URL_BASE,
 }
 DEFAULT_TIMEOUT = 30.0
+MANIFEST_NAME = "manifest.json"
+MANIFEST_FLUSH_RECORDS = 32
+MANIFEST_FLUSH_INTERVAL = 1.0
+CHUNK_SIZE = 64 * 1024
+SPOOL_MAX_SIZE = 1024 * 1024
+UNKNOWN_LENGTH_ESTIMATE = 1024 * 1024
+RESOLUTION_CACHE_NAME = "resolution.sqlite3"
+DEFAULT_RESOLUTION_TTL = 6 * 60 * 60.0
+STORE_NAME = ".mfdl-store"
+DEFAULT_LEASE_SECONDS = 10 * 60.0
+MAX_JOB_ATTEMPTS = 3
+# lxml builds the same trees several times faster; html.parser needs nothing extra.
+HTML_PARSER = "lxml" if importlib.util.find_spec("lxml") else "html.parser"
+# Callers only look at a few elements, so most pages are parsed through a
+# SoupStrainer that skips building the rest of the tree.
+PAGE_IMAGE_STRAINER = SoupStrainer(id=["viewer", "image"])
+DM5_KEY_STRAINER = SoupStrainer("input", id="dm5_key")
+SEARCH_RESULT_STRAINER = SoupStrainer("a", class_="series_preview")
 PROFILE_DEFAULTS = {
-    "safe": {"workers": 2, "avg_delay": 2.0, "max_retries": 5},
-    "balanced": {"workers": 4, "avg_delay": 1.0, "max_retries": 4},
-    "aggressive": {"workers": 8, "avg_delay": 0.4, "max_retries": 3},
+    "safe": {
+        "workers": 2,
+        "avg_delay": 2.0,
+        "max_retries": 5,
+        "chapters_in_flight": 1,
+        "html_rate": 2.0,
+        "image_rate": 4.0,
+        "max_inflight_mb": 32,
+    },
+    "balanced": {
+        "workers": 4,
+        "avg_delay": 1.0,
+        "max_retries": 4,
+        "chapters_in_flight": 2,
+        "html_rate": 4.0,
+        "image_rate": 10.0,
+        "max_inflight_mb": 64,
+    },
+    "aggressive": {
+        "workers": 8,
+        "avg_delay": 0.4,
+        "max_retries": 3,
+        "chapters_in_flight": 3,
+        "html_rate": 8.0,
+        "image_rate": 20.0,
+        "max_inflight_mb": 128,
+    },
 }
+MAX_REDIRECTS = 5
+REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+
+T = TypeVar("T")
+R = TypeVar("R")
+P = ParamSpec("P")
+
+
+class ByteSink(Protocol):
+    """Destination of a streamed body: a binary file or an ``ImageTransfer``."""
+
+    def write(self, data: bytes, /) -> int: ...
+
+    def tell(self) -> int: ...
+
+
+class RequestTiming:
+    """Where the time of one fetch went, filled in by the fetch helpers and pools.
+
+    ``throttle`` is time paced by the rate limiter, ``queue`` waiting for a
+    per-host connection slot, ``connect`` opening a new connection (DNS, TCP
+    and TLS happen in one call), ``ttfb`` from sending the request to the
+    response headers and ``transfer`` reading the body. A phase only appears in
+    ``phases`` once it happened: a reused connection has no ``connect``, an
+    unthrottled request no ``throttle``.
+    """
+
+    PHASES = ("throttle", "queue", "connect", "ttfb", "transfer")
+
+    def __init__(self, attempt: int = 1) -> None:
+        self.attempt = attempt
+        self.status: int | None = None
+        self.bytes = 0
+        self.phases: dict[str, float] = {}
+
+    @contextmanager
+    def phase(self, name: str) -> Generator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - started
+
+
+class HTTPConnectionPool:
+    """Thread-safe pool of keep-alive HTTP(S) connections, bounded per host.
+
+    Every fetch helper goes through the module-level ``HTTP_POOL`` so that
+    page, ``chapterfun.ashx`` and image requests reuse TCP/TLS connections
+    instead of paying a new handshake per request.
+    """
+
+    def __init__(self, max_connections_per_host: int = 1) -> None:
+        self.max_connections_per_host = max_connections_per_host
+        self.debuglevel = 0
+        self.connections_opened = 0
+        self.requests_served = 0
+        self._lock = threading.Lock()
+        self._idle: dict[tuple[str, str], list[http.client.HTTPConnection]] = {}
+        self._slots: dict[tuple[str, str], threading.BoundedSemaphore] = {}
+        self._ssl_context = ssl.create_default_context()
+
+    def resize(self, max_connections_per_host: int) -> None:
+        """Change the per-host bound. Call before issuing requests."""
+        if max_connections_per_host < 1:
+            raise ValueError("max_connections_per_host must be >= 1")
+        self.close()
+        with self._lock:
+            self.max_connections_per_host = max_connections_per_host
+            self._slots.clear()
+
+    def close(self) -> None:
+        with self._lock:
+            idle = [conn for conns in self._idle.values() for conn in conns]
+            self._idle.clear()
+        for conn in idle:
+            conn.close()
+
+    def _slot(self, key: tuple[str, str]) -> threading.BoundedSemaphore:
+        with self._lock:
+            slot = self._slots.get(key)
+            if slot is None:
+                slot = threading.BoundedSemaphore(self.max_connections_per_host)
+                self._slots[key] = slot
+            return slot
+
+    def _checkout(
+        self, key: tuple[str, str], timeout: float
+    ) -> tuple[http.client.HTTPConnection, bool]:
+        with self._lock:
+            idle = self._idle.get(key)
+            conn = idle.pop() if idle else None
+        if conn is not None:
+            conn.timeout = timeout
+            if conn.sock is not None:
+                conn.sock.settimeout(timeout)
+            return conn, True
+
+        scheme, netloc = key
+        if scheme == "https":
+            conn = http.client.HTTPSConnection(netloc, timeout=timeout, context=self._ssl_context)
+        else:
+            conn = http.client.HTTPConnection(netloc, timeout=timeout)
+        conn.set_debuglevel(self.debuglevel)
+        with self._lock:
+            self.connections_opened += 1
+        return conn, False
+
+    def _checkin(self, key: tuple[str, str], conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            self._idle.setdefault(key, []).append(conn)
+
+    def _send(
+        self,
+        key: tuple[str, str],
+        target: str,
+        headers: dict[str, str],
+        timeout: float,
+        timing: RequestTiming,
+    ) -> tuple[http.client.HTTPConnection, http.client.HTTPResponse]:
+        conn, reused = self._checkout(key, timeout)
+        try:
+            return conn, self._exchange(conn, reused, target, headers, timing)
+        except (http.client.HTTPException, OSError):
+            conn.close()
+            if not reused:
+                raise
+        # The server dropped an idle keep-alive connection; retry once on a fresh one.
+        conn, _ = self._checkout_fresh(key, timeout)
+        try:
+            return conn, self._exchange(conn, False, target, headers, timing)
+        except (http.client.HTTPException, OSError):
+            conn.close()
+            raise
+
+    @staticmethod
+    def _exchange(
+        conn: http.client.HTTPConnection,
+        reused: bool,
+        target: str,
+        headers: dict[str, str],
+        timing: RequestTiming,
+    ) -> http.client.HTTPResponse:
+        if not reused:
+            # ``request`` would connect implicitly; connecting first times the handshake.
+            with timing.phase("connect"):
+                conn.connect()
+        with timing.phase("ttfb"):
+            conn.request("GET", target, headers=headers)
+            return conn.getresponse()
+
+    def _checkout_fresh(
+        self, key: tuple[str, str], timeout: float
+    ) -> tuple[http.client.HTTPConnection, bool]:
+        with self._lock:
+            stale = self._idle.pop(key, [])
+        for conn in stale:
+            conn.close()
+        return self._checkout(key, timeout)
+
+    @contextmanager
+    def open(
+        self,
+        request: urllib.request.Request,
+        timeout: float = DEFAULT_TIMEOUT,
+        timing: RequestTiming | None = None,
+    ) -> Generator[http.client.HTTPResponse]:
+        """Send a GET request and yield the response, following redirects.
+
+        Error statuses raise ``urllib.error.HTTPError`` and transport failures
+        raise ``urllib.error.URLError``, matching ``urllib.request.urlopen``.
+        """
+        timing = timing or RequestTiming()
+        url = request.full_url
+        headers = dict(request.header_items())
+        for _ in range(MAX_REDIRECTS + 1):
+            parsed = urllib.parse.urlsplit(url)
+            if parsed.scheme not in ("http", "https"):
+                raise urllib.error.URLError(f"unsupported URL scheme: {url}")
+            key = (parsed.scheme, parsed.netloc)
+            target = urllib.parse.urlunsplit(("", "", parsed.path or "/", parsed.query, ""))
+
+            slot = self._slot(key)
+            if not slot.acquire(blocking=False):
+                with timing.phase("queue"):
+                    slot.acquire()
+            conn = None
+            try:
+                try:
+                    conn, response = self._send(key, target, headers, timeout, timing)
+                except (http.client.HTTPException, OSError) as error:
+                    raise urllib.error.URLError(error) from error
+                with self._lock:
+                    self.requests_served += 1
+
+                location = response.getheader("Location")
+                if response.status in REDIRECT_STATUSES and location:
+                    response.read()
+                    url = urllib.parse.urljoin(url, location)
+                    continue
+                timing.status = response.status
+                if response.status >= 400:
+                    body = response.read()
+                    raise urllib.error.HTTPError(
+                        url, response.status, response.reason, response.headers, io.BytesIO(body)
+                    )
+                yield response
+                return
+            finally:
+                if conn is not None:
+                    # Only hand the connection back once the body has been fully consumed.
+                    if response.will_close or not response.isclosed():
+                        conn.close()
+                    else:
+                        self._checkin(key, conn)
+                slot.release()
+
+        raise urllib.error.URLError(f"too many redirects: {request.full_url}")
+
+
+HTTP_POOL = HTTPConnectionPool()
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilling ``rate`` tokens per second up to ``burst``."""
+
+    def __init__(self, rate: float, burst: int = 1) -> None:
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take a token and return how long the caller must wait before using it.
+
+        Tokens may go negative, which queues callers in arrival order instead of
+        letting them race for the next refill.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self) -> None:
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+
+class HostRateLimiter:
+    """Paces requests with one shared token bucket per host.
+
+    Fanfox HTML hosts (``URL_BASE``/``DESKTOP_URL_BASE``) use ``html_rate`` and
+    every other host, i.e. the image CDN, uses ``image_rate``. A rate of
+    ``None`` leaves that class of host unthrottled.
+    """
+
+    def __init__(
+        self,
+        html_rate: float | None = None,
+        image_rate: float | None = None,
+        burst: int = 1,
+    ) -> None:
+        self.configure(html_rate, image_rate, burst)
+
+    def configure(
+        self,
+        html_rate: float | None = None,
+        image_rate: float | None = None,
+        burst: int = 1,
+    ) -> None:
+        self.html_rate = html_rate
+        self.image_rate = image_rate
+        self.burst = burst
+        self._buckets: dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def bucket_for(self, url: str) -> TokenBucket | None:
+        host = urllib.parse.urlsplit(normalize_url(url)).netloc
+        rate = self.html_rate if host in html_hosts() else self.image_rate
+        if rate is None:
+            return None
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = TokenBucket(rate, self.burst)
+                self._buckets[host] = bucket
+            return bucket
+
+    def reserve(self, url: str) -> float:
+        bucket = self.bucket_for(url)
+        return 0.0 if bucket is None else bucket.reserve()
+
+    def acquire(self, url: str) -> None:
+        delay = self.reserve(url)
+        if delay > 0:
+            time.sleep(delay)
+
+
+RATE_LIMITER = HostRateLimiter()
+
+
+class BudgetReservation:
+    """Bytes one transfer holds in a ``ByteBudget``."""
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+
+
+class ByteBudget:
+    """Process-wide cap on image bytes in flight, shared by every worker.
+
+    A transfer reserves ``estimate`` bytes (a running average of recent
+    ``Content-Length`` values) before it takes a connection, waiting while the
+    budget is exhausted, so no connection sits idle waiting for budget. Once
+    the headers arrive the reservation is resized to the real body size
+    without waiting. A reservation larger than the whole budget is clamped so
+    it can still run on its own. A capacity of ``None`` disables the budget.
+    """
+
+    def __init__(self, capacity: int | None = None) -> None:
+        self.configure(capacity)
+
+    def configure(self, capacity: int | None = None) -> None:
+        self.capacity = capacity
+        self.in_flight = 0
+        self.peak = 0
+        self.waits = 0
+        self.estimate = UNKNOWN_LENGTH_ESTIMATE
+        self._condition = threading.Condition()
+        self._async_waiters: list[tuple[asyncio.AbstractEventLoop, asyncio.Future[None]]] = []
+
+    def _clamp(self, size: int) -> int:
+        assert self.capacity is not None
+        return max(0, min(size, self.capacity))
+
+    def _try_reserve(self, size: int) -> bool:
+        assert self.capacity is not None
+        if self.in_flight and self.in_flight + size > self.capacity:
+            return False
+        self.in_flight += size
+        self.peak = max(self.peak, self.in_flight)
+        return True
+
+    def _adjust(self, delta: int) -> None:
+        with self._condition:
+            self.in_flight += delta
+            self.peak = max(self.peak, self.in_flight)
+            if delta >= 0:
+                return
+            self._condition.notify_all()
+            waiters, self._async_waiters = self._async_waiters, []
+        for loop, waiter in waiters:
+            loop.call_soon_threadsafe(_resolve_waiter, waiter)
+
+    def resize(self, reservation: BudgetReservation, size: int) -> None:
+        """Set ``reservation`` to ``size`` bytes, growing past the capacity rather than waiting."""
+        with self._condition:
+            self.estimate = (4 * self.estimate + size) // 5
+        if self.capacity is None:
+            return
+        size = self._clamp(size)
+        delta, reservation.size = size - reservation.size, size
+        self._adjust(delta)
+
+    @contextmanager
+    def reserve(self, size: int | None = None) -> Generator[BudgetReservation]:
+        """Reserve ``size`` bytes (default ``estimate``) for one transfer."""
+        reservation = BudgetReservation(self.estimate if size is None else size)
+        if self.capacity is None:
+            yield reservation
+            return
+        size = reservation.size = self._clamp(reservation.size)
+        with self._condition:
+            if not self._try_reserve(size):
+                self.waits += 1
+                self._condition.wait_for(lambda: self._try_reserve(size))
+        try:
+            yield reservation
+        finally:
+            self._adjust(-reservation.size)
+
+    @asynccontextmanager
+    async def reserve_async(self, size: int | None = None) -> AsyncGenerator[BudgetReservation]:
+        reservation = BudgetReservation(self.estimate if size is None else size)
+        if self.capacity is None:
+            yield reservation
+            return
+        size = reservation.size = self._clamp(reservation.size)
+        loop = asyncio.get_running_loop()
+        counted = False
+        while True:
+            with self._condition:
+                if self._try_reserve(size):
+                    break
+                if not counted:
+                    self.waits += 1
+                    counted = True
+                waiter: asyncio.Future[None] = loop.create_future()
+                self._async_waiters.append((loop, waiter))
+            await waiter
+        try:
+            yield reservation
+        finally:
+            self._adjust(-reservation.size)
+
+
+def _resolve_waiter(waiter: asyncio.Future[None]) -> None:
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+def expected_body_size(headers: Any) -> int:
+    """Bytes to reserve for a response body, from ``Content-Length`` when present."""
+    try:
+        return int(headers.get("Content-Length"))
+    except (TypeError, ValueError):
+        return UNKNOWN_LENGTH_ESTIMATE
+
+
+BYTE_BUDGET = ByteBudget()
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def html_hosts() -> set[str]:
+    return {urllib.parse.urlsplit(base).netloc for base in (URL_BASE, DESKTOP_URL_BASE)}
+
+
+def request_stage(url: str) -> str:
+    """Classify ``url`` as a ``series`` page, chapter ``page``, ``chapterfun`` call or ``image``."""
+    parsed = urllib.parse.urlsplit(normalize_url(url))
+    if parsed.netloc not in html_hosts():
+        return "image"
+    if parsed.path.endswith("chapterfun.ashx"):
+        return "chapterfun"
+    if parsed.path.startswith("/search") or re.fullmatch(r"/manga/[^/]+/?", parsed.path):
+        return "series"
+    return "page"
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style."""
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        for position, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[position] += 1
+
+    def to_json(self) -> dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "buckets": {f"{bound:g}": count for bound, count in zip(self.buckets, self.counts)},
+        }
+
+
+def prometheus_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(f'{name}="{value}"' for name, value in labels.items())
+    return f"{{{pairs}}}"
+
+
+class MetricsRegistry:
+    """Per-stage request metrics of one run, exported as JSON or a Prometheus textfile.
+
+    Every fetch records its stage (see ``request_stage``), status, attempt,
+    bytes and the phases of ``RequestTiming``; parsing and retry sleeps are
+    timed as well.
+    """
+
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        self.started = time.time()
+        self.requests: collections.Counter[tuple[str, str]] = collections.Counter()
+        self.attempts: collections.Counter[tuple[str, int]] = collections.Counter()
+        self.bytes: collections.Counter[str] = collections.Counter()
+        self.durations: dict[tuple[str, str], Histogram] = {}
+        self.parse: dict[str, Histogram] = {}
+        self.steps: dict[str, Histogram] = {}
+        self.retry_sleep = Histogram()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def track(
+        self, url: str, attempt: int = 1, timing: RequestTiming | None = None
+    ) -> Generator[RequestTiming]:
+        """Time one fetch of ``url``; the caller fills in the yielded ``RequestTiming``."""
+        timing = timing or RequestTiming()
+        timing.attempt = attempt
+        started = time.perf_counter()
+        try:
+            yield timing
+        except urllib.error.HTTPError as error:
+            timing.status = error.code
+            raise
+        finally:
+            self.record(request_stage(url), timing, time.perf_counter() - started)
+
+    def record(self, stage: str, timing: RequestTiming, total: float) -> None:
+        status = "error" if timing.status is None else str(timing.status)
+        with self._lock:
+            self.requests[stage, status] += 1
+            self.attempts[stage, timing.attempt] += 1
+            self.bytes[stage] += timing.bytes
+            for phase, seconds in (*timing.phases.items(), ("total", total)):
+                self._histogram(self.durations, (stage, phase)).observe(seconds)
+
+    @contextmanager
+    def time_parse(self, name: str) -> Generator[None]:
+        with self._timed(self.parse, name):
+            yield
+
+    @contextmanager
+    def time_step(self, name: str) -> Generator[None]:
+        """Time one call of a pipeline step; steps of concurrent chapters overlap."""
+        elapsed = [0.0]
+        try:
+            with exclusive_time(elapsed):
+                yield
+        finally:
+            self.observe_step(name, elapsed[0])
+
+    def observe_step(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self._histogram(self.steps, name).observe(seconds)
+
+    @contextmanager
+    def _timed(self, histograms: dict[str, Histogram], name: str) -> Generator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            with self._lock:
+                self._histogram(histograms, name).observe(seconds)
+
+    def observe_retry_sleep(self, seconds: float) -> None:
+        with self._lock:
+            self.retry_sleep.observe(seconds)
+
+    @staticmethod
+    def _histogram(histograms: dict[Any, Histogram], key: Any) -> Histogram:
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = histograms[key] = Histogram()
+        return histogram
+
+    def to_json(self, success: bool | None = None) -> dict[str, Any]:
+        with self._lock:
+            stages: dict[str, Any] = {}
+            for stage in sorted({stage for stage, _ in self.requests}):
+                stages[stage] = {
+                    "requests": {
+                        status: count
+                        for (name, status), count in sorted(self.requests.items())
+                        if name == stage
+                    },
+                    "attempts": {
+                        str(attempt): count
+                        for (name, attempt), count in sorted(self.attempts.items())
+                        if name == stage
+                    },
+                    "bytes": self.bytes[stage],
+                    "seconds": {
+                        phase: histogram.to_json()
+                        for (name, phase), histogram in self.durations.items()
+                        if name == stage
+                    },
+                }
+            return {
+                "started": self.started,
+                "duration_seconds": time.time() - self.started,
+                "success": success,
+                "stages": stages,
+                "parse_seconds": {name: hist.to_json() for name, hist in self.parse.items()},
+                "step_seconds": {name: hist.to_json() for name, hist in self.steps.items()},
+                "retry_sleep_seconds": self.retry_sleep.to_json(),
+            }
+
+    def to_prometheus(self, success: bool | None = None) -> str:
+        lines: list[str] = []
+
+        def histogram_lines(name: str, labels: dict[str, str], histogram: Histogram) -> None:
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                bucket_labels = prometheus_labels({**labels, "le": f"{bound:g}"})
+                lines.append(f"{name}_bucket{bucket_labels} {count}")
+            infinite = prometheus_labels({**labels, "le": "+Inf"})
+            lines.append(f"{name}_bucket{infinite} {histogram.count}")
+            lines.append(f"{name}_sum{prometheus_labels(labels)} {histogram.sum:.6f}")
+            lines.append(f"{name}_count{prometheus_labels(labels)} {histogram.count}")
+
+        with self._lock:
+            lines += [
+                "# HELP mfdl_requests_total HTTP requests by stage and status.",
+                "# TYPE mfdl_requests_total counter",
+            ]
+            for (stage, status), count in sorted(self.requests.items()):
+                labels = prometheus_labels({"stage": stage, "status": status})
+                lines.append(f"mfdl_requests_total{labels} {count}")
+            lines += [
+                "# HELP mfdl_request_attempts_total HTTP requests by stage and attempt number.",
+                "# TYPE mfdl_request_attempts_total counter",
+            ]
+            for (stage, attempt), count in sorted(self.attempts.items()):
+                labels = prometheus_labels({"stage": stage, "attempt": str(attempt)})
+                lines.append(f"mfdl_request_attempts_total{labels} {count}")
+            lines += [
+                "# HELP mfdl_response_bytes_total Response body bytes by stage.",
+                "# TYPE mfdl_response_bytes_total counter",
+            ]
+            for stage, count in sorted(self.bytes.items()):
+                labels = prometheus_labels({"stage": stage})
+                lines.append(f"mfdl_response_bytes_total{labels} {count}")
+            lines += [
+                "# HELP mfdl_request_seconds Time per request phase by stage.",
+                "# TYPE mfdl_request_seconds histogram",
+            ]
+            for (stage, phase), histogram in sorted(self.durations.items()):
+                histogram_lines("mfdl_request_seconds", {"stage": stage, "phase": phase}, histogram)
+            lines += [
+                "# HELP mfdl_parse_seconds Time spent parsing responses.",
+                "# TYPE mfdl_parse_seconds histogram",
+            ]
+            for name, histogram in sorted(self.parse.items()):
+                histogram_lines("mfdl_parse_seconds", {"parser": name}, histogram)
+            lines += [
+                "# HELP mfdl_step_seconds Time per call of each download pipeline step.",
+                "# TYPE mfdl_step_seconds histogram",
+            ]
+            for name, histogram in sorted(self.steps.items()):
+                histogram_lines("mfdl_step_seconds", {"step": name}, histogram)
+            lines += [
+                "# HELP mfdl_retry_sleep_seconds Delays slept between image retries.",
+                "# TYPE mfdl_retry_sleep_seconds histogram",
+            ]
+            histogram_lines("mfdl_retry_sleep_seconds", {}, self.retry_sleep)
+        lines += [
+            "# HELP mfdl_run_duration_seconds Duration of the run.",
+            "# TYPE mfdl_run_duration_seconds gauge",
+            f"mfdl_run_duration_seconds {time.time() - self.started:.3f}",
+            "# HELP mfdl_run_timestamp_seconds When the run started.",
+            "# TYPE mfdl_run_timestamp_seconds gauge",
+            f"mfdl_run_timestamp_seconds {self.started:.3f}",
+        ]
+        if success is not None:
+            lines += [
+                "# HELP mfdl_run_success Whether the run finished without errors.",
+                "# TYPE mfdl_run_success gauge",
+                f"mfdl_run_success {int(success)}",
+            ]
+        return "\n".join(lines) + "\n"
+
+
+METRICS = MetricsRegistry()
+
+# Time spent in steps nested inside the step running in this context.
+_NESTED_STEP_TIME: contextvars.ContextVar[list[float] | None] = contextvars.ContextVar(
+    "nested_step_time", default=None
+)
+
+
+@contextmanager
+def exclusive_time(elapsed: list[float]) -> Generator[None]:
+    """Add the time of the block, less that of the steps nested in it, to ``elapsed[0]``.
+
+    A step that runs another (``download_urls`` consuming the image URL
+    resolver, which may fall back to the desktop resolver) would otherwise
+    count the inner step's time twice, so the step totals would not add up.
+    """
+    nested = [0.0]
+    outer = _NESTED_STEP_TIME.get()
+    token = _NESTED_STEP_TIME.set(nested)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        _NESTED_STEP_TIME.reset(token)
+        if outer is not None:
+            outer[0] += seconds
+        elapsed[0] += seconds - nested[0]
+
+
+@contextmanager
+def timed_step(name: str) -> Generator[None]:
+    """``METRICS.time_step`` looked up per call, so it can decorate pipeline steps."""
+    with METRICS.time_step(name):
+        yield
+
+
+@asynccontextmanager
+async def timed_step_async(name: str) -> AsyncGenerator[None]:
+    """``timed_step`` for coroutine functions, timed until they return."""
+    with METRICS.time_step(name):
+        yield
+
+
+def timed_generator(
+    name: str,
+) -> Callable[[Callable[P, Iterator[T]]], Callable[P, Iterator[T]]]:
+    """Time a generator function's work as one ``name`` step per call.
+
+    Only the time spent producing items counts, not the time the generator sits
+    suspended at ``yield`` while the consumer downloads what it was given; it is
+    observed once the generator is exhausted or closed.
+    """
+
+    def decorate(function: Callable[P, Iterator[T]]) -> Callable[P, Iterator[T]]:
+        @wraps(function)
+        def timed(*args: P.args, **kwargs: P.kwargs) -> Iterator[T]:
+            items = function(*args, **kwargs)
+            elapsed = [0.0]
+            try:
+                while True:
+                    with exclusive_time(elapsed):
+                        try:
+                            item = next(items)
+                        except StopIteration:
+                            return
+                    yield item
+            finally:
+                METRICS.observe_step(name, elapsed[0])
+
+        return timed
+
+    return decorate
+
+
+def congestion_reason(error: urllib.error.URLError) -> str | None:
+    """Return why ``error`` suggests the site is overloaded, or ``None`` if it does not."""
+    if isinstance(error, urllib.error.HTTPError):
+        if error.code == 429 or error.code >= 500:
+            return f"HTTP {error.code}"
+        return None
+    if isinstance(error.reason, TimeoutError) or "timed out" in str(error.reason):
+        return "timeout"
+    return "connection error"
+
+
+class AdaptiveConcurrency:
+    """AIMD limit on concurrent image transfers, bounded by ``max_limit``.
+
+    The limit grows by one after ``limit`` consecutive fast successes and is
+    halved on 429s, 5xx responses, timeouts, connection errors or latency
+    spikes (a success slower than ``latency_factor`` times the running
+    baseline). Transfers already in flight when the limit drops must finish
+    before it can drop again, so one burst of errors only halves it once.
+
+    Latency is the ``ttfb`` phase of the ``RequestTiming`` that ``track``
+    yields: rate limiting, connection slot and byte budget waits grow with
+    concurrency on our side, and transfer time grows with image size, so
+    neither says anything about the server.
+    """
+
+    def __init__(self, max_limit: int, initial_limit: int = 1, latency_factor: float = 3.0):
+        self.max_limit = max_limit
+        self.limit = max(1, min(initial_limit, max_limit))
+        self.latency_factor = latency_factor
+        self.trajectory: list[int] = [self.limit]
+        self._in_flight = 0
+        self._successes = 0
+        self._draining = 0
+        self._baseline: float | None = None
+        self._condition = threading.Condition()
+        self._async_waiters: list[tuple[asyncio.AbstractEventLoop, asyncio.Future[None]]] = []
+
+    def try_acquire(self) -> bool:
+        with self._condition:
+            if self._in_flight >= self.limit:
+                return False
+            self._in_flight += 1
+            return True
+
+    def acquire(self) -> None:
+        with self._condition:
+            self._condition.wait_for(lambda: self._in_flight < self.limit)
+            self._in_flight += 1
+
+    def release(self, latency: float | None, reason: str | None = None) -> None:
+        """Finish a transfer: ``latency`` for a success, ``reason`` for congestion."""
+        with self._condition:
+            self._in_flight -= 1
+            self._draining = max(0, self._draining - 1)
+            if reason is None and latency is not None:
+                if self._baseline is not None and latency > self._baseline * self.latency_factor:
+                    reason = f"latency {latency:.2f}s"
+                else:
+                    self._baseline = (
+                        latency if self._baseline is None else 0.9 * self._baseline + 0.1 * latency
+                    )
+                    self._successes += 1
+                    if self._successes >= self.limit and self.limit < self.max_limit:
+                        self._set_limit(self.limit + 1, "steady")
+            if reason is not None and self._draining == 0:
+                self._set_limit(max(1, self.limit // 2), reason)
+                self._draining = self._in_flight
+            self._condition.notify_all()
+            waiters, self._async_waiters = self._async_waiters, []
+        for loop, waiter in waiters:
+            loop.call_soon_threadsafe(_resolve_waiter, waiter)
+
+    def _set_limit(self, limit: int, reason: str) -> None:
+        self._successes = 0
+        if limit == self.limit:
+            return
+        print(f"Adaptive concurrency: {self.limit} -> {limit} ({reason})")
+        self.limit = limit
+        self.trajectory.append(limit)
+
+    @contextmanager
+    def track(self) -> Generator[RequestTiming]:
+        """Hold a transfer slot; pass the yielded timing to the fetch it covers."""
+        self.acquire()
+        timing = RequestTiming()
+        try:
+            yield timing
+        except urllib.error.URLError as error:
+            self.release(None, congestion_reason(error))
+            raise
+        except BaseException:
+            self.release(None)
+            raise
+        self.release(timing.phases.get("ttfb", 0.0))
+
+    @asynccontextmanager
+    async def track_async(self) -> AsyncGenerator[RequestTiming]:
+        """``track`` for coroutines; safe to share between event loops and threads."""
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._condition:
+                if self.try_acquire():
+                    break
+                waiter: asyncio.Future[None] = loop.create_future()
+                self._async_waiters.append((loop, waiter))
+            await waiter
+        timing = RequestTiming()
+        try:
+            yield timing
+        except urllib.error.URLError as error:
+            self.release(None, congestion_reason(error))
+            raise
+        except BaseException:
+            self.release(None)
+            raise
+        else:
+            self.release(timing.phases.get("ttfb", 0.0))
 
 
 def debug_http_requests() -> None:
-    http_handler = urllib.request.HTTPHandler(debuglevel=1)
-    https_handler = urllib.request.HTTPSHandler(debuglevel=1)
-    opener = urllib.request.build_opener(http_handler, https_handler)
-    urllib.request.install_opener(opener)
+    HTTP_POOL.debuglevel = 1
+
+
+class AsyncHTTPClient:
+    """Keep-alive HTTP/1.1 client on asyncio streams, used by ``--engine async``.
+
+    It mirrors ``HTTPConnectionPool``: connections are reused per host, the
+    number of connections per host is bounded by a semaphore, redirects are
+    followed, and failures raise ``urllib.error.HTTPError``/``URLError``.
+    Streamed bodies are hashed and written on worker threads so the event
+    loop only moves bytes.
+    """
+
+    def __init__(self, max_connections_per_host: int = 1) -> None:
+        self.max_connections_per_host = max_connections_per_host
+        self.connections_opened = 0
+        self.requests_served = 0
+        self._idle: dict[
+            tuple[str, str], list[tuple[asyncio.StreamReader, asyncio.StreamWriter]]
+        ] = {}
+        self._slots: dict[tuple[str, str], asyncio.Semaphore] = {}
+        self._transfers: dict[tuple[str, str], asyncio.Semaphore] = {}
+        self._ssl_context = ssl.create_default_context()
+
+    def close(self) -> None:
+        for connections in self._idle.values():
+            for _, writer in connections:
+                writer.close()
+        self._idle.clear()
+
+    def transfer_slot(self, url: str) -> asyncio.Semaphore:
+        """Bound the image transfers per host, from opening the file to saving it.
+
+        Holding one before ``sink.start`` keeps the open ``.part`` files and
+        byte budget reservations down to transfers that can get a connection.
+        """
+        parsed = urllib.parse.urlsplit(url)
+        key = (parsed.scheme, parsed.netloc)
+        return self._transfers.setdefault(key, asyncio.Semaphore(self.max_connections_per_host))
+
+    async def _connect(
+        self, key: tuple[str, str], timing: RequestTiming
+    ) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        scheme, netloc = key
+        parsed = urllib.parse.urlsplit(f"{scheme}://{netloc}")
+        port = parsed.port or (443 if scheme == "https" else 80)
+        ssl_context = self._ssl_context if scheme == "https" else None
+        with timing.phase("connect"):
+            connection = await asyncio.open_connection(parsed.hostname, port, ssl=ssl_context)
+        self.connections_opened += 1
+        return connection
+
+    async def _exchange(
+        self,
+        key: tuple[str, str],
+        connection: tuple[asyncio.StreamReader, asyncio.StreamWriter],
+        target: str,
+        headers: dict[str, str],
+        timing: RequestTiming,
+        destination: ByteSink | None = None,
+        reservation: BudgetReservation | None = None,
+    ) -> tuple[int, str, http.client.HTTPMessage, bytes]:
+        reader, writer = connection
+        request_lines = [f"GET {target} HTTP/1.1", f"Host: {key[1]}"]
+        request_lines += [f"{name}: {value}" for name, value in headers.items()]
+        with timing.phase("ttfb"):
+            writer.write(("\r\n".join(request_lines) + "\r\n\r\n").encode("latin-1"))
+            await writer.drain()
+            head = await reader.readuntil(b"\r\n\r\n")
+        status_line, _, header_block = head.partition(b"\r\n")
+        version, status_text, *reason = status_line.decode("latin-1").split(" ", 2)
+        status = int(status_text)
+        message = email.parser.BytesParser(_class=http.client.HTTPMessage).parsebytes(header_block)
+
+        reusable = version == "HTTP/1.1" and message.get("Connection", "").lower() != "close"
+        if message.get("Content-Length") is None and status not in (204, 304):
+            reusable = reusable and "chunked" in message.get("Transfer-Encoding", "").lower()
+
+        # Successful bodies go straight to ``destination`` when one is given;
+        # everything else (errors, redirects, pages) is buffered as before.
+        if destination is not None and 200 <= status < 300:
+            decoder = ContentDecoder(message.get("Content-Encoding", ""))
+            if reservation is not None:
+                BYTE_BUDGET.resize(reservation, expected_body_size(message))
+            with timing.phase("transfer"):
+                async for chunk in self._iter_body(reader, message, status):
+                    await asyncio.to_thread(self._write_body, destination, decoder.decode(chunk))
+                await asyncio.to_thread(destination.write, decoder.flush())
+            body = b""
+        else:
+            with timing.phase("transfer"):
+                chunks = [chunk async for chunk in self._iter_body(reader, message, status)]
+            body = b"".join(chunks)
+
+        if reusable:
+            self._idle.setdefault(key, []).append(connection)
+        else:
+            writer.close()
+        self.requests_served += 1
+        return status, reason[0] if reason else "", message, body
+
+    @staticmethod
+    def _write_body(destination: ByteSink, pieces: Iterable[bytes]) -> None:
+        for piece in pieces:
+            destination.write(piece)
+
+    @staticmethod
+    async def _iter_body(
+        reader: asyncio.StreamReader,
+        message: http.client.HTTPMessage,
+        status: int,
+    ) -> AsyncIterator[bytes]:
+        if status in (204, 304):
+            return
+        if "chunked" in message.get("Transfer-Encoding", "").lower():
+            while True:
+                size = int((await reader.readline()).split(b";")[0].strip(), 16)
+                if size == 0:
+                    while (await reader.readline()) not in (b"\r\n", b""):
+                        pass
+                    return
+                while size > 0:
+                    chunk = await reader.readexactly(min(size, CHUNK_SIZE))
+                    size -= len(chunk)
+                    yield chunk
+                await reader.readexactly(2)
+        elif message.get("Content-Length") is not None:
+            remaining = int(message["Content-Length"])
+            while remaining > 0:
+                chunk = await reader.readexactly(min(remaining, CHUNK_SIZE))
+                remaining -= len(chunk)
+                yield chunk
+        else:
+            while chunk := await reader.read(CHUNK_SIZE):
+                yield chunk
+
+    async def _roundtrip(
+        self,
+        key: tuple[str, str],
+        target: str,
+        headers: dict[str, str],
+        timing: RequestTiming,
+        destination: ByteSink | None = None,
+        reservation: BudgetReservation | None = None,
+    ) -> tuple[int, str, http.client.HTTPMessage, bytes]:
+        idle = self._idle.get(key)
+        if idle:
+            connection = idle.pop()
+            try:
+                return await self._exchange(
+                    key, connection, target, headers, timing, destination, reservation
+                )
+            except (OSError, asyncio.IncompleteReadError):
+                # The server dropped an idle keep-alive connection; retry on a fresh one.
+                connection[1].close()
+                if destination is not None and destination.tell() > 0:
+                    raise
+            except BaseException:
+                connection[1].close()
+                raise
+        connection = await self._connect(key, timing)
+        try:
+            return await self._exchange(
+                key, connection, target, headers, timing, destination, reservation
+            )
+        except BaseException:
+            connection[1].close()
+            raise
+
+    async def fetch(
+        self,
+        request: urllib.request.Request,
+        timeout: float = DEFAULT_TIMEOUT,
+    ) -> tuple[int, str, bytes]:
+        status, content_type, body, _ = await self._fetch(request, timeout)
+        return status, content_type, body
+
+    async def stream(
+        self,
+        request: urllib.request.Request,
+        destination: ByteSink,
+        timeout: float = DEFAULT_TIMEOUT,
+        attempt: int = 1,
+        timing: RequestTiming | None = None,
+    ) -> tuple[int, str, int]:
+        """Async counterpart of ``stream_page_content``."""
+        status, content_type, _, written = await self._fetch(
+            request, timeout, destination, attempt, timing
+        )
+        return status, content_type, written
+
+    async def _fetch(
+        self,
+        request: urllib.request.Request,
+        timeout: float,
+        destination: ByteSink | None = None,
+        attempt: int = 1,
+        timing: RequestTiming | None = None,
+    ) -> tuple[int, str, bytes, int]:
+        with METRICS.track(request.full_url, attempt, timing) as timing:
+            if destination is None:
+                result = await self._fetch_timed(request, timeout, timing)
+            else:
+                # Like stream_page_content, wait for byte budget before taking a connection.
+                async with BYTE_BUDGET.reserve_async() as reservation:
+                    result = await self._fetch_timed(
+                        request, timeout, timing, destination, reservation
+                    )
+            timing.bytes = result[3]
+            return result
+
+    async def _fetch_timed(
+        self,
+        request: urllib.request.Request,
+        timeout: float,
+        timing: RequestTiming,
+        destination: ByteSink | None = None,
+        reservation: BudgetReservation | None = None,
+    ) -> tuple[int, str, bytes, int]:
+        url = request.full_url
+        headers = dict(request.header_items())
+        delay = RATE_LIMITER.reserve(url)
+        if delay > 0:
+            with timing.phase("throttle"):
+                await asyncio.sleep(delay)
+        start = destination.tell() if destination is not None else 0
+        for _ in range(MAX_REDIRECTS + 1):
+            parsed = urllib.parse.urlsplit(url)
+            if parsed.scheme not in ("http", "https"):
+                raise urllib.error.URLError(f"unsupported URL scheme: {url}")
+            key = (parsed.scheme, parsed.netloc)
+            target = urllib.parse.urlunsplit(("", "", parsed.path or "/", parsed.query, ""))
+
+            slot = self._slots.setdefault(key, asyncio.Semaphore(self.max_connections_per_host))
+            if slot.locked():
+                with timing.phase("queue"):
+                    await slot.acquire()
+            else:
+                await slot.acquire()
+            try:
+                try:
+                    async with asyncio.timeout(timeout):
+                        status, reason, message, body = await self._roundtrip(
+                            key, target, headers, timing, destination, reservation
+                        )
+                except (
+                    OSError,
+                    ValueError,
+                    asyncio.IncompleteReadError,
+                    asyncio.LimitOverrunError,
+                ) as error:
+                    raise urllib.error.URLError(error) from error
+            finally:
+                slot.release()
+
+            location = message.get("Location")
+            if status in REDIRECT_STATUSES and location:
+                url = urllib.parse.urljoin(url, location)
+                continue
+            timing.status = status
+            if status >= 400:
+                raise urllib.error.HTTPError(url, status, reason, message, io.BytesIO(body))
+            if destination is not None:
+                return status, message.get_content_type(), b"", destination.tell() - start
+            try:
+                payload = decode_content(body, message.get("Content-Encoding", ""))
+            except (OSError, EOFError) as error:
+                raise urllib.error.URLError(error) from error
+            return status, message.get_content_type(), payload, len(payload)
+
+        raise urllib.error.URLError(f"too many redirects: {request.full_url}")
 
 
 def normalize_url(url: str) -> str:
@@ -59,423 +1268,2696 @@ def request_url(url: str) -> urllib.request.Request:
     return urllib.request.Request(normalize_url(url), headers=DEFAULT_HEADERS)
 
 
-def request_url_with_headers(url: str, headers: dict[str, str]) -> urllib.request.Request:
-    request_headers = {**DEFAULT_HEADERS, **headers}
-    return urllib.request.Request(normalize_url(url), headers=request_headers)
+def request_url_with_headers(url: str, headers: dict[str, str]) -> urllib.request.Request:
+    request_headers = {**DEFAULT_HEADERS, **headers}
+    return urllib.request.Request(normalize_url(url), headers=request_headers)
+
+
+def decode_content(payload: bytes, encoding: str) -> bytes:
+    if encoding == "gzip":
+        return gzip.decompress(payload)
+
+    if payload.startswith(b"\x1f\x8b"):
+        return gzip.decompress(payload)
+
+    return payload
+
+
+class ContentDecoder:
+    """Incrementally undoes gzip ``Content-Encoding`` (or sniffed gzip) on a body."""
+
+    def __init__(self, encoding: str) -> None:
+        self.encoding = encoding
+        self._decompressor: Any = None
+        self._started = False
+
+    def decode(self, chunk: bytes) -> Iterator[bytes]:
+        """Yield the decoded form of ``chunk`` in pieces of at most ``CHUNK_SIZE``."""
+        if not self._started:
+            self._started = True
+            if self.encoding == "gzip" or chunk.startswith(b"\x1f\x8b"):
+                self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        if self._decompressor is None:
+            yield chunk
+            return
+        try:
+            while chunk:
+                yield self._decompressor.decompress(chunk, CHUNK_SIZE)
+                chunk = self._decompressor.unconsumed_tail
+        except zlib.error as error:
+            raise OSError(f"invalid gzip body: {error}") from error
+
+    def flush(self) -> bytes:
+        if self._decompressor is None:
+            return b""
+        if not self._decompressor.eof:
+            raise OSError("truncated gzip body")
+        return self._decompressor.flush()
+
+
+def read_response_content(response: Any) -> bytes:
+    payload = response.read()
+    encoding = response.info().get("Content-Encoding", "")
+    return decode_content(payload, encoding)
+
+
+@contextmanager
+def timed_response(
+    request: urllib.request.Request, timeout: float, timing: RequestTiming
+) -> Generator[http.client.HTTPResponse]:
+    """Pace ``request`` and open it through ``HTTP_POOL``, filling in ``timing``."""
+    delay = RATE_LIMITER.reserve(request.full_url)
+    if delay > 0:
+        with timing.phase("throttle"):
+            time.sleep(delay)
+    with HTTP_POOL.open(request, timeout=timeout, timing=timing) as response:
+        yield response
+
+
+def fetch_request(
+    request: urllib.request.Request,
+    timeout: float = DEFAULT_TIMEOUT,
+) -> tuple[int, str, bytes]:
+    with (
+        METRICS.track(request.full_url) as timing,
+        timed_response(request, timeout, timing) as response,
+    ):
+        status = response.status
+        content_type = response.headers.get_content_type()
+        try:
+            with timing.phase("transfer"):
+                payload = read_response_content(response)
+        except (http.client.HTTPException, OSError) as error:
+            raise urllib.error.URLError(error) from error
+        timing.bytes = len(payload)
+        return status, content_type, payload
+
+
+def get_page_content(url: str, timeout: float = DEFAULT_TIMEOUT) -> tuple[int, str, bytes]:
+    return fetch_request(request_url(url), timeout=timeout)
+
+
+def stream_page_content(
+    url: str,
+    destination: ByteSink,
+    timeout: float = DEFAULT_TIMEOUT,
+    attempt: int = 1,
+    timing: RequestTiming | None = None,
+) -> tuple[int, str, int]:
+    """Copy the decoded body of ``url`` into ``destination`` in ``CHUNK_SIZE`` pieces.
+
+    Returns the status, content type and number of bytes written, so memory use
+    stays constant whatever the size of the image. The request is only sent once
+    ``BYTE_BUDGET`` has room for it. ``timing`` is filled in when given.
+    """
+    request = request_url(url)
+    with (
+        METRICS.track(request.full_url, attempt, timing) as timing,
+        BYTE_BUDGET.reserve() as reservation,
+        timed_response(request, timeout, timing) as response,
+    ):
+        BYTE_BUDGET.resize(reservation, expected_body_size(response.headers))
+        status = response.status
+        content_type = response.headers.get_content_type()
+        decoder = ContentDecoder(response.headers.get("Content-Encoding", ""))
+        written = 0
+        try:
+            with timing.phase("transfer"):
+                while chunk := response.read(CHUNK_SIZE):
+                    for piece in decoder.decode(chunk):
+                        written += destination.write(piece)
+                # read(amt) returns b"" when the connection drops mid-body instead of
+                # raising, leaving the unread part of Content-Length in ``length``.
+                if response.length:
+                    raise http.client.IncompleteRead(b"", response.length)
+                written += destination.write(decoder.flush())
+        except (http.client.HTTPException, OSError) as error:
+            raise urllib.error.URLError(error) from error
+        finally:
+            timing.bytes = written
+        return status, content_type, written
+
+
+def get_page_content_with_headers(
+    url: str,
+    headers: dict[str, str],
+    timeout: float = DEFAULT_TIMEOUT,
+) -> tuple[int, str, bytes]:
+    return fetch_request(request_url_with_headers(url, headers), timeout=timeout)
+
+
+def get_page_content_conditionally(
+    url: str,
+    validators: dict[str, str],
+    timeout: float = DEFAULT_TIMEOUT,
+) -> tuple[int, dict[str, str], bytes]:
+    """Revalidate ``url`` against cached ``etag``/``last_modified`` validators.
+
+    Returns the status, the validators sent back by the server and the body,
+    which is empty for a ``304 Not Modified``.
+    """
+    headers = {}
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+    request = request_url_with_headers(url, headers)
+    with (
+        METRICS.track(request.full_url) as timing,
+        timed_response(request, timeout, timing) as response,
+    ):
+        status = response.status
+        fresh_validators = {
+            name: value
+            for name, value in (
+                ("etag", response.headers.get("ETag")),
+                ("last_modified", response.headers.get("Last-Modified")),
+            )
+            if value
+        }
+        try:
+            with timing.phase("transfer"):
+                payload = b"" if status == 304 else read_response_content(response)
+        except (http.client.HTTPException, OSError) as error:
+            raise urllib.error.URLError(error) from error
+        timing.bytes = len(payload)
+        return status, fresh_validators or validators, payload
+
+
+def parse_html(markup: bytes | str, parse_only: SoupStrainer | None = None) -> BeautifulSoup:
+    return BeautifulSoup(markup, HTML_PARSER, parse_only=parse_only)
+
+
+def get_page_soup(
+    url: str,
+    timeout: float = DEFAULT_TIMEOUT,
+    parse_only: SoupStrainer | None = None,
+) -> BeautifulSoup:
+    _, _, page_content = get_page_content(url, timeout=timeout)
+    return parse_html(page_content, parse_only)
+
+
+def manga_to_slug(manga_name: str) -> str:
+    def replacer(value: str, key: str) -> str:
+        return value.replace(key, "_")
+
+    return reduce(replacer, [" ", "-"], manga_name.lower())
+
+
+def default_cache_dir() -> Path:
+    cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_home) / "mfdl"
+
+
+def write_text_atomically(path: Path, text: str) -> None:
+    temporary = tempfile.NamedTemporaryFile(
+        "w", dir=path.parent, prefix=f".{path.name}.", suffix=".tmp", delete=False
+    )
+    try:
+        with temporary:
+            temporary.write(text)
+        os.replace(temporary.name, path)
+    except BaseException:
+        os.unlink(temporary.name)
+        raise
+
+
+def write_json_atomically(path: Path, data: Any) -> None:
+    write_text_atomically(path, json.dumps(data, indent=2, sort_keys=True))
+
+
+class SeriesPageCache:
+    """On-disk cache of parsed series pages, one JSON file per manga slug.
+
+    Each entry keeps the page's ``ETag``/``Last-Modified`` validators and the
+    parsed chapter map. Entries younger than ``ttl`` seconds are used as-is;
+    older ones are revalidated with a conditional GET, so an unchanged series
+    costs a ``304`` instead of a full download and parse.
+    """
+
+    def __init__(self, cache_dir: Path, ttl: float = 0.0) -> None:
+        self.directory = cache_dir / "series"
+        self.ttl = ttl
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+
+    def _path(self, manga_slug: str) -> Path:
+        return self.directory / f"{manga_slug}.json"
+
+    def load(self, manga_slug: str) -> dict[str, Any] | None:
+        path = self._path(manga_slug)
+        if not path.exists():
+            return None
+        try:
+            entry = json.loads(path.read_text())
+            entry["chapters"] = [(float(number), str(href)) for number, href in entry["chapters"]]
+        except (OSError, ValueError, KeyError, TypeError):
+            print(f"Warning: ignoring unreadable series cache {path}")
+            return None
+        return entry
+
+    def is_fresh(self, entry: dict[str, Any]) -> bool:
+        return time.time() - float(entry.get("fetched_at", 0)) < self.ttl
+
+    def store(
+        self,
+        manga_slug: str,
+        validators: dict[str, str],
+        chapters: OrderedDict[float, str],
+    ) -> None:
+        entry = {
+            **validators,
+            "fetched_at": time.time(),
+            "chapters": list(chapters.items()),
+        }
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            write_json_atomically(self._path(manga_slug), entry)
+        except OSError as error:
+            print(f"Warning: unable to write series cache: {error}")
+
+
+class ChapterResolution:
+    """Image URLs gathered while resolving one chapter."""
+
+    def __init__(self) -> None:
+        self.image_urls: list[tuple[int, str]] = []
+        self.complete = True
+
+
+class ResolutionCache:
+    """SQLite cache mapping chapter URLs to their resolved image URLs.
+
+    Entries older than ``ttl`` seconds are ignored, and a chapter is dropped as
+    soon as one of its image URLs answers 403 or 404 so that the next run
+    resolves it again. The cache is disabled until ``configure`` is given a path.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS chapters (
+            chapter_url TEXT PRIMARY KEY,
+            resolved_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS images (
+            chapter_url TEXT NOT NULL,
+            idx INTEGER NOT NULL,
+            url TEXT NOT NULL,
+            PRIMARY KEY (chapter_url, idx)
+        );
+        CREATE INDEX IF NOT EXISTS images_by_url ON images (url);
+    """
+
+    def __init__(self, path: Path | None = None, ttl: float = DEFAULT_RESOLUTION_TTL) -> None:
+        self._connection: sqlite3.Connection | None = None
+        self.configure(path, ttl)
+
+    def configure(self, path: Path | None = None, ttl: float = DEFAULT_RESOLUTION_TTL) -> None:
+        self.close()
+        self.path = path
+        self.ttl = ttl
+        self.hits = 0
+        self.stores = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def _connect(self) -> sqlite3.Connection | None:
+        if self._connection is None and self.path is not None:
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                connection = sqlite3.connect(self.path, check_same_thread=False)
+                connection.executescript(self.SCHEMA)
+            except (OSError, sqlite3.Error) as error:
+                print(f"Warning: disabling image URL cache {self.path}: {error}")
+                self.path = None
+                return None
+            self._connection = connection
+        return self._connection
+
+    def lookup(self, url_fragment: str) -> list[tuple[int, str]] | None:
+        chapter_url = normalize_url(url_fragment)
+        with self._lock:
+            connection = self._connect()
+            if connection is None:
+                return None
+            row = connection.execute(
+                "SELECT resolved_at FROM chapters WHERE chapter_url = ?", (chapter_url,)
+            ).fetchone()
+            if row is None or time.time() - row[0] >= self.ttl:
+                return None
+            image_urls = connection.execute(
+                "SELECT idx, url FROM images WHERE chapter_url = ? ORDER BY idx", (chapter_url,)
+            ).fetchall()
+            self.hits += 1
+        return [(index, url) for index, url in image_urls]
+
+    def store(self, url_fragment: str, resolution: ChapterResolution) -> None:
+        if not resolution.complete or not resolution.image_urls:
+            return
+        chapter_url = normalize_url(url_fragment)
+        with self._lock:
+            connection = self._connect()
+            if connection is None:
+                return
+            with connection:
+                connection.execute("DELETE FROM images WHERE chapter_url = ?", (chapter_url,))
+                connection.execute(
+                    "INSERT OR REPLACE INTO chapters VALUES (?, ?)",
+                    (chapter_url, time.time()),
+                )
+                connection.executemany(
+                    "INSERT INTO images VALUES (?, ?, ?)",
+                    [(chapter_url, index, url) for index, url in resolution.image_urls],
+                )
+            self.stores += 1
+
+    def invalidate_image(self, image_url: str) -> None:
+        """Forget every chapter that resolved to ``image_url``."""
+        with self._lock:
+            connection = self._connect()
+            if connection is None:
+                return
+            with connection:
+                chapter_urls = connection.execute(
+                    "SELECT DISTINCT chapter_url FROM images WHERE url = ?", (image_url,)
+                ).fetchall()
+                for (chapter_url,) in chapter_urls:
+                    connection.execute("DELETE FROM images WHERE chapter_url = ?", (chapter_url,))
+                    connection.execute("DELETE FROM chapters WHERE chapter_url = ?", (chapter_url,))
+            self.invalidations += len(chapter_urls)
+
+
+RESOLUTION_CACHE = ResolutionCache()
+
+
+@timed_step("get_chapter_urls")
+def get_chapter_urls(
+    manga_name: str,
+    timeout: float = DEFAULT_TIMEOUT,
+    cache: SeriesPageCache | None = None,
+) -> OrderedDict[float, str]:
+    manga_slug = manga_to_slug(manga_name)
+    url = f"{URL_BASE}manga/{manga_slug}/"
+
+    if cache is None:
+        _, _, page_content = get_page_content(url, timeout=timeout)
+        return parse_chapter_urls(parse_series_page(page_content, manga_slug), manga_name, timeout)
+
+    entry = cache.load(manga_slug)
+    if entry is not None and cache.is_fresh(entry):
+        cache.hits += 1
+        return OrderedDict(entry["chapters"])
+
+    validators = {
+        name: entry[name] for name in ("etag", "last_modified") if entry and entry.get(name)
+    }
+    status, validators, page_content = get_page_content_conditionally(
+        url, validators, timeout=timeout
+    )
+    if status == 304 and entry is not None:
+        cache.revalidated += 1
+        chapters = OrderedDict(entry["chapters"])
+    else:
+        cache.misses += 1
+        soup = parse_series_page(page_content, manga_slug)
+        chapters = parse_chapter_urls(soup, manga_name, timeout)
+    cache.store(manga_slug, validators, chapters)
+    return chapters
+
+
+def chapter_link_pattern(manga_slug: str) -> re.Pattern[str]:
+    return re.compile(rf"/{manga_slug}/(.*/)?c\d+/.*\.html")
+
+
+SERIES_NOTICE_PATTERN = re.compile(
+    rb"""\b(?:name|id)\s*=\s*["']?searchform\b"""
+    rb"""|\bclass\s*=\s*["']?(?:[^"'>]*\s)?warning\b""",
+    re.I,
+)
+
+
+def parse_series_page(page_content: bytes, manga_slug: str) -> BeautifulSoup:
+    """Parse a series page, keeping only its chapter links when that is all it can hold.
+
+    The search form and licence warning that ``parse_chapter_urls`` looks for
+    are rare, so the full tree is only built when their attributes appear.
+    """
+    with METRICS.time_parse("parse_series_page"):
+        if SERIES_NOTICE_PATTERN.search(page_content):
+            return parse_html(page_content)
+        return parse_html(page_content, SoupStrainer("a", href=chapter_link_pattern(manga_slug)))
+
+
+def parse_chapter_urls(
+    soup: BeautifulSoup,
+    manga_name: str,
+    timeout: float = DEFAULT_TIMEOUT,
+) -> OrderedDict[float, str]:
+    manga_slug = manga_to_slug(manga_name)
+    manga_does_not_exist = soup.find("form", {"name": "searchform"})
+    if manga_does_not_exist:
+        search_sort_options = "sort=views&order=za"
+        search_url = f"{URL_BASE}search?name={manga_slug}&{search_sort_options}"
+        soup = get_page_soup(search_url, timeout=timeout, parse_only=SEARCH_RESULT_STRAINER)
+        results = soup.find_all("a", {"class": "series_preview"})
+        error_text = f"Error: Manga '{manga_name}' does not exist"
+        error_text += "\nDid you mean one of the following?\n  * "
+        error_text += "\n  * ".join([manga.text for manga in results][:10])
+        raise SystemExit(error_text)
+
+    warning = soup.find("div", {"class": "warning"})
+    if warning and warning.text and "licensed" in warning.text.lower():
+        raise SystemExit(f"Error: {warning.text}")
+
+    links = soup.find_all("a", href=chapter_link_pattern(manga_slug))
+    if not links:
+        raise SystemExit("Error: Manga either does not exist or has no chapters")
+
+    chapters: OrderedDict[float, str] = OrderedDict()
+    for link in links:
+        if link.get("class"):
+            continue
+        href = link.get("href")
+        if not isinstance(href, str):
+            continue
+        chapter_id = get_chapter_number(href)
+        if chapter_id is None:
+            continue
+        chapters[chapter_id] = href
+
+    if not chapters:
+        raise SystemExit("Error: Manga has no chapters")
+
+    return OrderedDict(sorted(chapters.items()))
+
+
+def get_page_numbers(soup: BeautifulSoup) -> list[int]:
+    page_select = soup.find("select", {"class": "mangaread-page"})
+    if page_select:
+        return [
+            int(option.text) for option in page_select.find_all("option") if option.text.isdigit()
+        ]
+
+    old_page_select = soup.find("select", {"class": "m"})
+    if old_page_select:
+        page_numbers: list[int] = []
+        for option in old_page_select.find_all("option"):
+            value = option.get("value")
+            if isinstance(value, str) and value.isdigit():
+                page_numbers.append(int(value))
+        return page_numbers
+
+    raise SystemExit("Error: Unable to determine page list")
+
+
+def worker_pool(
+    workers: int,
+    executor: concurrent.futures.Executor | None = None,
+) -> AbstractContextManager[concurrent.futures.Executor]:
+    """Return the shared executor if one is given, otherwise a private thread pool."""
+    if executor is not None:
+        return nullcontext(executor)
+    return concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+
+
+def iter_concurrently(
+    function: Callable[[T], R],
+    items: Iterable[T],
+    workers: int = 1,
+    executor: concurrent.futures.Executor | None = None,
+) -> Iterator[R]:
+    """Yield ``function(item)`` for each item as soon as it completes."""
+    if workers == 1 and executor is None:
+        for item in items:
+            yield function(item)
+        return
+    with worker_pool(workers, executor) as pool:
+        futures = [pool.submit(function, item) for item in items]
+        for future in concurrent.futures.as_completed(futures):
+            yield future.result()
+
+
+def get_page_image_url(soup: BeautifulSoup) -> str | None:
+    viewer_div = soup.find("div", id="viewer")
+    image = None
+    if viewer_div:
+        image = viewer_div.find("img")
+    if image is None:
+        image = soup.find("img", {"id": "image"})
+
+    if image is None:
+        return None
+    src = image.get("src")
+    return src if isinstance(src, str) and src else None
+
+
+def extract_chapter_page(markup: bytes) -> tuple[list[int] | None, str | None]:
+    """Return the page list (``None`` if there is none) and image URL of a chapter's page."""
+    soup = parse_html(markup)
+    try:
+        pages = get_page_numbers(soup)
+    except SystemExit:
+        return None, None
+    return pages, get_page_image_url(soup)
+
+
+def extract_page_image_url(markup: bytes) -> str | None:
+    return get_page_image_url(parse_html(markup, PAGE_IMAGE_STRAINER))
+
+
+class ParserPool:
+    """Runs CPU-bound parsing and unpacking inline or in worker processes.
+
+    With ``processes`` set, fetch threads hand raw page bytes to a
+    ``ProcessPoolExecutor`` and get back only the extracted values, so parsing
+    no longer competes with network I/O for the GIL. Functions passed to
+    ``run`` must be importable module-level functions.
+    """
+
+    def __init__(self, processes: int = 0) -> None:
+        self._executor: concurrent.futures.ProcessPoolExecutor | None = None
+        self.configure(processes)
+
+    def configure(self, processes: int = 0) -> None:
+        self.shutdown()
+        self.processes = processes
+        if processes > 0:
+            # spawn avoids forking a process that already runs worker threads.
+            self._executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=processes, mp_context=multiprocessing.get_context("spawn")
+            )
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    def run(self, function: Callable[..., R], *args: Any) -> R:
+        with METRICS.time_parse(getattr(function, "__name__", repr(function))):
+            if self._executor is None:
+                return function(*args)
+            return self._executor.submit(function, *args).result()
+
+    async def run_async(self, function: Callable[..., R], *args: Any) -> R:
+        with METRICS.time_parse(getattr(function, "__name__", repr(function))):
+            if self._executor is None:
+                return function(*args)
+            return await asyncio.wrap_future(self._executor.submit(function, *args))
+
+
+PARSER_POOL = ParserPool()
+
+
+def get_chapter_image_urls(
+    url_fragment: str,
+    timeout: float = DEFAULT_TIMEOUT,
+    workers: int = 1,
+    executor: concurrent.futures.Executor | None = None,
+) -> list[str]:
+    resolved = iter_chapter_image_urls(
+        url_fragment, timeout=timeout, workers=workers, executor=executor
+    )
+    return [image_url for _, image_url in sorted(resolved)]
+
+
+@timed_generator("get_chapter_image_urls")
+def iter_chapter_image_urls(
+    url_fragment: str,
+    timeout: float = DEFAULT_TIMEOUT,
+    workers: int = 1,
+    executor: concurrent.futures.Executor | None = None,
+) -> Iterator[tuple[int, str]]:
+    """Yield ``(index, image_url)`` pairs as chapter pages resolve, in any order.
+
+    Chapters found in ``RESOLUTION_CACHE`` are replayed without any request.
+    """
+    cached = RESOLUTION_CACHE.lookup(url_fragment)
+    if cached is not None:
+        yield from cached
+        return
+
+    resolution = ChapterResolution()
+    for index, image_url in resolve_chapter_image_urls(
+        url_fragment, timeout, workers, executor, resolution
+    ):
+        resolution.image_urls.append((index, image_url))
+        yield index, image_url
+    RESOLUTION_CACHE.store(url_fragment, resolution)
+
+
+def resolve_chapter_image_urls(
+    url_fragment: str,
+    timeout: float,
+    workers: int,
+    executor: concurrent.futures.Executor | None,
+    resolution: ChapterResolution,
+) -> Iterator[tuple[int, str]]:
+    chapter_number = get_chapter_number(url_fragment)
+    if chapter_number is None:
+        raise SystemExit(f"Error: invalid chapter URL fragment: {url_fragment}")
+
+    _, _, chapter_content = get_page_content(url_fragment, timeout=timeout)
+    pages, chapter_image_url = PARSER_POOL.run(extract_chapter_page, chapter_content)
+    if pages is None:
+        yield from iter_chapter_image_urls_desktop(
+            url_fragment, timeout=timeout, workers=workers, executor=executor, resolution=resolution
+        )
+        return
+
+    chapter_base_url = os.path.dirname(url_fragment.rstrip("/")) + "/"
+    chapter_url = normalize_url(url_fragment)
+
+    def page_url_for(page: int) -> str:
+        return f"{chapter_base_url}{page}.html"
+
+    def resolve_page(indexed_page: tuple[int, int]) -> tuple[int, str | None]:
+        index, page = indexed_page
+        page_url = page_url_for(page)
+        if normalize_url(page_url) == chapter_url:
+            image_url = chapter_image_url
+        else:
+            _, _, page_content = get_page_content(page_url, timeout=timeout)
+            image_url = PARSER_POOL.run(extract_page_image_url, page_content)
+
+        if image_url is None:
+            print(f"Warning: image not found for page {page_url}")
+        return index, image_url
+
+    # The page parsed above needs no request, so hand it out before the rest.
+    indexed_pages = list(enumerate(pages))
+    parsed_pages = [
+        item for item in indexed_pages if normalize_url(page_url_for(item[1])) == chapter_url
+    ]
+    remaining_pages = [item for item in indexed_pages if item not in parsed_pages]
+    for index, image_url in itertools.chain(
+        map(resolve_page, parsed_pages),
+        iter_concurrently(resolve_page, remaining_pages, workers, executor),
+    ):
+        if image_url is None:
+            resolution.complete = False
+        else:
+            yield index, image_url
+
+
+PACKER_PATTERN = re.compile(r"\}\('(.*)',(\d+),(\d+),'(.*)'\.split\('\|'\),0,\{\}\)\)", re.S)
+PACKER_TOKEN_PATTERN = re.compile(r"\b\w+\b")
+PIX_PATTERN = re.compile(r'var\s+pix\s*=\s*"([^"]+)";')
+PVALUE_PATTERN = re.compile(r"var\s+pvalue\s*=\s*\[(.*?)\];", re.S)
+QUOTED_VALUE_PATTERN = re.compile(r'"([^"]+)"')
+BASE36_DIGITS = "0123456789abcdefghijklmnopqrstuvwxyz"
+
+
+PACKER_TOKENS: dict[int, list[str]] = {}
+PACKER_TOKENS_LOCK = threading.Lock()
+
+
+def packer_token(index: int, base: int) -> str:
+    """Encode ``index`` the way ``int(token, base)`` reads it back."""
+    digits = ""
+    while True:
+        index, remainder = divmod(index, base)
+        digits = BASE36_DIGITS[remainder] + digits
+        if index == 0:
+            return digits
+
+
+def packer_tokens(base: int, count: int) -> list[str]:
+    """Return the first ``count`` tokens of ``base``, encoding each only once per process."""
+    with PACKER_TOKENS_LOCK:
+        tokens = PACKER_TOKENS.setdefault(base, [])
+        tokens.extend(packer_token(index, base) for index in range(len(tokens), count))
+        return tokens[:count]
+
+
+class PackerLookup:
+    """Token -> word table for one p.a.c.k.e.r payload, built once per payload.
+
+    Tokens in their canonical form resolve with a dict lookup; anything else
+    (upper case, leading zeros, ...) falls back to ``int(token, base)`` so the
+    result is identical to decoding every token individually.
+    """
+
+    def __init__(self, base: int, words: list[str]) -> None:
+        self.base = base if base <= 36 else 36
+        self.words = words
+        self.table = {
+            token: word for token, word in zip(packer_tokens(self.base, len(words)), words) if word
+        }
+
+    def replace(self, match: re.Match[str]) -> str:
+        token = match.group(0)
+        word = self.table.get(token)
+        return word if word is not None else self.word_for(token)
+
+    def word_for(self, token: str) -> str:
+        try:
+            index = int(token, self.base)
+        except ValueError:
+            return token
+        if index < len(self.words) and self.words[index]:
+            return self.words[index]
+        return token
+
+    def token_for(self, word: str) -> str | None:
+        try:
+            return packer_token(self.words.index(word), self.base)
+        except ValueError:
+            return None
+
+    def unpack(self, packed: str) -> str:
+        return PACKER_TOKEN_PATTERN.sub(self.replace, packed)
+
+
+def parse_eval_packer(source: str) -> tuple[str, PackerLookup] | None:
+    match = PACKER_PATTERN.search(source)
+    if match is None:
+        return None
+    payload, base, _count, symbols = match.groups()
+    payload = payload.replace("\\'", "'").replace("\\\\", "\\")
+    return payload, PackerLookup(int(base), symbols.split("|"))
+
+
+def unpack_eval_packer(source: str) -> str:
+    parsed = parse_eval_packer(source)
+    if parsed is None:
+        raise SystemExit("Error: Unable to parse chapter image payload")
+    payload, lookup = parsed
+    return lookup.unpack(payload)
+
+
+@lru_cache(maxsize=64)
+def packed_pix_pvalue_patterns(var: str, pix: str, pvalue: str) -> tuple[re.Pattern[str], ...]:
+    return (
+        re.compile(rf'(?<!\w){var}\s+{pix}\s*=\s*"([^"]+)";'),
+        re.compile(rf"(?<!\w){var}\s+{pvalue}\s*=\s*\[(.*?)\];", re.S),
+    )
+
+
+def unpack_pix_pvalue(source: str) -> tuple[str, str] | None:
+    """Unpack only the ``pix`` and ``pvalue`` statements of a chapterfun payload.
+
+    Returns ``None`` when they cannot be located in packed form, in which case
+    the caller unpacks the whole payload instead.
+    """
+    parsed = parse_eval_packer(source)
+    if parsed is None:
+        return None
+    payload, lookup = parsed
+    tokens = [lookup.token_for(word) for word in ("var", "pix", "pvalue")]
+    if None in tokens:
+        return None
+    pix_pattern, pvalue_pattern = packed_pix_pvalue_patterns(*tokens)
+    base_match = pix_pattern.search(payload)
+    values_match = pvalue_pattern.search(payload)
+    if base_match is None or values_match is None:
+        return None
+    return lookup.unpack(base_match.group(1)), lookup.unpack(values_match.group(1))
+
+
+def parse_chapterfun_payload(payload: str, page: int) -> list[str]:
+    extracted = unpack_pix_pvalue(payload)
+    if extracted is None:
+        unpacked = unpack_eval_packer(payload)
+        base_match = PIX_PATTERN.search(unpacked)
+        values_match = PVALUE_PATTERN.search(unpacked)
+        if base_match is None or values_match is None:
+            print(f"Warning: unable to parse image payload for page {page}")
+            return []
+        extracted = base_match.group(1), values_match.group(1)
+
+    base_path, packed_values = extracted
+    values = QUOTED_VALUE_PATTERN.findall(packed_values)
+    if not values:
+        print(f"Warning: no image values found for page {page}")
+        return []
+
+    image_urls: list[str] = []
+    for value in values:
+        if value.startswith("http://") or value.startswith("https://"):
+            image_urls.append(value)
+        elif value.startswith("//"):
+            image_urls.append(f"https:{value}")
+        elif value.startswith("/"):
+            image_urls.append(f"{base_path}{value}")
+        else:
+            image_urls.append(value)
+    return image_urls
+
+
+def desktop_chapter_url(url_fragment: str) -> str:
+    return normalize_url(url_fragment).replace("m.fanfox.net", "fanfox.net")
+
+
+def parse_desktop_chapter_metadata(chapter_html: str) -> tuple[str, int, str]:
+    chapter_id_match = re.search(r"var\s+chapterid\s*=\s*(\d+);", chapter_html)
+    image_count_match = re.search(r"var\s+imagecount\s*=\s*(\d+);", chapter_html)
+    if chapter_id_match is None or image_count_match is None:
+        raise SystemExit("Error: Unable to parse chapter metadata")
+
+    chapter_id = chapter_id_match.group(1)
+    image_count = int(image_count_match.group(1))
+
+    key_input = parse_html(chapter_html, DM5_KEY_STRAINER).find("input", {"id": "dm5_key"})
+    value = key_input.get("value") if key_input is not None else None
+    key = value if isinstance(value, str) else ""
+
+    return chapter_id, image_count, key
+
+
+def chapterfun_url(chapter_id: str, page: int, key: str) -> str:
+    query = urllib.parse.urlencode({"cid": chapter_id, "page": page, "key": key})
+    return f"{urllib.parse.urljoin(DESKTOP_URL_BASE, 'chapterfun.ashx')}?{query}"
+
+
+def chapterfun_headers(chapter_url: str) -> dict[str, str]:
+    return {
+        "Referer": chapter_url,
+        "X-Requested-With": "XMLHttpRequest",
+    }
+
+
+def harvest_chapterfun_values(
+    page: int,
+    values: list[str],
+    image_count: int,
+    resolved: set[int],
+    attempted: set[int],
+) -> Iterator[tuple[int, str]]:
+    """Map the URLs returned for ``page`` onto it and the pages that follow it."""
+    attempted.add(page)
+    for offset, image_url in enumerate(values):
+        target = page + offset
+        if target <= image_count and target not in resolved:
+            resolved.add(target)
+            yield target - 1, image_url
+
+
+def missing_chapterfun_pages(
+    image_count: int, resolved: set[int], attempted: set[int]
+) -> list[int]:
+    return [
+        page for page in range(1, image_count + 1) if page not in resolved and page not in attempted
+    ]
+
+
+def get_chapter_image_urls_desktop(
+    url_fragment: str,
+    timeout: float = DEFAULT_TIMEOUT,
+    workers: int = 1,
+    executor: concurrent.futures.Executor | None = None,
+) -> list[str]:
+    resolved = iter_chapter_image_urls_desktop(
+        url_fragment, timeout=timeout, workers=workers, executor=executor
+    )
+    return [image_url for _, image_url in sorted(resolved)]
+
+
+@timed_generator("get_chapter_image_urls_desktop")
+def iter_chapter_image_urls_desktop(
+    url_fragment: str,
+    timeout: float = DEFAULT_TIMEOUT,
+    workers: int = 1,
+    executor: concurrent.futures.Executor | None = None,
+    resolution: ChapterResolution | None = None,
+) -> Iterator[tuple[int, str]]:
+    """Yield ``(index, image_url)`` pairs from the desktop ``chapterfun.ashx`` API."""
+    chapter_url = desktop_chapter_url(url_fragment)
+
+    _, _, chapter_content = get_page_content_with_headers(
+        chapter_url,
+        {"Referer": chapter_url},
+        timeout=timeout,
+    )
+    chapter_id, image_count, key = PARSER_POOL.run(
+        parse_desktop_chapter_metadata, chapter_content.decode("utf-8", "ignore")
+    )
+
+    def fetch_page_images(page: int) -> tuple[int, list[str]]:
+        _, _, payload = get_page_content_with_headers(
+            chapterfun_url(chapter_id, page, key),
+            chapterfun_headers(chapter_url),
+            timeout=timeout,
+        )
+        return page, PARSER_POOL.run(
+            parse_chapterfun_payload, payload.decode("utf-8", "ignore"), page
+        )
+
+    # Each chapterfun.ashx response carries the requested page plus the page(s) after
+    # it, so only every stride-th page needs a request; any gaps are filled afterwards.
+    resolved: set[int] = set()
+    attempted: set[int] = set()
+
+    def harvest(results: Iterable[tuple[int, list[str]]]) -> Iterator[tuple[int, str]]:
+        for page, values in results:
+            yield from harvest_chapterfun_values(page, values, image_count, resolved, attempted)
+
+    yield from harvest([fetch_page_images(1)])
+    stride = max(1, len(resolved))
+    yield from harvest(
+        iter_concurrently(
+            fetch_page_images, range(1 + stride, image_count + 1, stride), workers, executor
+        )
+    )
+    missing_pages = missing_chapterfun_pages(image_count, resolved, attempted)
+    yield from harvest(iter_concurrently(fetch_page_images, missing_pages, workers, executor))
+
+    if not resolved:
+        raise SystemExit("Error: Unable to determine chapter image URLs")
+    if resolution is not None and len(resolved) < image_count:
+        resolution.complete = False
+
+
+def get_chapter_number(url_fragment: str) -> float | None:
+    match = re.search(r"/c(\d+(?:\.\d+)?)/", url_fragment)
+    if match is None:
+        return None
+    return float(match.group(1))
+
+
+def file_sha256(filename: Path) -> str:
+    digest = hashlib.sha256()
+    with filename.open("rb") as image_file:
+        for chunk in iter(lambda: image_file.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ChapterManifest:
+    """Per-chapter record of downloaded images, kept in ``manifest.json``.
+
+    Each image filename maps to its source URL, byte size, SHA-256 and status
+    so that a rerun can skip images that are already on disk and intact.
+    Records are written out in batches, every ``MANIFEST_FLUSH_RECORDS``
+    records or ``MANIFEST_FLUSH_INTERVAL`` seconds and on ``flush``; an image
+    whose record was lost to a crash is just downloaded again.
+    """
+
+    def __init__(self, download_dir: Path) -> None:
+        self.path = download_dir / MANIFEST_NAME
+        self.entries: dict[str, dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._unwritten = 0
+        self._written_at = time.monotonic()
+        if self.path.exists():
+            try:
+                self.entries = json.loads(self.path.read_text())["images"]
+            except (OSError, ValueError, KeyError, TypeError):
+                print(f"Warning: ignoring unreadable manifest {self.path}")
+
+    def is_complete(self, filename: Path) -> bool:
+        entry = self.entries.get(filename.name)
+        if entry is None or entry.get("status") != "done":
+            return False
+        try:
+            if filename.stat().st_size != entry.get("size"):
+                return False
+        except OSError:
+            return False
+        return file_sha256(filename) == entry.get("sha256")
+
+    def record(
+        self,
+        filename: Path,
+        url: str,
+        status: str,
+        size: int | None = None,
+        sha256: str | None = None,
+    ) -> None:
+        entry: dict[str, Any] = {"url": url, "status": status}
+        if size is not None:
+            entry["size"] = size
+            entry["sha256"] = sha256
+        with self._lock:
+            self.entries[filename.name] = entry
+            self._unwritten += 1
+            if (
+                self._unwritten >= MANIFEST_FLUSH_RECORDS
+                or time.monotonic() - self._written_at >= MANIFEST_FLUSH_INTERVAL
+            ):
+                self._write()
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._unwritten:
+                self._write()
+
+    def _write(self) -> None:
+        write_json_atomically(self.path, {"images": self.entries})
+        self._unwritten = 0
+        self._written_at = time.monotonic()
+
+
+def image_name(index: int) -> str:
+    return f"{index:03}.jpg"
+
+
+class ImageTransfer:
+    """Writable destination for one image download that hashes bytes as they arrive."""
+
+    def __init__(self, index: int, file: IO[bytes], path: Path | None = None) -> None:
+        self.index = index
+        self.file = file
+        self.path = path
+        self.size = 0
+        self._digest = hashlib.sha256()
+
+    def write(self, data: bytes) -> int:
+        self._digest.update(data)
+        self.size += len(data)
+        return self.file.write(data)
+
+    def tell(self) -> int:
+        return self.size
+
+    def hexdigest(self) -> str:
+        return self._digest.hexdigest()
+
+
+class ContentStore:
+    """Content-addressed blob store (SHA-256 -> file) that chapter images link to.
+
+    Blobs live in ``<root>/<first two hex digits>/<digest>``. Chapter files are
+    hardlinks to their blob, or copies where the filesystem cannot link, so an
+    image seen before (a repeated credits page, a ``--force`` rerun) is not
+    written again.
+    """
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self.stored_bytes = 0
+        self.deduplicated_bytes = 0
+        self.deduplicated_images = 0
+        self._lock = threading.Lock()
+
+    def blob_path(self, sha256: str) -> Path:
+        return self.root / sha256[:2] / sha256
+
+    def add(self, source: Path, sha256: str, size: int, filename: Path) -> None:
+        """Move ``source`` into the store (unless its blob exists) and link ``filename`` to it."""
+        blob = self.blob_path(sha256)
+        with self._lock:
+            duplicate = blob.exists()
+            if duplicate:
+                source.unlink()
+            else:
+                blob.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(source, blob)
+                self.stored_bytes += size
+        temporary = filename.with_name(f"{filename.name}.link")
+        temporary.unlink(missing_ok=True)
+        try:
+            os.link(blob, temporary)
+        except OSError:
+            shutil.copyfile(blob, temporary)
+        else:
+            if duplicate:
+                with self._lock:
+                    self.deduplicated_bytes += size
+                    self.deduplicated_images += 1
+        os.replace(temporary, filename)
+
+
+class ChapterDirectory:
+    """Stores chapter images as loose files tracked by a ``ChapterManifest``.
+
+    Each transfer streams into its own ``NNN.jpg.<random>.part``, so a worker
+    that lost its lease cannot touch the new owner's files, and is renamed into
+    place once the download is accepted, or linked from ``store`` when given.
+    """
+
+    def __init__(self, download_dir: Path, store: ContentStore | None = None) -> None:
+        self.download_dir = download_dir
+        self.manifest = ChapterManifest(download_dir)
+        self.store = store
+
+    def is_complete(self, index: int) -> bool:
+        return self.manifest.is_complete(self.download_dir / image_name(index))
+
+    def start(self, index: int) -> ImageTransfer:
+        file = tempfile.NamedTemporaryFile(
+            dir=self.download_dir, prefix=f"{image_name(index)}.", suffix=".part", delete=False
+        )
+        return ImageTransfer(index, file, Path(file.name))
+
+    def save(self, transfer: ImageTransfer, url: str) -> None:
+        assert transfer.path is not None
+        transfer.file.close()
+        filename = self.download_dir / image_name(transfer.index)
+        if self.store is None:
+            os.replace(transfer.path, filename)
+        else:
+            self.store.add(transfer.path, transfer.hexdigest(), transfer.size, filename)
+        self.manifest.record(filename, url, "done", transfer.size, transfer.hexdigest())
+
+    def discard(self, transfer: ImageTransfer) -> None:
+        transfer.file.close()
+        if transfer.path is not None:
+            transfer.path.unlink(missing_ok=True)
+
+    def fail(self, index: int, url: str) -> None:
+        self.manifest.record(self.download_dir / image_name(index), url, "failed")
+
+    def close(self, success: bool) -> None:
+        self.manifest.flush()
+
+
+class CbzWriter:
+    """Streams chapter images straight into a ``.cbz`` archive in page order.
+
+    Entries are written to a ``<name>.cbz.<random>.part`` of this writer's own,
+    which replaces the final archive only when the chapter succeeds. Each
+    transfer is spooled (in memory up to ``SPOOL_MAX_SIZE``, then on disk)
+    until every page before it has been written or given up on.
+    """
+
+    def __init__(self, cbz_path: Path) -> None:
+        self.path = cbz_path
+        cbz_path.parent.mkdir(parents=True, exist_ok=True)
+        part_file = tempfile.NamedTemporaryFile(
+            dir=cbz_path.parent, prefix=f"{cbz_path.name}.", suffix=".part", delete=False
+        )
+        part_file.close()
+        self.part_path = Path(part_file.name)
+        self._zipfile = ZipFile(self.part_path, "w")
+        self._pending: dict[int, ImageTransfer | None] = {}
+        self._next_index = 0
+        self._lock = threading.Lock()
+
+    def is_complete(self, index: int) -> bool:
+        return False
+
+    def start(self, index: int) -> ImageTransfer:
+        spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+        return ImageTransfer(index, spool)
+
+    def save(self, transfer: ImageTransfer, url: str) -> None:
+        with self._lock:
+            self._pending[transfer.index] = transfer
+            self._flush()
+
+    def discard(self, transfer: ImageTransfer) -> None:
+        transfer.file.close()
+
+    def fail(self, index: int, url: str) -> None:
+        with self._lock:
+            self._pending[index] = None
+            self._flush()
+
+    def _write_entry(self, index: int) -> None:
+        transfer = self._pending.pop(index)
+        if transfer is None:
+            return
+        transfer.file.seek(0)
+        with self._zipfile.open(image_name(index), "w") as entry:
+            shutil.copyfileobj(transfer.file, entry, CHUNK_SIZE)
+        transfer.file.close()
+
+    def _flush(self) -> None:
+        while self._next_index in self._pending:
+            self._write_entry(self._next_index)
+            self._next_index += 1
+
+    def close(self, success: bool) -> None:
+        with self._lock:
+            # Pages that never resolved leave gaps; write whatever is left in order.
+            for index in sorted(self._pending):
+                self._write_entry(index)
+            self._zipfile.close()
+        if success:
+            os.replace(self.part_path, self.path)
+        else:
+            self.part_path.unlink(missing_ok=True)
+
+
+def open_chapter_sink(
+    output_dir: Path,
+    manga_name: str,
+    chapter_number: float,
+    resume: bool = False,
+    direct_cbz: bool = False,
+    store: ContentStore | None = None,
+) -> ChapterDirectory | CbzWriter:
+    if direct_cbz:
+        return CbzWriter(output_dir / manga_name / f"{chapter_number:g}.cbz")
+    download_dir = prepare_download_dir(output_dir, manga_name, chapter_number, resume)
+    return ChapterDirectory(download_dir, store)
+
+
+def prepare_download_dir(
+    output_dir: Path,
+    manga_name: str,
+    chapter_number: float,
+    resume: bool = False,
+) -> Path:
+    download_dir = output_dir / manga_name / f"{chapter_number:g}"
+    if download_dir.exists() and not resume:
+        shutil.rmtree(download_dir)
+    download_dir.mkdir(parents=True, exist_ok=True)
+    return download_dir
+
+
+def image_response_warning(
+    url: str,
+    status: int,
+    content_type: str,
+    attempt: int,
+    max_retries: int,
+) -> str | None:
+    """Return why a response is not a usable image, or ``None`` if it is."""
+    if status < 200 or status >= 300:
+        return f"Warning: got status {status} for {url} (attempt {attempt}/{max_retries})"
+    if not content_type.startswith("image/"):
+        return (
+            f"Warning: expected image for {url}, got content-type "
+            f"'{content_type}' (attempt {attempt}/{max_retries})"
+        )
+    return None
+
+
+def retry_delay(avg_delay: float) -> float:
+    return random.uniform(avg_delay * 0.6, avg_delay * 1.4)
+
+
+def raise_for_failed_images(chapter_label: str, failed_images: list[str]) -> None:
+    if failed_images:
+        failed_list = ", ".join(sorted(failed_images))
+        raise SystemExit(
+            f"Error: failed to download {len(failed_images)} image(s) "
+            f"for chapter {chapter_label}: {failed_list}"
+        )
+
+
+class ChapterCancelled(Exception):
+    """Raised when a chapter download is abandoned because ``cancelled`` was set."""
+
+
+def raise_if_cancelled(chapter_label: str, *cancelled: threading.Event | None) -> None:
+    if any(event is not None and event.is_set() for event in cancelled):
+        raise ChapterCancelled(f"chapter {chapter_label} was cancelled")
+
+
+def enumerate_image_urls(
+    image_urls: Iterable[str] | Iterable[tuple[int, str]],
+) -> Iterator[tuple[int, str]]:
+    for position, item in enumerate(image_urls):
+        if isinstance(item, tuple):
+            yield item
+        else:
+            yield position, item
+
+
+@timed_step("download_urls")
+def download_urls(
+    image_urls: Iterable[str] | Iterable[tuple[int, str]],
+    manga_name: str,
+    chapter_number: float,
+    output_dir: Path = Path("."),
+    avg_delay: float = 2.0,
+    max_retries: int = 5,
+    workers: int = 1,
+    timeout: float = DEFAULT_TIMEOUT,
+    executor: concurrent.futures.Executor | None = None,
+    adaptive: AdaptiveConcurrency | None = None,
+    resume: bool = False,
+    direct_cbz: bool = False,
+    store: ContentStore | None = None,
+    cancelled: threading.Event | None = None,
+) -> None:
+    chapter_label = f"{chapter_number:g}"
+    sink = open_chapter_sink(output_dir, manga_name, chapter_number, resume, direct_cbz, store)
+    # Set once the chapter has failed, so images still in flight stop at their next check.
+    abandoned = threading.Event()
+
+    random.seed()
+
+    def download_image(index: int, url: str) -> str | None:
+        if sink.is_complete(index):
+            return None
+
+        attempt = 0
+        while attempt < max_retries:
+            attempt += 1
+            raise_if_cancelled(chapter_label, cancelled, abandoned)
+            transfer: ImageTransfer | None = sink.start(index)
+            try:
+                with adaptive.track() if adaptive is not None else nullcontext() as timing:
+                    status, content_type, _ = stream_page_content(
+                        url, transfer, timeout=timeout, attempt=attempt, timing=timing
+                    )
+                warning = image_response_warning(url, status, content_type, attempt, max_retries)
+                if warning is None:
+                    raise_if_cancelled(chapter_label, cancelled, abandoned)
+                    sink.save(transfer, url)
+                    transfer = None
+                    return None
+                print(warning)
+            except urllib.error.HTTPError as http_error:
+                print(f"HTTP error {http_error.code}: {http_error.reason}")
+                if http_error.code in (403, 404):
+                    RESOLUTION_CACHE.invalidate_image(url)
+                if http_error.code == 404:
+                    break
+            except urllib.error.URLError as url_error:
+                print(f"URL error: {url_error.reason}")
+            finally:
+                if transfer is not None:
+                    sink.discard(transfer)
+
+            if attempt < max_retries:
+                delay = retry_delay(avg_delay)
+                METRICS.observe_retry_sleep(delay)
+                time.sleep(delay)
+
+        sink.fail(index, url)
+        return image_name(index)
+
+    failed_images: list[str] = []
+    try:
+        with tqdm(
+            total=0,
+            desc=f"Chapter {chapter_label}",
+            unit="img",
+            disable=not sys.stderr.isatty(),
+        ) as progress:
+            if workers == 1 and executor is None:
+                for index, url in enumerate_image_urls(image_urls):
+                    progress.total += 1
+                    failed_image = download_image(index, url)
+                    if failed_image is not None:
+                        failed_images.append(failed_image)
+                    progress.update(1)
+
+            else:
+                with worker_pool(workers, executor) as pool:
+                    # Submit each image as soon as its URL resolves so downloads overlap
+                    # with the resolution of the remaining pages.
+                    futures: list[concurrent.futures.Future[str | None]] = []
+                    try:
+                        for index, url in enumerate_image_urls(image_urls):
+                            progress.total += 1
+                            progress.refresh()
+                            future = pool.submit(download_image, index, url)
+                            future.add_done_callback(lambda _future: progress.update(1))
+                            futures.append(future)
+                        for future in concurrent.futures.as_completed(futures):
+                            failed_image = future.result()
+                            if failed_image is not None:
+                                failed_images.append(failed_image)
+                    except BaseException:
+                        # Drop the images that have not started, and wait for the rest
+                        # to stop before the sink is closed under them.
+                        abandoned.set()
+                        for future in futures:
+                            future.cancel()
+                        concurrent.futures.wait(futures)
+                        raise
+    except BaseException:
+        sink.close(False)
+        raise
+
+    sink.close(not failed_images)
+    raise_for_failed_images(chapter_label, failed_images)
+
+
+@timed_step("make_cbz")
+def make_cbz(dirname: str) -> None:
+    zipname = f"{dirname}.cbz"
+    images = sorted(Path(dirname).glob("*.jpg"))
+    with closing(ZipFile(zipname, "w")) as zipfile:
+        for filename in images:
+            zipfile.write(filename, arcname=filename.name)
+
+
+def select_chapters(
+    chapter_urls: OrderedDict[float, str],
+    range_start: float = 1,
+    range_end: float | None = None,
+    latest: int | None = None,
+) -> OrderedDict[float, str]:
+    if latest is not None and latest < 1:
+        raise SystemExit("Error: --latest must be >= 1")
+
+    if range_end is None:
+        range_end = max(chapter_urls.keys())
+
+    selected = [
+        (chapter, url)
+        for chapter, url in chapter_urls.items()
+        if range_start <= chapter <= range_end
+    ]
+    if latest is not None:
+        selected = selected[-latest:]
+
+    return OrderedDict(selected)
+
+
+def download_chapter(
+    url: str,
+    manga_name: str,
+    chapter: float,
+    output_dir: Path = Path("."),
+    create_cbz: bool = False,
+    remove_images: bool = False,
+    avg_delay: float = 2.0,
+    max_retries: int = 5,
+    workers: int = 1,
+    timeout: float = DEFAULT_TIMEOUT,
+    executor: concurrent.futures.Executor | None = None,
+    adaptive: AdaptiveConcurrency | None = None,
+    resume: bool = False,
+    store: ContentStore | None = None,
+    cancelled: threading.Event | None = None,
+) -> None:
+    image_urls = iter_chapter_image_urls(url, timeout=timeout, workers=workers, executor=executor)
+    # With --cbz --remove the loose images would only be deleted again, so write
+    # them straight into the archive instead.
+    direct_cbz = create_cbz and remove_images
+    download_urls(
+        image_urls,
+        manga_name,
+        chapter,
+        output_dir=output_dir,
+        avg_delay=avg_delay,
+        max_retries=max_retries,
+        workers=workers,
+        timeout=timeout,
+        executor=executor,
+        adaptive=adaptive,
+        resume=resume,
+        direct_cbz=direct_cbz,
+        store=store,
+        cancelled=cancelled,
+    )
+    download_dir = output_dir / manga_name / f"{chapter:g}"
+    if direct_cbz:
+        shutil.rmtree(download_dir, ignore_errors=True)
+    elif create_cbz:
+        make_cbz(str(download_dir))
+
+
+def run_chapter_jobs(jobs: Iterable[Callable[[], None]], chapters_in_flight: int = 1) -> None:
+    """Run chapter jobs with at most ``chapters_in_flight`` of them active at once.
+
+    Jobs only coordinate: their network work goes to the shared worker pool, so
+    the next chapter's requests queue up behind the current chapter's tail.
+    After the first failure no new chapters start, and the error is re-raised
+    once the chapters already in flight have finished.
+    """
+    if chapters_in_flight == 1:
+        for job in jobs:
+            job()
+        return
+
+    failure: BaseException | None = None
+    with concurrent.futures.ThreadPoolExecutor(max_workers=chapters_in_flight) as chapter_pool:
+        futures = [chapter_pool.submit(job) for job in jobs]
+        for future in concurrent.futures.as_completed(futures):
+            if future.cancelled():
+                continue
+            error = future.exception()
+            if error is not None and failure is None:
+                failure = error
+                for pending in futures:
+                    pending.cancel()
+
+    if failure is not None:
+        raise failure
+
+
+class AsyncChapterError(Exception):
+    """Carries a chapter failure out of an asyncio task.
+
+    ``SystemExit`` raised inside a task escapes the event loop instead of being
+    collected, so the async engine converts it at task boundaries.
+    """
+
+
+async def gather_pages(awaitables: Iterable[Awaitable[T]]) -> list[T]:
+    async def guarded(awaitable: Awaitable[T]) -> T:
+        try:
+            return await awaitable
+        except SystemExit as error:
+            raise AsyncChapterError(str(error.code)) from None
+
+    return await asyncio.gather(*(guarded(awaitable) for awaitable in awaitables))
+
+
+@timed_step_async("get_chapter_image_urls")
+async def resolve_chapter_async(
+    client: AsyncHTTPClient,
+    url_fragment: str,
+    on_image: Callable[[int, str], None],
+    timeout: float = DEFAULT_TIMEOUT,
+) -> None:
+    """Async counterpart of ``iter_chapter_image_urls``, reporting pairs via ``on_image``."""
+    cached = RESOLUTION_CACHE.lookup(url_fragment)
+    if cached is not None:
+        for index, image_url in cached:
+            on_image(index, image_url)
+        return
+
+    resolution = ChapterResolution()
+
+    def record_image(index: int, image_url: str) -> None:
+        resolution.image_urls.append((index, image_url))
+        on_image(index, image_url)
+
+    await resolve_chapter_pages_async(client, url_fragment, record_image, resolution, timeout)
+    RESOLUTION_CACHE.store(url_fragment, resolution)
+
+
+async def resolve_chapter_pages_async(
+    client: AsyncHTTPClient,
+    url_fragment: str,
+    on_image: Callable[[int, str], None],
+    resolution: ChapterResolution,
+    timeout: float,
+) -> None:
+    if get_chapter_number(url_fragment) is None:
+        raise SystemExit(f"Error: invalid chapter URL fragment: {url_fragment}")
+
+    _, _, chapter_content = await client.fetch(request_url(url_fragment), timeout=timeout)
+    pages, chapter_image_url = await PARSER_POOL.run_async(extract_chapter_page, chapter_content)
+    if pages is None:
+        await resolve_chapter_desktop_async(
+            client, url_fragment, on_image, timeout=timeout, resolution=resolution
+        )
+        return
+
+    chapter_base_url = os.path.dirname(url_fragment.rstrip("/")) + "/"
+    chapter_url = normalize_url(url_fragment)
+
+    async def resolve_page(index: int, page: int) -> None:
+        page_url = f"{chapter_base_url}{page}.html"
+        if normalize_url(page_url) == chapter_url:
+            image_url = chapter_image_url
+        else:
+            _, _, page_content = await client.fetch(request_url(page_url), timeout=timeout)
+            image_url = await PARSER_POOL.run_async(extract_page_image_url, page_content)
+
+        if image_url is None:
+            print(f"Warning: image not found for page {page_url}")
+            resolution.complete = False
+        else:
+            on_image(index, image_url)
+
+    await gather_pages(resolve_page(index, page) for index, page in enumerate(pages))
+
+
+@timed_step_async("get_chapter_image_urls_desktop")
+async def resolve_chapter_desktop_async(
+    client: AsyncHTTPClient,
+    url_fragment: str,
+    on_image: Callable[[int, str], None],
+    timeout: float = DEFAULT_TIMEOUT,
+    resolution: ChapterResolution | None = None,
+) -> None:
+    chapter_url = desktop_chapter_url(url_fragment)
+    _, _, chapter_content = await client.fetch(
+        request_url_with_headers(chapter_url, {"Referer": chapter_url}), timeout=timeout
+    )
+    chapter_id, image_count, key = await PARSER_POOL.run_async(
+        parse_desktop_chapter_metadata, chapter_content.decode("utf-8", "ignore")
+    )
+    resolved: set[int] = set()
+    attempted: set[int] = set()
+
+    async def fetch_page_images(page: int) -> None:
+        request = request_url_with_headers(
+            chapterfun_url(chapter_id, page, key), chapterfun_headers(chapter_url)
+        )
+        _, _, payload = await client.fetch(request, timeout=timeout)
+        values = await PARSER_POOL.run_async(
+            parse_chapterfun_payload, payload.decode("utf-8", "ignore"), page
+        )
+        for index, image_url in harvest_chapterfun_values(
+            page, values, image_count, resolved, attempted
+        ):
+            on_image(index, image_url)
+
+    await gather_pages([fetch_page_images(1)])
+    stride = max(1, len(resolved))
+    await gather_pages(map(fetch_page_images, range(1 + stride, image_count + 1, stride)))
+    missing_pages = missing_chapterfun_pages(image_count, resolved, attempted)
+    await gather_pages(map(fetch_page_images, missing_pages))
+
+    if not resolved:
+        raise SystemExit("Error: Unable to determine chapter image URLs")
+    if resolution is not None and len(resolved) < image_count:
+        resolution.complete = False
+
+
+async def download_image_async(
+    client: AsyncHTTPClient,
+    index: int,
+    url: str,
+    sink: ChapterDirectory | CbzWriter,
+    avg_delay: float = 2.0,
+    max_retries: int = 5,
+    timeout: float = DEFAULT_TIMEOUT,
+    adaptive: AdaptiveConcurrency | None = None,
+    chapter_label: str = "",
+    cancelled: threading.Event | None = None,
+    abandoned: threading.Event | None = None,
+) -> str | None:
+    """Async counterpart of ``download_urls``' per-image retry loop.
+
+    Sink and manifest work (hashing, renames, zip writes) runs in worker
+    threads, and the ``.part`` file is only opened once the image holds one of
+    the host's transfer slots. ``abandoned`` is set by the chapter once it has
+    failed; like ``cancelled``, it stops the image before its next attempt.
+    """
+    if await asyncio.to_thread(sink.is_complete, index):
+        return None
+
+    attempt = 0
+    while attempt < max_retries:
+        attempt += 1
+        async with client.transfer_slot(url):
+            raise_if_cancelled(chapter_label, cancelled, abandoned)
+            transfer: ImageTransfer | None = await asyncio.to_thread(sink.start, index)
+            try:
+                if adaptive is None:
+                    status, content_type, _ = await client.stream(
+                        request_url(url), transfer, timeout=timeout, attempt=attempt
+                    )
+                else:
+                    async with adaptive.track_async() as timing:
+                        status, content_type, _ = await client.stream(
+                            request_url(url),
+                            transfer,
+                            timeout=timeout,
+                            attempt=attempt,
+                            timing=timing,
+                        )
+                warning = image_response_warning(url, status, content_type, attempt, max_retries)
+                if warning is None:
+                    raise_if_cancelled(chapter_label, cancelled, abandoned)
+                    await asyncio.to_thread(sink.save, transfer, url)
+                    transfer = None
+                    return None
+                print(warning)
+            except urllib.error.HTTPError as http_error:
+                print(f"HTTP error {http_error.code}: {http_error.reason}")
+                if http_error.code in (403, 404):
+                    RESOLUTION_CACHE.invalidate_image(url)
+                if http_error.code == 404:
+                    break
+            except urllib.error.URLError as url_error:
+                print(f"URL error: {url_error.reason}")
+            finally:
+                if transfer is not None:
+                    await asyncio.to_thread(sink.discard, transfer)
+
+        if attempt < max_retries:
+            delay = retry_delay(avg_delay)
+            METRICS.observe_retry_sleep(delay)
+            await asyncio.sleep(delay)
 
+    await asyncio.to_thread(sink.fail, index, url)
+    return image_name(index)
 
-def read_response_content(response: Any) -> bytes:
-    payload = response.read()
-    encoding = response.info().get("Content-Encoding", "")
 
-    if encoding == "gzip":
-        return gzip.decompress(payload)
+@timed_step_async("download_urls")
+async def download_chapter_images_async(
+    client: AsyncHTTPClient,
+    url: str,
+    manga_name: str,
+    chapter: float,
+    output_dir: Path = Path("."),
+    avg_delay: float = 2.0,
+    max_retries: int = 5,
+    timeout: float = DEFAULT_TIMEOUT,
+    adaptive: AdaptiveConcurrency | None = None,
+    resume: bool = False,
+    direct_cbz: bool = False,
+    store: ContentStore | None = None,
+    cancelled: threading.Event | None = None,
+) -> None:
+    """Async counterpart of ``download_urls``, resolving ``url`` as images download."""
+    chapter_label = f"{chapter:g}"
+    sink = await asyncio.to_thread(
+        open_chapter_sink, output_dir, manga_name, chapter, resume, direct_cbz, store
+    )
+    downloads: list[asyncio.Task[str | None]] = []
+    abandoned = threading.Event()
 
-    if payload.startswith(b"\x1f\x8b"):
-        return gzip.decompress(payload)
+    with tqdm(
+        total=0,
+        desc=f"Chapter {chapter_label}",
+        unit="img",
+        disable=not sys.stderr.isatty(),
+    ) as progress:
 
-    return payload
+        def on_image(index: int, image_url: str) -> None:
+            progress.total += 1
+            progress.refresh()
+            download = asyncio.create_task(
+                download_image_async(
+                    client,
+                    index,
+                    image_url,
+                    sink,
+                    avg_delay=avg_delay,
+                    max_retries=max_retries,
+                    timeout=timeout,
+                    adaptive=adaptive,
+                    chapter_label=chapter_label,
+                    cancelled=cancelled,
+                    abandoned=abandoned,
+                )
+            )
+            download.add_done_callback(lambda _task: progress.update(1))
+            downloads.append(download)
 
+        try:
+            try:
+                await resolve_chapter_async(client, url, on_image, timeout=timeout)
+                results = await asyncio.gather(*downloads)
+            except BaseException:
+                # Stop the remaining images at their next check rather than cancelling
+                # them, so none is cut off inside a sink write that is still running.
+                abandoned.set()
+                await asyncio.gather(*downloads, return_exceptions=True)
+                raise
+        except BaseException:
+            await asyncio.to_thread(sink.close, False)
+            raise
 
-def get_page_content(url: str, timeout: float = DEFAULT_TIMEOUT) -> tuple[int, str, bytes]:
-    with closing(urllib.request.urlopen(request_url(url), timeout=timeout)) as response:
-        status = response.getcode()
-        content_type = response.headers.get_content_type()
-        payload = read_response_content(response)
-        return status, content_type, payload
+    failed_images = [name for name in results if name is not None]
+    await asyncio.to_thread(sink.close, not failed_images)
+    raise_for_failed_images(chapter_label, failed_images)
 
 
-def get_page_content_with_headers(
+async def download_chapter_async(
+    client: AsyncHTTPClient,
     url: str,
-    headers: dict[str, str],
+    manga_name: str,
+    chapter: float,
+    output_dir: Path = Path("."),
+    create_cbz: bool = False,
+    remove_images: bool = False,
+    avg_delay: float = 2.0,
+    max_retries: int = 5,
     timeout: float = DEFAULT_TIMEOUT,
-) -> tuple[int, str, bytes]:
-    request = request_url_with_headers(url, headers)
-    with closing(urllib.request.urlopen(request, timeout=timeout)) as response:
-        status = response.getcode()
-        content_type = response.headers.get_content_type()
-        payload = read_response_content(response)
-        return status, content_type, payload
+    adaptive: AdaptiveConcurrency | None = None,
+    resume: bool = False,
+    store: ContentStore | None = None,
+    cancelled: threading.Event | None = None,
+) -> None:
+    chapter_label = f"{chapter:g}"
+    direct_cbz = create_cbz and remove_images
+    await download_chapter_images_async(
+        client,
+        url,
+        manga_name,
+        chapter,
+        output_dir=output_dir,
+        avg_delay=avg_delay,
+        max_retries=max_retries,
+        timeout=timeout,
+        adaptive=adaptive,
+        resume=resume,
+        direct_cbz=direct_cbz,
+        store=store,
+        cancelled=cancelled,
+    )
+    download_dir = output_dir / manga_name / chapter_label
+    if direct_cbz:
+        await asyncio.to_thread(shutil.rmtree, download_dir, ignore_errors=True)
+    elif create_cbz:
+        await asyncio.to_thread(make_cbz, str(download_dir))
 
 
-def get_page_soup(url: str, timeout: float = DEFAULT_TIMEOUT) -> BeautifulSoup:
-    _, _, page_content = get_page_content(url, timeout=timeout)
-    return BeautifulSoup(page_content, "html.parser")
+async def download_chapters_async(
+    pending_chapters: list[tuple[float, str]],
+    manga_name: str,
+    output_dir: Path = Path("."),
+    create_cbz: bool = False,
+    remove_images: bool = False,
+    avg_delay: float = 2.0,
+    max_retries: int = 5,
+    workers: int = 1,
+    timeout: float = DEFAULT_TIMEOUT,
+    chapters_in_flight: int = 1,
+    adaptive: AdaptiveConcurrency | None = None,
+    resume: bool = False,
+    store: ContentStore | None = None,
+    cancelled: threading.Event | None = None,
+) -> str | None:
+    """Download chapters as coroutines, returning the first failure message, if any.
 
+    ``workers`` bounds the requests in flight per host, so the async engine can
+    keep hundreds of transfers going from a single thread.
+    """
+    client = AsyncHTTPClient(workers)
+    chapter_slots = asyncio.Semaphore(chapters_in_flight)
+    failures: list[str] = []
 
-def manga_to_slug(manga_name: str) -> str:
-    def replacer(value: str, key: str) -> str:
-        return value.replace(key, "_")
+    async def run_chapter(chapter: float, url: str) -> None:
+        async with chapter_slots:
+            if failures:
+                return
+            try:
+                await download_chapter_async(
+                    client,
+                    url,
+                    manga_name,
+                    chapter,
+                    output_dir=output_dir,
+                    create_cbz=create_cbz,
+                    remove_images=remove_images,
+                    avg_delay=avg_delay,
+                    max_retries=max_retries,
+                    timeout=timeout,
+                    adaptive=adaptive,
+                    resume=resume,
+                    store=store,
+                    cancelled=cancelled,
+                )
+            except SystemExit as error:
+                failures.append(str(error.code))
+            except AsyncChapterError as error:
+                failures.append(str(error))
 
-    return reduce(replacer, [" ", "-"], manga_name.lower())
+    try:
+        await asyncio.gather(*(run_chapter(chapter, url) for chapter, url in pending_chapters))
+    finally:
+        client.close()
 
+    return failures[0] if failures else None
 
-def get_chapter_urls(manga_name: str, timeout: float = DEFAULT_TIMEOUT) -> OrderedDict[float, str]:
-    manga_slug = manga_to_slug(manga_name)
-    url = f"{URL_BASE}manga/{manga_slug}/"
 
-    soup = get_page_soup(url, timeout=timeout)
-    manga_does_not_exist = soup.find("form", {"name": "searchform"})
-    if manga_does_not_exist:
-        search_sort_options = "sort=views&order=za"
-        search_url = f"{URL_BASE}search?name={manga_slug}&{search_sort_options}"
-        soup = get_page_soup(search_url, timeout=timeout)
-        results = soup.find_all("a", {"class": "series_preview"})
-        error_text = f"Error: Manga '{manga_name}' does not exist"
-        error_text += "\nDid you mean one of the following?\n  * "
-        error_text += "\n  * ".join([manga.text for manga in results][:10])
-        raise SystemExit(error_text)
+def download_manga(
+    manga_name: str,
+    range_start: float = 1,
+    range_end: float | None = None,
+    output_dir: Path = Path("."),
+    create_cbz: bool = False,
+    remove_images: bool = False,
+    force: bool = False,
+    avg_delay: float = 2.0,
+    max_retries: int = 5,
+    workers: int = 1,
+    timeout: float = DEFAULT_TIMEOUT,
+    latest: int | None = None,
+    chapters_in_flight: int = 1,
+    engine: str = "thread",
+    adaptive: bool = False,
+    series_cache: SeriesPageCache | None = None,
+    dedup: bool = False,
+) -> None:
+    chapter_urls = get_chapter_urls(manga_name, timeout=timeout, cache=series_cache)
+    selected_chapters = select_chapters(chapter_urls, range_start, range_end, latest)
+    pending_chapters = select_pending_chapters(selected_chapters, manga_name, output_dir, force)
 
-    warning = soup.find("div", {"class": "warning"})
-    if warning and warning.text and "licensed" in warning.text.lower():
-        raise SystemExit(f"Error: {warning.text}")
+    controller = AdaptiveConcurrency(workers) if adaptive else None
+    store = ContentStore(output_dir / STORE_NAME) if dedup else None
+    try:
+        download_pending_chapters(
+            pending_chapters,
+            manga_name,
+            output_dir=output_dir,
+            create_cbz=create_cbz,
+            remove_images=remove_images,
+            avg_delay=avg_delay,
+            max_retries=max_retries,
+            workers=workers,
+            timeout=timeout,
+            chapters_in_flight=chapters_in_flight,
+            engine=engine,
+            adaptive=controller,
+            resume=not force,
+            store=store,
+        )
+    finally:
+        print_run_report(controller, store)
 
-    links = soup.find_all("a", href=re.compile(rf"/{manga_slug}/(.*/)?c\d+/.*\.html"))
-    if not links:
-        raise SystemExit("Error: Manga either does not exist or has no chapters")
 
-    chapters: OrderedDict[float, str] = OrderedDict()
-    for link in links:
-        if link.get("class"):
-            continue
-        href = link.get("href")
-        if not isinstance(href, str):
-            continue
-        chapter_id = get_chapter_number(href)
-        if chapter_id is None:
+def select_pending_chapters(
+    selected_chapters: OrderedDict[float, str],
+    manga_name: str,
+    output_dir: Path = Path("."),
+    force: bool = False,
+    quiet: bool = False,
+) -> list[tuple[float, str]]:
+    """Drop chapters whose ``.cbz`` already exists, unless ``force`` is set."""
+    pending_chapters: list[tuple[float, str]] = []
+    for chapter, url in selected_chapters.items():
+        chapter_cbz = output_dir / manga_name / f"{chapter:g}.cbz"
+        if chapter_cbz.exists() and not force:
+            if not quiet:
+                print(f"Skipping chapter {chapter:g} (already downloaded)")
             continue
-        chapters[chapter_id] = href
+        if not force and (output_dir / manga_name / f"{chapter:g}" / MANIFEST_NAME).exists():
+            print(f"Resuming chapter {chapter:g} (partially downloaded)")
+        pending_chapters.append((chapter, url))
+    return pending_chapters
 
-    if not chapters:
-        raise SystemExit("Error: Manga has no chapters")
 
-    return OrderedDict(sorted(chapters.items()))
+def print_run_report(
+    controller: AdaptiveConcurrency | None,
+    store: ContentStore | None,
+) -> None:
+    if controller is not None:
+        trajectory = " -> ".join(str(limit) for limit in controller.trajectory)
+        print(f"Adaptive concurrency trajectory: {trajectory}")
+    if store is not None:
+        print(
+            f"Deduplicated {store.deduplicated_bytes} bytes "
+            f"({store.deduplicated_images} image(s)), stored {store.stored_bytes} new bytes"
+        )
 
 
-def get_page_numbers(soup: BeautifulSoup) -> list[int]:
-    page_select = soup.find("select", {"class": "mangaread-page"})
-    if page_select:
-        return [
-            int(option.text) for option in page_select.find_all("option") if option.text.isdigit()
-        ]
+def download_pending_chapters(
+    pending_chapters: list[tuple[float, str]],
+    manga_name: str,
+    output_dir: Path = Path("."),
+    create_cbz: bool = False,
+    remove_images: bool = False,
+    avg_delay: float = 2.0,
+    max_retries: int = 5,
+    workers: int = 1,
+    timeout: float = DEFAULT_TIMEOUT,
+    chapters_in_flight: int = 1,
+    engine: str = "thread",
+    adaptive: AdaptiveConcurrency | None = None,
+    resume: bool = False,
+    store: ContentStore | None = None,
+    cancelled: threading.Event | None = None,
+) -> None:
+    if engine == "async":
+        failure = asyncio.run(
+            download_chapters_async(
+                pending_chapters,
+                manga_name,
+                output_dir=output_dir,
+                create_cbz=create_cbz,
+                remove_images=remove_images,
+                avg_delay=avg_delay,
+                max_retries=max_retries,
+                workers=workers,
+                timeout=timeout,
+                chapters_in_flight=chapters_in_flight,
+                adaptive=adaptive,
+                resume=resume,
+                store=store,
+                cancelled=cancelled,
+            )
+        )
+        if failure is not None:
+            raise SystemExit(failure)
+        return
 
-    old_page_select = soup.find("select", {"class": "m"})
-    if old_page_select:
-        page_numbers: list[int] = []
-        for option in old_page_select.find_all("option"):
-            value = option.get("value")
-            if isinstance(value, str) and value.isdigit():
-                page_numbers.append(int(value))
-        return page_numbers
+    # One worker pool serves every chapter of the run, so workers never sit idle
+    # waiting for the slowest image of a chapter before the next one can start.
+    with worker_pool(workers) if workers > 1 else nullcontext() as executor:
+        run_chapter_jobs(
+            (
+                partial(
+                    download_chapter,
+                    url,
+                    manga_name,
+                    chapter,
+                    output_dir=output_dir,
+                    create_cbz=create_cbz,
+                    remove_images=remove_images,
+                    avg_delay=avg_delay,
+                    max_retries=max_retries,
+                    workers=workers,
+                    timeout=timeout,
+                    executor=executor,
+                    adaptive=adaptive,
+                    resume=resume,
+                    store=store,
+                )
+                for chapter, url in pending_chapters
+            ),
+            chapters_in_flight,
+        )
 
-    raise SystemExit("Error: Unable to determine page list")
 
+class WatchlistEntry:
+    """One series of a watchlist file and the chapters selected from it."""
 
-def get_chapter_image_urls(url_fragment: str, timeout: float = DEFAULT_TIMEOUT) -> list[str]:
-    chapter_number = get_chapter_number(url_fragment)
-    if chapter_number is None:
-        raise SystemExit(f"Error: invalid chapter URL fragment: {url_fragment}")
+    def __init__(
+        self,
+        manga_name: str,
+        range_start: float = 1,
+        range_end: float | None = None,
+        latest: int | None = None,
+    ) -> None:
+        self.manga_name = manga_name
+        self.range_start = range_start
+        self.range_end = range_end
+        self.latest = latest
 
-    chapter_soup = get_page_soup(url_fragment, timeout=timeout)
-    try:
-        pages = get_page_numbers(chapter_soup)
-    except SystemExit:
-        return get_chapter_image_urls_desktop(url_fragment, timeout=timeout)
 
-    chapter_base_url = os.path.dirname(url_fragment.rstrip("/")) + "/"
-    image_urls: list[str] = []
-    for page in pages:
-        page_url = f"{chapter_base_url}{page}.html"
-        page_soup = get_page_soup(page_url, timeout=timeout)
-        viewer_div = page_soup.find("div", id="viewer")
-        image = None
-        if viewer_div:
-            image = viewer_div.find("img")
-        if image is None:
-            image = page_soup.find("img", {"id": "image"})
-
-        if image and image.get("src"):
-            src = image.get("src")
-            if isinstance(src, str):
-                image_urls.append(src)
-            else:
-                print(f"Warning: invalid image src for page {page_url}")
-        else:
-            print(f"Warning: image not found for page {page_url}")
+WATCHLIST_OPTIONS = {
+    "-s": "range_start",
+    "--start": "range_start",
+    "-e": "range_end",
+    "--end": "range_end",
+    "--latest": "latest",
+}
 
-    return image_urls
 
+def parse_watchlist_line(
+    line: str,
+    range_start: float = 1,
+    range_end: float | None = None,
+    latest: int | None = None,
+) -> WatchlistEntry | None:
+    """Parse ``Series Name [--start N] [--end N] [--latest N]``; ``#`` starts a comment."""
+    tokens = shlex.split(line, comments=True)
+    if not tokens:
+        return None
 
-def unpack_eval_packer(source: str) -> str:
-    match = re.search(r"\}\('(.*)',(\d+),(\d+),'(.*)'\.split\('\|'\),0,\{\}\)\)", source, re.S)
-    if match is None:
-        raise SystemExit("Error: Unable to parse chapter image payload")
+    values: dict[str, str] = {}
+    name_parts: list[str] = []
+    position = 0
+    while position < len(tokens):
+        token = tokens[position]
+        option = WATCHLIST_OPTIONS.get(token)
+        if option is None:
+            name_parts.append(token)
+            position += 1
+            continue
+        if position + 1 == len(tokens):
+            raise ValueError(f"{token} needs a value")
+        values[option] = tokens[position + 1]
+        position += 2
 
-    payload, base, _count, symbols = match.groups()
-    base_int = int(base)
-    words = symbols.split("|")
+    if not name_parts:
+        raise ValueError("missing series name")
+    try:
+        if "range_start" in values:
+            range_start = float(values["range_start"])
+        if "range_end" in values:
+            range_end = float(values["range_end"])
+        if "latest" in values:
+            latest = int(values["latest"])
+    except ValueError as error:
+        raise ValueError(f"invalid chapter selection: {error}") from None
+    return WatchlistEntry(" ".join(name_parts), range_start, range_end, latest)
 
-    payload = payload.replace("\\'", "'").replace("\\\\", "\\")
 
-    def replace_token(token_match: re.Match[str]) -> str:
-        token = token_match.group(0)
+def parse_watchlist(
+    path: Path,
+    range_start: float = 1,
+    range_end: float | None = None,
+    latest: int | None = None,
+) -> list[WatchlistEntry]:
+    """Read a watchlist file; ``--start``/``--end``/``--latest`` default to the CLI values."""
+    try:
+        lines = path.read_text(encoding="utf-8").splitlines()
+    except OSError as error:
+        raise SystemExit(f"Error: unable to read watchlist {path}: {error}") from None
+
+    entries: list[WatchlistEntry] = []
+    for line_number, line in enumerate(lines, start=1):
         try:
-            index = int(token, base_int if base_int <= 36 else 36)
-        except ValueError:
-            return token
-        if index < len(words) and words[index]:
-            return words[index]
-        return token
+            entry = parse_watchlist_line(line, range_start, range_end, latest)
+        except ValueError as error:
+            raise SystemExit(f"Error: {path}:{line_number}: {error}") from None
+        if entry is not None:
+            entries.append(entry)
+    if not entries:
+        raise SystemExit(f"Error: watchlist {path} lists no series")
+    return entries
 
-    return re.sub(r"\b\w+\b", replace_token, payload)
 
+def interleave_series(pending_by_series: list[list[T]]) -> list[T]:
+    """Order chapters round-robin across series so no series waits behind another."""
+    ranked = [
+        (position, series, item)
+        for series, pending in enumerate(pending_by_series)
+        for position, item in enumerate(pending)
+    ]
+    ranked.sort(key=lambda entry: entry[:2])
+    return [item for _, _, item in ranked]
 
-def get_chapter_image_urls_desktop(
-    url_fragment: str,
-    timeout: float = DEFAULT_TIMEOUT,
-) -> list[str]:
-    chapter_url = normalize_url(url_fragment).replace("m.fanfox.net", "fanfox.net")
 
-    _, _, chapter_content = get_page_content_with_headers(
-        chapter_url,
-        {"Referer": chapter_url},
-        timeout=timeout,
-    )
-    chapter_html = chapter_content.decode("utf-8", "ignore")
+class WatchlistSummary:
+    """New and failed chapters per series of a watchlist run."""
 
-    chapter_id_match = re.search(r"var\s+chapterid\s*=\s*(\d+);", chapter_html)
-    image_count_match = re.search(r"var\s+imagecount\s*=\s*(\d+);", chapter_html)
-    if chapter_id_match is None or image_count_match is None:
-        raise SystemExit("Error: Unable to parse chapter metadata")
+    def __init__(self, entries: list[WatchlistEntry]) -> None:
+        self.series = [entry.manga_name for entry in entries]
+        self.new: dict[str, list[float]] = {name: [] for name in self.series}
+        self.failed: dict[str, list[tuple[float, str]]] = {name: [] for name in self.series}
+        self.errors: dict[str, str] = {}
+        self.lock = threading.Lock()
 
-    chapter_id = chapter_id_match.group(1)
-    image_count = int(image_count_match.group(1))
+    def chapter_downloaded(self, manga_name: str, chapter: float) -> None:
+        with self.lock:
+            self.new[manga_name].append(chapter)
 
-    chapter_soup = BeautifulSoup(chapter_html, "html.parser")
-    key_input = chapter_soup.find("input", {"id": "dm5_key"})
-    key = ""
-    if key_input and isinstance(key_input.get("value"), str):
-        key = key_input["value"]
+    def chapter_failed(self, manga_name: str, chapter: float, message: str) -> None:
+        with self.lock:
+            self.failed[manga_name].append((chapter, message))
 
-    chapterfun_url = urllib.parse.urljoin(DESKTOP_URL_BASE, "chapterfun.ashx")
-    image_urls: list[str] = []
-    for page in range(1, image_count + 1):
-        query = urllib.parse.urlencode({"cid": chapter_id, "page": page, "key": key})
-        request_url = f"{chapterfun_url}?{query}"
-        _, _, payload = get_page_content_with_headers(
-            request_url,
-            {
-                "Referer": chapter_url,
-                "X-Requested-With": "XMLHttpRequest",
-            },
-            timeout=timeout,
-        )
-        unpacked = unpack_eval_packer(payload.decode("utf-8", "ignore"))
+    def series_failed(self, manga_name: str, message: str) -> None:
+        with self.lock:
+            self.errors[manga_name] = message
 
-        base_match = re.search(r'var\s+pix\s*=\s*"([^"]+)";', unpacked)
-        values_match = re.search(r"var\s+pvalue\s*=\s*\[(.*?)\];", unpacked, re.S)
-        if base_match is None or values_match is None:
-            print(f"Warning: unable to parse image payload for page {page}")
-            continue
+    @property
+    def failures(self) -> int:
+        return len(self.errors) + sum(len(failed) for failed in self.failed.values())
 
-        base_path = base_match.group(1)
-        values = re.findall(r'"([^"]+)"', values_match.group(1))
-        if not values:
-            print(f"Warning: no image values found for page {page}")
-            continue
+    def lines(self) -> list[str]:
+        lines = ["Watchlist summary:"]
+        for name in self.series:
+            if name in self.errors:
+                lines.append(f"  {name}: check failed: {self.errors[name]}")
+                continue
+            new = ", ".join(f"{chapter:g}" for chapter in sorted(self.new[name])) or "none"
+            lines.append(f"  {name}: new: {new}")
+            for chapter, message in sorted(self.failed[name]):
+                lines.append(f"    failed chapter {chapter:g}: {message}")
+        return lines
 
-        first_value = values[0]
-        if first_value.startswith("http://") or first_value.startswith("https://"):
-            image_url = first_value
-        elif first_value.startswith("//"):
-            image_url = f"https:{first_value}"
-        elif first_value.startswith("/"):
-            image_url = f"{base_path}{first_value}"
-        else:
-            image_url = first_value
 
-        image_urls.append(image_url)
+def run_watchlist_chapter(
+    summary: WatchlistSummary,
+    manga_name: str,
+    chapter: float,
+    job: Callable[[], None],
+) -> None:
+    try:
+        job()
+    except SystemExit as error:
+        summary.chapter_failed(manga_name, chapter, str(error.code))
+        return
+    except OSError as error:
+        summary.chapter_failed(manga_name, chapter, str(error))
+        return
+    summary.chapter_downloaded(manga_name, chapter)
 
-    if not image_urls:
-        raise SystemExit("Error: Unable to determine chapter image URLs")
 
-    return image_urls
+def check_watchlist(
+    entries: list[WatchlistEntry],
+    summary: WatchlistSummary,
+    output_dir: Path = Path("."),
+    force: bool = False,
+    workers: int = 1,
+    timeout: float = DEFAULT_TIMEOUT,
+    series_cache: SeriesPageCache | None = None,
+) -> list[tuple[str, float, str]]:
+    """Fetch every series page concurrently and return its pending chapters, interleaved."""
 
+    def check(position: int) -> tuple[int, list[tuple[str, float, str]]]:
+        entry = entries[position]
+        try:
+            chapter_urls = get_chapter_urls(entry.manga_name, timeout=timeout, cache=series_cache)
+            selected_chapters = select_chapters(
+                chapter_urls, entry.range_start, entry.range_end, entry.latest
+            )
+        except SystemExit as error:
+            summary.series_failed(entry.manga_name, str(error.code))
+            return position, []
+        except OSError as error:
+            summary.series_failed(entry.manga_name, str(error))
+            return position, []
+        pending_chapters = select_pending_chapters(
+            selected_chapters, entry.manga_name, output_dir, force, quiet=True
+        )
+        return position, [(entry.manga_name, chapter, url) for chapter, url in pending_chapters]
 
-def get_chapter_number(url_fragment: str) -> float | None:
-    match = re.search(r"/c(\d+(?:\.\d+)?)/", url_fragment)
-    if match is None:
-        return None
-    return float(match.group(1))
+    pending_by_series: list[list[tuple[str, float, str]]] = [[] for _ in entries]
+    for position, pending_chapters in iter_concurrently(check, range(len(entries)), workers):
+        pending_by_series[position] = pending_chapters
+    return interleave_series(pending_by_series)
 
 
-def write_binary_file(filename: Path, data: bytes) -> None:
-    filename.parent.mkdir(parents=True, exist_ok=True)
-    filename.write_bytes(data)
+async def download_watchlist_async(
+    pending_chapters: list[tuple[str, float, str]],
+    summary: WatchlistSummary,
+    output_dir: Path = Path("."),
+    create_cbz: bool = False,
+    remove_images: bool = False,
+    avg_delay: float = 2.0,
+    max_retries: int = 5,
+    workers: int = 1,
+    timeout: float = DEFAULT_TIMEOUT,
+    chapters_in_flight: int = 1,
+    adaptive: AdaptiveConcurrency | None = None,
+    resume: bool = False,
+    store: ContentStore | None = None,
+) -> None:
+    """Like ``download_chapters_async``, but a failed chapter does not stop the others."""
+    client = AsyncHTTPClient(workers)
+    chapter_slots = asyncio.Semaphore(chapters_in_flight)
 
+    async def run_chapter(manga_name: str, chapter: float, url: str) -> None:
+        async with chapter_slots:
+            try:
+                await download_chapter_async(
+                    client,
+                    url,
+                    manga_name,
+                    chapter,
+                    output_dir=output_dir,
+                    create_cbz=create_cbz,
+                    remove_images=remove_images,
+                    avg_delay=avg_delay,
+                    max_retries=max_retries,
+                    timeout=timeout,
+                    adaptive=adaptive,
+                    resume=resume,
+                    store=store,
+                )
+            except SystemExit as error:
+                summary.chapter_failed(manga_name, chapter, str(error.code))
+                return
+            except (AsyncChapterError, OSError) as error:
+                summary.chapter_failed(manga_name, chapter, str(error))
+                return
+            summary.chapter_downloaded(manga_name, chapter)
 
-def download_urls(
-    image_urls: Iterable[str],
-    manga_name: str,
-    chapter_number: float,
+    try:
+        await asyncio.gather(*(run_chapter(*pending) for pending in pending_chapters))
+    finally:
+        client.close()
+
+
+def download_watchlist(
+    entries: list[WatchlistEntry],
     output_dir: Path = Path("."),
+    create_cbz: bool = False,
+    remove_images: bool = False,
+    force: bool = False,
     avg_delay: float = 2.0,
     max_retries: int = 5,
     workers: int = 1,
     timeout: float = DEFAULT_TIMEOUT,
+    chapters_in_flight: int = 1,
+    engine: str = "thread",
+    adaptive: bool = False,
+    series_cache: SeriesPageCache | None = None,
+    dedup: bool = False,
 ) -> None:
-    image_list = list(image_urls)
-    chapter_label = f"{chapter_number:g}"
-    download_dir = output_dir / manga_name / chapter_label
-    if download_dir.exists():
-        shutil.rmtree(download_dir)
-    download_dir.mkdir(parents=True)
+    """Check every watchlist series and download new chapters through one scheduler.
+
+    Chapters of all series share one worker pool (or async client), the
+    per-host connection pool and rate limits, and are interleaved round-robin.
+    A failing series or chapter is reported in the summary instead of stopping
+    the run.
+    """
+    summary = WatchlistSummary(entries)
+    pending_chapters = check_watchlist(
+        entries,
+        summary,
+        output_dir=output_dir,
+        force=force,
+        workers=workers,
+        timeout=timeout,
+        series_cache=series_cache,
+    )
+    print(f"{len(pending_chapters)} chapter(s) to download across {len(entries)} series")
+
+    controller = AdaptiveConcurrency(workers) if adaptive else None
+    store = ContentStore(output_dir / STORE_NAME) if dedup else None
+    try:
+        if engine == "async":
+            asyncio.run(
+                download_watchlist_async(
+                    pending_chapters,
+                    summary,
+                    output_dir=output_dir,
+                    create_cbz=create_cbz,
+                    remove_images=remove_images,
+                    avg_delay=avg_delay,
+                    max_retries=max_retries,
+                    workers=workers,
+                    timeout=timeout,
+                    chapters_in_flight=chapters_in_flight,
+                    adaptive=controller,
+                    resume=not force,
+                    store=store,
+                )
+            )
+        else:
+            with worker_pool(workers) if workers > 1 else nullcontext() as executor:
+                run_chapter_jobs(
+                    (
+                        partial(
+                            run_watchlist_chapter,
+                            summary,
+                            manga_name,
+                            chapter,
+                            partial(
+                                download_chapter,
+                                url,
+                                manga_name,
+                                chapter,
+                                output_dir=output_dir,
+                                create_cbz=create_cbz,
+                                remove_images=remove_images,
+                                avg_delay=avg_delay,
+                                max_retries=max_retries,
+                                workers=workers,
+                                timeout=timeout,
+                                executor=executor,
+                                adaptive=controller,
+                                resume=not force,
+                                store=store,
+                            ),
+                        )
+                        for manga_name, chapter, url in pending_chapters
+                    ),
+                    chapters_in_flight,
+                )
+    finally:
+        print_run_report(controller, store)
 
-    random.seed()
+    print("\n".join(summary.lines()))
+    if summary.failures:
+        raise SystemExit(f"Error: {summary.failures} watchlist failure(s); see summary above")
 
-    def download_image(index: int, url: str) -> str | None:
-        filename = download_dir / f"{index:03}.jpg"
 
-        attempt = 0
-        while attempt < max_retries:
-            attempt += 1
-            try:
-                status, content_type, data = get_page_content(url, timeout=timeout)
-                if status < 200 or status >= 300:
-                    print(
-                        f"Warning: got status {status} for {url} (attempt {attempt}/{max_retries})"
-                    )
-                elif not content_type.startswith("image/"):
-                    print(
-                        f"Warning: expected image for {url}, got content-type "
-                        f"'{content_type}' (attempt {attempt}/{max_retries})"
-                    )
-                else:
-                    write_binary_file(filename, data)
-                    return None
-            except urllib.error.HTTPError as http_error:
-                print(f"HTTP error {http_error.code}: {http_error.reason}")
-                if http_error.code == 404:
-                    break
-            except urllib.error.URLError as url_error:
-                print(f"URL error: {url_error.reason}")
+class ChapterQueue:
+    """SQLite queue of chapters shared by planner and worker processes.
 
-            if attempt < max_retries:
-                retry_delay = random.uniform(avg_delay * 0.6, avg_delay * 1.4)
-                time.sleep(retry_delay)
+    Workers lease one chapter at a time for ``lease_seconds`` and keep the lease
+    alive with heartbeats; a chapter whose lease expires (its worker died) is
+    handed to the next worker, which resumes it from the chapter manifest. The
+    database lives on the shared volume, so that volume must support the file
+    locks SQLite relies on.
+    """
 
-        return filename.name
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            manga TEXT NOT NULL,
+            chapter REAL NOT NULL,
+            url TEXT NOT NULL,
+            state TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            owner TEXT,
+            lease_expires REAL,
+            error TEXT,
+            PRIMARY KEY (manga, chapter)
+        );
+        CREATE INDEX IF NOT EXISTS jobs_by_state ON jobs (state, lease_expires);
+    """
 
-    with tqdm(
-        total=len(image_list),
-        desc=f"Chapter {chapter_label}",
-        unit="img",
-        disable=not sys.stderr.isatty(),
-    ) as progress:
-        failed_images: list[str] = []
-        if workers == 1:
-            for index, url in enumerate(image_list):
-                failed_image = download_image(index, url)
-                if failed_image is not None:
-                    failed_images.append(failed_image)
-                progress.update(1)
+    def __init__(self, path: Path, max_attempts: int = MAX_JOB_ATTEMPTS) -> None:
+        self.path = path
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(
+                path, timeout=60, isolation_level=None, check_same_thread=False
+            )
+            self._connection.executescript(self.SCHEMA)
+        except (OSError, sqlite3.Error) as error:
+            raise SystemExit(f"Error: unable to open job queue {path}: {error}") from None
 
-        else:
-            with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
-                futures = [
-                    executor.submit(download_image, index, url)
-                    for index, url in enumerate(image_list)
-                ]
-                for future in concurrent.futures.as_completed(futures):
-                    failed_image = future.result()
-                    if failed_image is not None:
-                        failed_images.append(failed_image)
-                    progress.update(1)
+    def close(self) -> None:
+        self._connection.close()
 
-        if failed_images:
-            failed_list = ", ".join(sorted(failed_images))
-            raise SystemExit(
-                f"Error: failed to download {len(failed_images)} image(s) "
-                f"for chapter {chapter_label}: {failed_list}"
-            )
+    @contextmanager
+    def _transaction(self) -> Generator[sqlite3.Connection]:
+        """Hold the database write lock, so concurrent workers never lease the same job."""
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._connection
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+            self._connection.execute("COMMIT")
 
+    def enqueue(self, chapters: Iterable[tuple[str, float, str]], force: bool = False) -> int:
+        """Queue new chapters and requeue failed ones (done ones too with ``force``)."""
+        requeue = ("failed", "done") if force else ("failed",)
+        with self._transaction() as connection:
+            before = connection.total_changes
+            for manga, chapter, url in chapters:
+                connection.execute(
+                    "INSERT INTO jobs (manga, chapter, url) VALUES (?, ?, ?) "
+                    "ON CONFLICT (manga, chapter) DO UPDATE SET url = excluded.url, "
+                    "state = 'pending', attempts = 0, owner = NULL, error = NULL "
+                    f"WHERE state IN ({', '.join('?' for _ in requeue)})",
+                    (manga, chapter, url, *requeue),
+                )
+            return connection.total_changes - before
 
-def make_cbz(dirname: str) -> None:
-    zipname = f"{dirname}.cbz"
-    images = sorted(Path(dirname).glob("*.jpg"))
-    with closing(ZipFile(zipname, "w")) as zipfile:
-        for filename in images:
-            zipfile.write(filename, arcname=filename.name)
+    def lease(self, owner: str, lease_seconds: float) -> tuple[str, float, str] | None:
+        """Lease the oldest pending (or abandoned) chapter to ``owner``."""
+        now = time.time()
+        with self._transaction() as connection:
+            connection.execute(
+                "UPDATE jobs SET state = 'failed', owner = NULL, "
+                "error = 'lease expired ' || attempts || ' time(s)' "
+                "WHERE state = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (now, self.max_attempts),
+            )
+            row = connection.execute(
+                "SELECT rowid, manga, chapter, url FROM jobs "
+                "WHERE state = 'pending' OR (state = 'leased' AND lease_expires < ?) "
+                "ORDER BY rowid LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is None:
+                return None
+            rowid, manga, chapter, url = row
+            connection.execute(
+                "UPDATE jobs SET state = 'leased', owner = ?, lease_expires = ?, "
+                "attempts = attempts + 1 WHERE rowid = ?",
+                (owner, now + lease_seconds, rowid),
+            )
+        return manga, chapter, url
 
+    def renew(self, manga: str, chapter: float, owner: str, lease_seconds: float) -> bool:
+        """Extend ``owner``'s lease; ``False`` means the lease was lost to another worker."""
+        with self._transaction() as connection:
+            renewed = connection.execute(
+                "UPDATE jobs SET lease_expires = ? "
+                "WHERE manga = ? AND chapter = ? AND owner = ? AND state = 'leased'",
+                (time.time() + lease_seconds, manga, chapter, owner),
+            ).rowcount
+        return renewed == 1
 
-def select_chapters(
-    chapter_urls: OrderedDict[float, str],
-    range_start: float = 1,
-    range_end: float | None = None,
-    latest: int | None = None,
-) -> OrderedDict[float, str]:
-    if latest is not None and latest < 1:
-        raise SystemExit("Error: --latest must be >= 1")
+    def finish(self, manga: str, chapter: float, owner: str, error: str | None = None) -> bool:
+        """Mark ``owner``'s chapter done, or failed with ``error``."""
+        with self._transaction() as connection:
+            finished = connection.execute(
+                "UPDATE jobs SET state = ?, owner = NULL, lease_expires = NULL, error = ? "
+                "WHERE manga = ? AND chapter = ? AND owner = ? AND state = 'leased'",
+                ("done" if error is None else "failed", error, manga, chapter, owner),
+            ).rowcount
+        return finished == 1
 
-    if range_end is None:
-        range_end = max(chapter_urls.keys())
+    def counts(self) -> dict[str, int]:
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT state, COUNT(*) FROM jobs GROUP BY state"
+            ).fetchall()
+        counts = dict.fromkeys(("pending", "leased", "done", "failed"), 0)
+        counts.update(rows)
+        return counts
 
-    selected = [
-        (chapter, url)
-        for chapter, url in chapter_urls.items()
-        if range_start <= chapter <= range_end
-    ]
-    if latest is not None:
-        selected = selected[-latest:]
+    def failures(self) -> list[tuple[str, float, str]]:
+        with self._lock:
+            return self._connection.execute(
+                "SELECT manga, chapter, error FROM jobs WHERE state = 'failed' ORDER BY rowid"
+            ).fetchall()
 
-    return OrderedDict(selected)
 
+def describe_queue(queue: ChapterQueue) -> str:
+    counts = queue.counts()
+    return ", ".join(f"{count} {state}" for state, count in counts.items())
 
-def download_manga(
+
+@contextmanager
+def lease_heartbeat(
+    queue: ChapterQueue,
     manga_name: str,
-    range_start: float = 1,
-    range_end: float | None = None,
+    chapter: float,
+    owner: str,
+    lease_seconds: float,
+) -> Generator[threading.Event]:
+    """Renew a chapter lease in the background every third of ``lease_seconds``.
+
+    The yielded event is set once the lease is lost to another worker, so the
+    download can stop instead of racing the new owner. A renewal that fails on
+    a busy or unreachable database is retried on the next beat.
+    """
+    label = f"{manga_name} chapter {chapter:g}"
+    stopped = threading.Event()
+    lost = threading.Event()
+
+    def renew() -> None:
+        while not stopped.wait(lease_seconds / 3):
+            try:
+                renewed = queue.renew(manga_name, chapter, owner, lease_seconds)
+            except sqlite3.OperationalError as error:
+                print(f"Warning: unable to renew the lease on {label}: {error}")
+                continue
+            if not renewed:
+                print(f"Warning: lost the lease on {label}")
+                lost.set()
+                return
+
+    heartbeat = threading.Thread(target=renew, daemon=True)
+    heartbeat.start()
+    try:
+        yield lost
+    finally:
+        stopped.set()
+        heartbeat.join()
+
+
+def plan_queue(
+    queue: ChapterQueue,
+    entries: list[WatchlistEntry],
+    output_dir: Path = Path("."),
+    force: bool = False,
+    workers: int = 1,
+    timeout: float = DEFAULT_TIMEOUT,
+    series_cache: SeriesPageCache | None = None,
+) -> None:
+    """Queue the selected, not yet downloaded chapters of every series."""
+    summary = WatchlistSummary(entries)
+    pending_chapters = check_watchlist(
+        entries,
+        summary,
+        output_dir=output_dir,
+        force=force,
+        workers=workers,
+        timeout=timeout,
+        series_cache=series_cache,
+    )
+    queued = queue.enqueue(pending_chapters, force=force)
+    print(f"Queued {queued} chapter(s) in {queue.path}: {describe_queue(queue)}")
+    for manga_name, message in summary.errors.items():
+        print(f"  {manga_name}: check failed: {message}")
+    if summary.errors:
+        raise SystemExit(f"Error: unable to check {len(summary.errors)} series")
+
+
+def run_queue_worker(
+    queue: ChapterQueue,
     output_dir: Path = Path("."),
     create_cbz: bool = False,
     remove_images: bool = False,
-    force: bool = False,
     avg_delay: float = 2.0,
     max_retries: int = 5,
     workers: int = 1,
     timeout: float = DEFAULT_TIMEOUT,
-    latest: int | None = None,
+    chapters_in_flight: int = 1,
+    engine: str = "thread",
+    adaptive: bool = False,
+    dedup: bool = False,
+    lease_seconds: float = DEFAULT_LEASE_SECONDS,
 ) -> None:
-    chapter_urls = get_chapter_urls(manga_name, timeout=timeout)
-    selected_chapters = select_chapters(chapter_urls, range_start, range_end, latest)
+    """Lease and download chapters from ``queue`` until none are left.
 
-    for chapter, url in selected_chapters.items():
-        chapter_cbz = output_dir / manga_name / f"{chapter:g}.cbz"
-        if chapter_cbz.exists() and not force:
-            print(f"Skipping chapter {chapter:g} (already downloaded)")
-            continue
+    ``chapters_in_flight`` lease loops share one worker pool. Leased chapters
+    always resume from their manifest, so a chapter abandoned by a dead worker
+    only fetches the images that are still missing.
+    """
+    controller = AdaptiveConcurrency(workers) if adaptive else None
+    store = ContentStore(output_dir / STORE_NAME) if dedup else None
+    node = f"{socket.gethostname()}:{os.getpid()}"
+    done: list[str] = []
+    failed: list[str] = []
 
-        image_urls = get_chapter_image_urls(url, timeout=timeout)
-        download_urls(
-            image_urls,
-            manga_name,
-            chapter,
-            output_dir=output_dir,
-            avg_delay=avg_delay,
-            max_retries=max_retries,
-            workers=workers,
-            timeout=timeout,
-        )
-        download_dir = output_dir / manga_name / f"{chapter:g}"
-        if create_cbz:
-            make_cbz(str(download_dir))
-            if remove_images:
-                shutil.rmtree(download_dir)
+    def lease_loop(executor: concurrent.futures.Executor | None) -> None:
+        owner = f"{node}:{uuid.uuid4().hex[:8]}"
+        while (job := queue.lease(owner, lease_seconds)) is not None:
+            manga_name, chapter, url = job
+            label = f"{manga_name} chapter {chapter:g}"
+            print(f"Leased {label}")
+            try:
+                with lease_heartbeat(queue, manga_name, chapter, owner, lease_seconds) as lost:
+                    if engine == "async":
+                        download_pending_chapters(
+                            [(chapter, url)],
+                            manga_name,
+                            output_dir=output_dir,
+                            create_cbz=create_cbz,
+                            remove_images=remove_images,
+                            avg_delay=avg_delay,
+                            max_retries=max_retries,
+                            workers=workers,
+                            timeout=timeout,
+                            engine=engine,
+                            adaptive=controller,
+                            resume=True,
+                            store=store,
+                            cancelled=lost,
+                        )
+                    else:
+                        download_chapter(
+                            url,
+                            manga_name,
+                            chapter,
+                            output_dir=output_dir,
+                            create_cbz=create_cbz,
+                            remove_images=remove_images,
+                            avg_delay=avg_delay,
+                            max_retries=max_retries,
+                            workers=workers,
+                            timeout=timeout,
+                            executor=executor,
+                            adaptive=controller,
+                            resume=True,
+                            store=store,
+                            cancelled=lost,
+                        )
+            except ChapterCancelled:
+                print(f"Warning: abandoned {label} after losing its lease")
+                continue
+            except SystemExit as error:
+                queue.finish(manga_name, chapter, owner, error=str(error.code))
+                failed.append(label)
+                continue
+            except OSError as error:
+                queue.finish(manga_name, chapter, owner, error=str(error))
+                failed.append(label)
+                continue
+            if not queue.finish(manga_name, chapter, owner):
+                print(f"Warning: {label} finished after its lease was lost")
+            done.append(label)
+
+    try:
+        with worker_pool(workers) if workers > 1 and engine != "async" else nullcontext() as pool:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=chapters_in_flight) as loops:
+                for future in [loops.submit(lease_loop, pool) for _ in range(chapters_in_flight)]:
+                    future.result()
+    finally:
+        print_run_report(controller, store)
+
+    print(
+        f"Worker {node} downloaded {len(done)} chapter(s), failed {len(failed)}; "
+        f"queue: {describe_queue(queue)}"
+    )
+    for label in failed:
+        print(f"  failed: {label}")
+    if failed:
+        raise SystemExit(f"Error: {len(failed)} chapter(s) failed on this worker")
 
 
 def parse_arguments() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Manga Fox Downloader")
 
-    parser.add_argument("--manga", "-m", required=True, action="store", help="Manga to download")
+    series = parser.add_mutually_exclusive_group()
+    series.add_argument("--manga", "-m", action="store", help="Manga to download")
+    series.add_argument(
+        "--watchlist",
+        action="store",
+        type=Path,
+        default=None,
+        help="File with one series per line, optionally followed by --start/--end/--latest; "
+        "all series are checked and downloaded through one shared scheduler",
+    )
     parser.add_argument(
         "--start",
         "-s",
@@ -569,6 +4051,96 @@ def parse_arguments() -> argparse.Namespace:
         default=None,
         help="Maximum retries per image (overrides profile)",
     )
+    parser.add_argument(
+        "--engine",
+        action="store",
+        choices=["thread", "async"],
+        default="thread",
+        help="Download engine: OS threads (default) or asyncio coroutines",
+    )
+    parser.add_argument(
+        "--chapters-in-flight",
+        action="store",
+        type=int,
+        default=None,
+        help="Chapters resolved and downloaded at the same time (overrides profile)",
+    )
+    parser.add_argument(
+        "--adaptive",
+        action="store_true",
+        default=False,
+        help="Adapt concurrent image downloads (up to --workers) to errors and latency",
+    )
+    parser.add_argument(
+        "--html-rate",
+        action="store",
+        type=float,
+        default=None,
+        help="Requests per second to Fanfox page hosts, 0 for unlimited (overrides profile)",
+    )
+    parser.add_argument(
+        "--image-rate",
+        action="store",
+        type=float,
+        default=None,
+        help="Requests per second to each image host, 0 for unlimited (overrides profile)",
+    )
+    parser.add_argument(
+        "--burst",
+        action="store",
+        type=int,
+        default=None,
+        help="Requests allowed back-to-back before rate pacing applies (default: --workers)",
+    )
+    parser.add_argument(
+        "--max-inflight-mb",
+        action="store",
+        type=float,
+        default=None,
+        help="Image megabytes allowed in flight across all workers; 0 disables "
+        "(default: profile safe=32, balanced=64, aggressive=128)",
+    )
+    parser.add_argument(
+        "--parse-processes",
+        action="store",
+        type=int,
+        default=0,
+        help="Parse pages and unpack chapterfun.ashx payloads in this many worker "
+        "processes instead of the download threads (default: 0)",
+    )
+    parser.add_argument(
+        "--dedup",
+        action="store_true",
+        help=f"Keep images in a content-addressed store ({STORE_NAME} in --output-dir) "
+        "and hardlink them into chapter directories",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        action="store",
+        type=Path,
+        default=None,
+        help="Directory for cached series pages (default: $XDG_CACHE_HOME/mfdl)",
+    )
+    parser.add_argument(
+        "--cache-ttl",
+        action="store",
+        type=float,
+        default=0.0,
+        help="Seconds a cached series page is used without revalidating it (default: 0)",
+    )
+    parser.add_argument(
+        "--resolution-ttl",
+        action="store",
+        type=float,
+        default=DEFAULT_RESOLUTION_TTL,
+        help="Seconds resolved chapter image URLs are reused before resolving again "
+        f"(default: {DEFAULT_RESOLUTION_TTL:g})",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always download and parse the series page and resolve image URLs",
+    )
     parser.add_argument(
         "--timeout",
         action="store",
@@ -576,8 +4148,78 @@ def parse_arguments() -> argparse.Namespace:
         default=DEFAULT_TIMEOUT,
         help=f"HTTP request timeout in seconds (default: {DEFAULT_TIMEOUT:g})",
     )
+    parser.add_argument(
+        "--queue-db",
+        action="store",
+        type=Path,
+        default=None,
+        help="SQLite job queue on a shared volume, used with --plan or --worker",
+    )
+    queue_mode = parser.add_mutually_exclusive_group()
+    queue_mode.add_argument(
+        "--plan",
+        action="store_true",
+        help="Queue the selected chapters of --manga/--watchlist in --queue-db and exit",
+    )
+    queue_mode.add_argument(
+        "--worker",
+        action="store_true",
+        help="Lease and download chapters from --queue-db until it is empty",
+    )
+    parser.add_argument(
+        "--lease-seconds",
+        action="store",
+        type=float,
+        default=DEFAULT_LEASE_SECONDS,
+        help="Seconds a worker's lease on a chapter lasts without a heartbeat "
+        f"(default: {DEFAULT_LEASE_SECONDS:g})",
+    )
+    parser.add_argument(
+        "--metrics-json",
+        action="store",
+        type=Path,
+        default=None,
+        help="Write per-stage request metrics of the run to this JSON file",
+    )
+    parser.add_argument(
+        "--metrics-prom",
+        action="store",
+        type=Path,
+        default=None,
+        help="Write per-stage request metrics of the run as a Prometheus textfile",
+    )
+    parser.add_argument(
+        "--trace-profile",
+        action="store",
+        type=Path,
+        default=None,
+        help="Write a CPU profile of the run (pstats) and a per-step timing breakdown",
+    )
+    parser.add_argument(
+        "--trace-sample-ms",
+        action="store",
+        type=float,
+        default=None,
+        help="With --trace-profile, also sample every thread's stack at this interval "
+        "and write the wall-clock samples for speedscope",
+    )
 
-    return parser.parse_args()
+    args = parser.parse_args()
+    if (args.plan or args.worker) and args.queue_db is None:
+        parser.error("--plan and --worker require --queue-db")
+    if args.queue_db is not None and not (args.plan or args.worker):
+        parser.error("--queue-db requires --plan or --worker")
+    if args.worker and args.list:
+        parser.error("--list cannot be used with --worker")
+    if not args.worker and args.manga is None and args.watchlist is None:
+        parser.error("one of the arguments --manga/-m --watchlist is required")
+    if args.lease_seconds <= 0:
+        parser.error("--lease-seconds must be > 0")
+    if args.trace_sample_ms is not None and args.trace_profile is None:
+        parser.error("--trace-sample-ms requires --trace-profile")
+    if args.trace_sample_ms is not None and args.trace_sample_ms <= 0:
+        parser.error("--trace-sample-ms must be > 0")
+    return args
 
 
 def resolve_runtime_settings(args: argparse.Namespace) -> tuple[float, int, int, float]:
@@ -602,35 +4244,391 @@ def resolve_runtime_settings(args: argparse.Namespace) -> tuple[float, int, int,
     return avg_delay, max_retries, workers, timeout
 
 
+def resolve_rate_limits(
+    args: argparse.Namespace,
+    workers: int,
+) -> tuple[float | None, float | None, int]:
+    profile_settings = PROFILE_DEFAULTS[args.profile]
+
+    html_rate = float(
+        args.html_rate if args.html_rate is not None else profile_settings["html_rate"]
+    )
+    image_rate = float(
+        args.image_rate if args.image_rate is not None else profile_settings["image_rate"]
+    )
+    burst = int(args.burst if args.burst is not None else workers)
+
+    if html_rate < 0:
+        raise SystemExit("Error: --html-rate must be >= 0")
+    if image_rate < 0:
+        raise SystemExit("Error: --image-rate must be >= 0")
+    if burst < 1:
+        raise SystemExit("Error: --burst must be >= 1")
+
+    return html_rate or None, image_rate or None, burst
+
+
+def resolve_cache_dir(args: argparse.Namespace) -> Path | None:
+    if args.no_cache:
+        return None
+    return args.cache_dir or default_cache_dir()
+
+
+def resolve_series_cache(args: argparse.Namespace) -> SeriesPageCache | None:
+    cache_dir = resolve_cache_dir(args)
+    if cache_dir is None:
+        return None
+    if args.cache_ttl < 0:
+        raise SystemExit("Error: --cache-ttl must be >= 0")
+    return SeriesPageCache(cache_dir, args.cache_ttl)
+
+
+def resolve_resolution_cache(args: argparse.Namespace) -> tuple[Path | None, float]:
+    cache_dir = resolve_cache_dir(args)
+    if cache_dir is None:
+        return None, DEFAULT_RESOLUTION_TTL
+    if args.resolution_ttl < 0:
+        raise SystemExit("Error: --resolution-ttl must be >= 0")
+    return cache_dir / RESOLUTION_CACHE_NAME, args.resolution_ttl
+
+
+def resolve_parse_processes(args: argparse.Namespace) -> int:
+    if args.parse_processes < 0:
+        raise SystemExit("Error: --parse-processes must be >= 0")
+    return args.parse_processes
+
+
+def resolve_inflight_budget(args: argparse.Namespace) -> int | None:
+    max_inflight_mb = float(
+        args.max_inflight_mb
+        if args.max_inflight_mb is not None
+        else PROFILE_DEFAULTS[args.profile]["max_inflight_mb"]
+    )
+    if max_inflight_mb < 0:
+        raise SystemExit("Error: --max-inflight-mb must be >= 0")
+    return int(max_inflight_mb * 1024 * 1024) or None
+
+
+def resolve_chapters_in_flight(args: argparse.Namespace) -> int:
+    chapters_in_flight = int(
+        args.chapters_in_flight
+        if args.chapters_in_flight is not None
+        else PROFILE_DEFAULTS[args.profile]["chapters_in_flight"]
+    )
+    if chapters_in_flight < 1:
+        raise SystemExit("Error: --chapters-in-flight must be >= 1")
+    return chapters_in_flight
+
+
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+# Before 3.12 cProfile hooks only the thread that enables it, so each worker thread
+# gets its own profiler; from 3.12 one profiler sees every thread.
+PROFILE_PER_THREAD = sys.version_info < (3, 12)
+
+
+class WallClockSampler:
+    """Samples the stacks of every thread at a fixed interval, for speedscope.
+
+    Unlike cProfile it also sees time spent blocked on sockets, locks and the
+    rate limiter, which is where most of a download run goes.
+    """
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self.frames: list[dict[str, Any]] = []
+        self.samples: dict[int, list[tuple[list[int], float]]] = {}
+        self.thread_names: dict[int, str] = {}
+        self._frame_ids: dict[tuple[str, str, int], int] = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="mfdl-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        previous = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            self.sample(now - previous)
+            previous = now
+
+    def sample(self, weight: float) -> None:
+        """Record the current stack of every other thread with ``weight`` seconds."""
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == threading.get_ident():
+                continue
+            stack: list[int] = []
+            current = frame
+            while current is not None:
+                stack.append(self._frame_id(current.f_code))
+                current = current.f_back
+            stack.reverse()
+            self.thread_names.setdefault(ident, names.get(ident, str(ident)))
+            self.samples.setdefault(ident, []).append((stack, weight))
+
+    def _frame_id(self, code: Any) -> int:
+        key = (code.co_name, code.co_filename, code.co_firstlineno)
+        frame_id = self._frame_ids.get(key)
+        if frame_id is None:
+            frame_id = self._frame_ids[key] = len(self.frames)
+            self.frames.append({"name": key[0], "file": key[1], "line": key[2]})
+        return frame_id
+
+    def to_speedscope(self, name: str) -> dict[str, Any]:
+        profiles = []
+        for ident, samples in self.samples.items():
+            weights = [weight for _, weight in samples]
+            profiles.append(
+                {
+                    "type": "sampled",
+                    "name": self.thread_names[ident],
+                    "unit": "seconds",
+                    "startValue": 0,
+                    "endValue": sum(weights),
+                    "samples": [stack for stack, _ in samples],
+                    "weights": weights,
+                }
+            )
+        return {
+            "$schema": SPEEDSCOPE_SCHEMA,
+            "name": name,
+            "exporter": "mfdl",
+            "activeProfileIndex": 0,
+            "shared": {"frames": self.frames},
+            "profiles": profiles,
+        }
+
+
+class RunProfiler:
+    """``--trace-profile``: CPU profile, optional wall-clock samples and step timings.
+
+    ``path`` receives the cProfile data of the main thread and every worker
+    thread merged into one pstats file, ``<path>.steps.json`` the per-step
+    timing breakdown from ``METRICS`` and, when ``sample_interval`` is set,
+    ``<path>.speedscope.json`` the wall-clock samples. Parse worker processes
+    of ``--parse-processes`` are not profiled.
+    """
+
+    def __init__(self, path: Path, sample_interval: float | None = None) -> None:
+        self.path = path
+        self.sampler = WallClockSampler(sample_interval) if sample_interval else None
+        self._profiler = cProfile.Profile()
+        self._thread_profilers: list[cProfile.Profile] = []
+        self._lock = threading.Lock()
+        self._started = 0.0
+
+    def start(self) -> None:
+        self._started = time.perf_counter()
+        # The sampler starts first so that its own thread is not profiled.
+        if self.sampler is not None:
+            self.sampler.start()
+        if PROFILE_PER_THREAD:
+            threading.setprofile(self._profile_thread)
+        self._profiler.enable()
+
+    def _profile_thread(self, _frame: Any, _event: str, _arg: Any) -> None:
+        # Runs on the first event of each new thread; enabling replaces this hook.
+        profiler = cProfile.Profile()
+        with self._lock:
+            self._thread_profilers.append(profiler)
+        profiler.enable()
+
+    def stop(self) -> None:
+        self._profiler.disable()
+        threading.setprofile(None)
+        elapsed = time.perf_counter() - self._started
+        if self.sampler is not None:
+            self.sampler.stop()
+
+        stats = pstats.Stats(self._profiler)
+        with self._lock:
+            for profiler in self._thread_profilers:
+                # An idle thread may never have called a function while profiled.
+                with suppress(TypeError):
+                    stats.add(profiler)
+        steps = {name: histogram.to_json() for name, histogram in METRICS.steps.items()}
+        for line in format_step_breakdown(steps, elapsed):
+            print(line)
+        try:
+            stats.dump_stats(self.path)
+            write_json_atomically(
+                self.path.with_name(f"{self.path.name}.steps.json"),
+                {"elapsed_seconds": elapsed, "steps": steps},
+            )
+            if self.sampler is not None:
+                write_json_atomically(
+                    self.path.with_name(f"{self.path.name}.speedscope.json"),
+                    self.sampler.to_speedscope(self.path.name),
+                )
+        except OSError as error:
+            print(f"Warning: unable to write profile: {error}")
+            return
+        print(f"CPU profile written to {self.path} (python -m pstats {self.path})")
+
+
+def format_step_breakdown(steps: dict[str, dict[str, Any]], elapsed: float) -> list[str]:
+    """Lines of a per-step table: calls, total and mean seconds, share of the run.
+
+    Steps of chapters in flight at the same time overlap, so shares can add up
+    to more than 100%.
+    """
+    lines = [f"{'Step':<32}{'calls':>7}{'total s':>10}{'mean s':>9}{'of run':>8}"]
+    for name, histogram in sorted(steps.items(), key=lambda item: -item[1]["sum"]):
+        count, total = histogram["count"], histogram["sum"]
+        share = total / elapsed if elapsed > 0 else 0.0
+        lines.append(f"{name:<32}{count:>7}{total:>10.2f}{total / count:>9.3f}{share:>8.0%}")
+    return lines
+
+
+def export_metrics(json_path: Path | None, prometheus_path: Path | None, success: bool) -> None:
+    """Write ``METRICS`` to the ``--metrics-json``/``--metrics-prom`` files that were asked for."""
+    try:
+        if json_path is not None:
+            write_json_atomically(json_path, METRICS.to_json(success))
+        if prometheus_path is not None:
+            write_text_atomically(prometheus_path, METRICS.to_prometheus(success))
+    except OSError as error:
+        print(f"Warning: unable to write metrics: {error}")
+
+
 def main() -> None:
     args = parse_arguments()
 
     if args.debug:
         debug_http_requests()
 
+    series_cache = resolve_series_cache(args)
+
+    entries = None
+    if args.watchlist is not None:
+        entries = parse_watchlist(args.watchlist, args.start, args.end, args.latest)
+
     if args.list:
-        chapter_urls = get_chapter_urls(args.manga, timeout=args.timeout)
-        selected_chapters = select_chapters(chapter_urls, args.start, args.end, args.latest)
-        for chapter in selected_chapters:
-            print(chapter)
+        if entries is None:
+            chapter_urls = get_chapter_urls(args.manga, timeout=args.timeout, cache=series_cache)
+            selected_chapters = select_chapters(chapter_urls, args.start, args.end, args.latest)
+            for chapter in selected_chapters:
+                print(chapter)
+            return
+        for entry in entries:
+            chapter_urls = get_chapter_urls(
+                entry.manga_name, timeout=args.timeout, cache=series_cache
+            )
+            selected_chapters = select_chapters(
+                chapter_urls, entry.range_start, entry.range_end, entry.latest
+            )
+            print(f"{entry.manga_name}: {' '.join(str(chapter) for chapter in selected_chapters)}")
         return
 
     avg_delay, max_retries, workers, timeout = resolve_runtime_settings(args)
+    chapters_in_flight = resolve_chapters_in_flight(args)
+    HTTP_POOL.resize(workers)
+    RATE_LIMITER.configure(*resolve_rate_limits(args, workers))
+    BYTE_BUDGET.configure(resolve_inflight_budget(args))
+    RESOLUTION_CACHE.configure(*resolve_resolution_cache(args))
+    PARSER_POOL.configure(resolve_parse_processes(args))
 
-    download_manga(
-        args.manga,
-        args.start,
-        args.end,
-        args.output_dir,
-        args.cbz,
-        args.remove,
-        args.force,
-        avg_delay,
-        max_retries,
-        workers,
-        timeout,
-        args.latest,
-    )
+    METRICS.reset()
+    succeeded = False
+    queue = ChapterQueue(args.queue_db) if args.queue_db is not None else None
+    profiler = None
+    if args.trace_profile is not None:
+        sample_interval = args.trace_sample_ms / 1000 if args.trace_sample_ms else None
+        profiler = RunProfiler(args.trace_profile, sample_interval)
+        profiler.start()
+    try:
+        if queue is not None and args.plan:
+            plan_queue(
+                queue,
+                entries or [WatchlistEntry(args.manga, args.start, args.end, args.latest)],
+                args.output_dir,
+                args.force,
+                workers,
+                timeout,
+                series_cache,
+            )
+        elif queue is not None:
+            run_queue_worker(
+                queue,
+                args.output_dir,
+                args.cbz,
+                args.remove,
+                avg_delay,
+                max_retries,
+                workers,
+                timeout,
+                chapters_in_flight,
+                args.engine,
+                args.adaptive,
+                args.dedup,
+                args.lease_seconds,
+            )
+        elif entries is not None:
+            download_watchlist(
+                entries,
+                args.output_dir,
+                args.cbz,
+                args.remove,
+                args.force,
+                avg_delay,
+                max_retries,
+                workers,
+                timeout,
+                chapters_in_flight,
+                args.engine,
+                args.adaptive,
+                series_cache,
+                args.dedup,
+            )
+        else:
+            download_manga(
+                args.manga,
+                args.start,
+                args.end,
+                args.output_dir,
+                args.cbz,
+                args.remove,
+                args.force,
+                avg_delay,
+                max_retries,
+                workers,
+                timeout,
+                args.latest,
+                chapters_in_flight,
+                args.engine,
+                args.adaptive,
+                series_cache,
+                args.dedup,
+            )
+        succeeded = True
+    finally:
+        PARSER_POOL.shutdown()
+        if queue is not None:
+            queue.close()
+        if profiler is not None:
+            profiler.stop()
+        export_metrics(args.metrics_json, args.metrics_prom, succeeded)
+
+    if args.debug:
+        print(
+            f"HTTP connections opened: {HTTP_POOL.connections_opened}, "
+            f"requests served: {HTTP_POOL.requests_served}"
+        )
+        if BYTE_BUDGET.capacity is not None:
+            print(
+                f"Peak image bytes in flight: {BYTE_BUDGET.peak} of {BYTE_BUDGET.capacity}, "
+                f"transfers that waited for budget: {BYTE_BUDGET.waits}"
+            )
+        if RESOLUTION_CACHE.path is not None:
+            print(
+                f"Image URL cache: {RESOLUTION_CACHE.hits} chapter(s) reused, "
+                f"{RESOLUTION_CACHE.stores} stored, {RESOLUTION_CACHE.invalidations} invalidated"
+            )
 
 
 if __name__ == "__main__":
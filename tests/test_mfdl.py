@@ -1,15 +1,42 @@
 import argparse
+import asyncio
+import contextlib
+import gzip
+import hashlib
+import http.server
+import io
+import pstats
+import sqlite3
+import threading
+import time
 import tomllib
+import urllib.error
 import urllib.parse
 import urllib.request
+from collections.abc import Callable, Generator, Iterable, Iterator
 from email.message import Message
 from pathlib import Path
 from zipfile import ZipFile
 
 import pytest
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 
 import mfdl
+from benchmarks.chapterfun import (
+    chapterfun_source,
+    legacy_parse_chapterfun_payload,
+    legacy_unpack_eval_packer,
+    pack,
+)
+from benchmarks.fakefox import (
+    FakeFanfox,
+    FakeFanfoxConfig,
+    FaultConfig,
+    FaultInjector,
+    patched_site,
+)
+from benchmarks.hotpaths import regressions, run_cases
+from benchmarks.throughput import run_profile
 
 
 def test_project_defines_mfdl_console_script() -> None:
@@ -19,8 +46,7 @@ def test_project_defines_mfdl_console_script() -> None:
 
 
 class FakeHTTPResponse:
-    def getcode(self) -> int:
-        return 200
+    status = 200
 
     def read(self) -> bytes:
         return b"payload"
@@ -38,6 +64,20 @@ class FakeHTTPResponse:
         pass
 
 
+def streamed(
+    fake_get_page_content: Callable[..., tuple[int, str, bytes]],
+) -> Callable[..., tuple[int, str, int]]:
+    """Adapt a ``get_page_content`` fake into a ``stream_page_content`` fake."""
+
+    def fake_stream_page_content(
+        url: str, destination: mfdl.ByteSink, **kwargs: object
+    ) -> tuple[int, str, int]:
+        status, content_type, data = fake_get_page_content(url, **kwargs)
+        return status, content_type, destination.write(data)
+
+    return fake_stream_page_content
+
+
 def test_get_chapter_number_from_url() -> None:
     assert mfdl.get_chapter_number("/manga/demo/v01/c007/1.html") == 7.0
     assert mfdl.get_chapter_number("https://m.fanfox.net/manga/demo/c12.5/1.html") == 12.5
@@ -71,20 +111,748 @@ def test_get_page_numbers_legacy_markup() -> None:
     assert mfdl.get_page_numbers(soup) == [1, 2]
 
 
+PAGE_MARKUP = [
+    "<div id='viewer'><a href='2.html'><img src='https://img.example/a.jpg'></a></div>",
+    "<img id='image' src='https://img.example/b.jpg'><div id='viewer'><img src='c.jpg'></div>",
+    "<div id='viewer'></div><p><img src='skip.jpg'><img id='image' src='d.jpg'></p>",
+    "<div id='viewer'><img></div><img id='image' src=''>",
+    "<html><head><script>var image = 1;</script></head><body><img src='e.jpg'></body></html>",
+    "<select class='mangaread-page'><option>1</option><option>2</option></select>"
+    "<select class='m'><option value='9'>9</option></select>",
+    "<div class='m'><select class='m other'><option value='3'>3</option>"
+    "<option value='x'>x</option></select></div>",
+]
+
+
+@pytest.mark.parametrize("markup", PAGE_MARKUP)
+def test_strained_page_parsing_matches_full_tree(markup: str) -> None:
+    full_tree = BeautifulSoup(markup, "html.parser")
+
+    strained = mfdl.parse_html(markup, mfdl.PAGE_IMAGE_STRAINER)
+
+    assert mfdl.get_page_image_url(strained) == mfdl.get_page_image_url(full_tree)
+    try:
+        expected_pages: list[int] | None = mfdl.get_page_numbers(full_tree)
+    except SystemExit:
+        expected_pages = None
+    if expected_pages is None:
+        with pytest.raises(SystemExit):
+            mfdl.get_page_numbers(mfdl.parse_html(markup))
+    else:
+        assert mfdl.get_page_numbers(mfdl.parse_html(markup)) == expected_pages
+
+
+SERIES_MARKUP = [
+    b"""
+    <ul class='nav'><li><a href='/manga/other/c001/1.html'>Other</a></li></ul>
+    <div class='chapters'>
+      <a href='/manga/demo/v01/c002/1.html'>Ch 2</a>
+      <a class='new' href='/manga/demo/v01/c003/1.html'>Ch 3 (new)</a>
+      <a href='//m.fanfox.net/manga/demo/c001.5/1.html'><span>Ch 1.5</span></a>
+      <a href='/manga/demo/c001/1.html'>Ch 1</a>
+      <a href='/manga/demo/'>Series</a>
+    </div>
+    """,
+    b"<div class='warning'>This series has been licensed</div>"
+    b"<a href='/manga/demo/c001/1.html'>Ch 1</a>",
+    b'<div class="notice warning">Licensed in your region</div>'
+    b"<a href='/manga/demo/c001/1.html'>Ch 1</a>",
+    b"<p>No chapters here</p>",
+]
+
+
+@pytest.mark.parametrize("markup", SERIES_MARKUP)
+def test_strained_series_parsing_matches_full_tree(markup: bytes) -> None:
+    def chapters_or_error(soup: BeautifulSoup) -> object:
+        try:
+            return list(mfdl.parse_chapter_urls(soup, "Demo").items())
+        except SystemExit as error:
+            return str(error)
+
+    expected = chapters_or_error(BeautifulSoup(markup, "html.parser"))
+
+    assert chapters_or_error(mfdl.parse_series_page(markup, "demo")) == expected
+
+
+def test_parse_series_page_strains_pages_that_only_mention_warnings(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    markup = (
+        b"<p class='summary'>Content warning: violence. See the searchform help.</p>"
+        b"<a href='/manga/demo/c001/1.html'>Ch 1</a>"
+    )
+    strainers: list[SoupStrainer | None] = []
+    parse_html = mfdl.parse_html
+
+    def recording_parse_html(
+        content: bytes | str, parse_only: SoupStrainer | None = None
+    ) -> BeautifulSoup:
+        strainers.append(parse_only)
+        return parse_html(content, parse_only)
+
+    monkeypatch.setattr(mfdl, "parse_html", recording_parse_html)
+
+    soup = mfdl.parse_series_page(markup, "demo")
+
+    assert list(mfdl.parse_chapter_urls(soup, "Demo")) == [1.0]
+    assert len(strainers) == 1
+    assert strainers[0] is not None
+
+
+def test_parse_desktop_chapter_metadata_reads_key_from_strained_tree() -> None:
+    html = (
+        "<script>var chapterid =42;var imagecount=7;</script>"
+        "<form><input id='dm5_key' value='secret'><input id='other' value='x'></form>"
+    )
+
+    assert mfdl.parse_desktop_chapter_metadata(html) == ("42", 7, "secret")
+
+
 def test_get_page_content_uses_timeout(monkeypatch: pytest.MonkeyPatch) -> None:
     calls: list[float] = []
 
-    def fake_urlopen(_request: urllib.request.Request, timeout: float) -> FakeHTTPResponse:
+    @contextlib.contextmanager
+    def fake_open(
+        _request: urllib.request.Request,
+        timeout: float,
+        timing: mfdl.RequestTiming | None = None,
+    ) -> Generator[FakeHTTPResponse]:
         calls.append(timeout)
-        return FakeHTTPResponse()
+        yield FakeHTTPResponse()
 
-    monkeypatch.setattr(mfdl.urllib.request, "urlopen", fake_urlopen)
+    monkeypatch.setattr(mfdl.HTTP_POOL, "open", fake_open)
 
     mfdl.get_page_content("https://example.test/page", timeout=12.5)
 
     assert calls == [12.5]
 
 
+LARGE_IMAGE = bytes(range(256)) * 2048
+
+
+class RecordingFile:
+    def __init__(self) -> None:
+        self.buffer = io.BytesIO()
+        self.largest_write = 0
+
+    def write(self, data: bytes) -> int:
+        self.largest_write = max(self.largest_write, len(data))
+        return self.buffer.write(data)
+
+    def tell(self) -> int:
+        return self.buffer.tell()
+
+    def getvalue(self) -> bytes:
+        return self.buffer.getvalue()
+
+
+class KeepAliveHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:
+        if self.path == "/missing":
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if self.path == "/moved":
+            self.send_response(302)
+            self.send_header("Location", "/page")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if self.path == "/large.jpg":
+            body = gzip.compress(LARGE_IMAGE)
+            self.send_response(200)
+            self.send_header("Content-Type", "image/jpeg")
+            self.send_header("Content-Encoding", "gzip")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        if self.path == "/truncated.jpg":
+            # Promise the whole image, send half of it and hang up.
+            self.send_response(200)
+            self.send_header("Content-Type", "image/jpeg")
+            self.send_header("Content-Length", str(len(LARGE_IMAGE)))
+            self.end_headers()
+            self.wfile.write(LARGE_IMAGE[: len(LARGE_IMAGE) // 2])
+            self.close_connection = True
+            return
+        body = f"served {self.path}".encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+
+@pytest.fixture
+def local_server() -> Iterator[str]:
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+class SeriesHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    requests: list[str | None] = []
+
+    def do_GET(self) -> None:
+        SeriesHandler.requests.append(self.headers.get("If-None-Match"))
+        if self.headers.get("If-None-Match") == '"v1"':
+            self.send_response(304)
+            self.send_header("ETag", '"v1"')
+            self.end_headers()
+            return
+        body = b"<a href='/manga/demo/c002/1.html'>2</a><a href='/manga/demo/c001/1.html'>1</a>"
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("ETag", '"v1"')
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+
+@pytest.fixture
+def series_server(monkeypatch: pytest.MonkeyPatch) -> Iterator[list[str | None]]:
+    SeriesHandler.requests = []
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), SeriesHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(mfdl, "URL_BASE", f"http://127.0.0.1:{server.server_address[1]}/")
+    monkeypatch.setattr(mfdl, "HTTP_POOL", mfdl.HTTPConnectionPool())
+    try:
+        yield SeriesHandler.requests
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_get_chapter_urls_revalidates_cached_series_page(
+    series_server: list[str | None],
+    tmp_path: Path,
+) -> None:
+    cache = mfdl.SeriesPageCache(tmp_path)
+    expected = [(1.0, "/manga/demo/c001/1.html"), (2.0, "/manga/demo/c002/1.html")]
+
+    first = mfdl.get_chapter_urls("Demo", cache=cache)
+    second = mfdl.get_chapter_urls("Demo", cache=mfdl.SeriesPageCache(tmp_path))
+
+    assert list(first.items()) == list(second.items()) == expected
+    assert series_server == [None, '"v1"']
+    assert (cache.misses, cache.revalidated) == (1, 0)
+
+
+def test_get_chapter_urls_skips_request_within_cache_ttl(
+    series_server: list[str | None],
+    tmp_path: Path,
+) -> None:
+    cache = mfdl.SeriesPageCache(tmp_path, ttl=3600)
+
+    mfdl.get_chapter_urls("Demo", cache=cache)
+    chapters = mfdl.get_chapter_urls("Demo", cache=cache)
+
+    assert list(chapters) == [1.0, 2.0]
+    assert series_server == [None]
+    assert (cache.misses, cache.hits) == (1, 1)
+
+
+def test_write_text_atomically_uses_a_unique_temporary_file(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    target = tmp_path / "entry.json"
+    mfdl.write_text_atomically(target, "first")
+    temporaries: list[str] = []
+
+    def failing_replace(source: str, destination: Path) -> None:
+        temporaries.append(source)
+        raise OSError("disk full")
+
+    monkeypatch.setattr(mfdl.os, "replace", failing_replace)
+    with pytest.raises(OSError, match="disk full"):
+        mfdl.write_text_atomically(target, "second")
+
+    assert target.read_text() == "first"
+    assert temporaries != [str(tmp_path / "entry.json.tmp")]
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["entry.json"]
+
+
+def test_content_decoder_inflates_gzip_incrementally() -> None:
+    compressed = gzip.compress(LARGE_IMAGE)
+    decoder = mfdl.ContentDecoder("")
+
+    pieces = [
+        piece
+        for offset in range(0, len(compressed), 1000)
+        for piece in decoder.decode(compressed[offset : offset + 1000])
+    ]
+
+    assert b"".join(pieces) + decoder.flush() == LARGE_IMAGE
+    assert max(map(len, pieces)) <= mfdl.CHUNK_SIZE
+    with pytest.raises(OSError):
+        truncated = mfdl.ContentDecoder("gzip")
+        list(truncated.decode(compressed[:100]))
+        truncated.flush()
+
+
+def test_stream_page_content_writes_decoded_chunks(
+    monkeypatch: pytest.MonkeyPatch,
+    local_server: str,
+) -> None:
+    monkeypatch.setattr(mfdl, "HTTP_POOL", mfdl.HTTPConnectionPool())
+    monkeypatch.setattr(mfdl, "BYTE_BUDGET", mfdl.ByteBudget(capacity=1 << 30))
+    destination = RecordingFile()
+
+    status, content_type, written = mfdl.stream_page_content(
+        f"{local_server}/large.jpg", destination
+    )
+
+    assert (status, content_type, written) == (200, "image/jpeg", len(LARGE_IMAGE))
+    # The estimate is reserved before the request and shrunk to the Content-Length.
+    assert mfdl.BYTE_BUDGET.peak == mfdl.UNKNOWN_LENGTH_ESTIMATE
+    assert mfdl.BYTE_BUDGET.estimate < mfdl.UNKNOWN_LENGTH_ESTIMATE
+    assert mfdl.BYTE_BUDGET.in_flight == 0
+    assert destination.getvalue() == LARGE_IMAGE
+    assert destination.largest_write <= mfdl.CHUNK_SIZE
+
+
+def test_stream_page_content_waits_for_budget_before_connecting(
+    monkeypatch: pytest.MonkeyPatch,
+    local_server: str,
+) -> None:
+    pool = mfdl.HTTPConnectionPool()
+    monkeypatch.setattr(mfdl, "HTTP_POOL", pool)
+    monkeypatch.setattr(mfdl, "BYTE_BUDGET", mfdl.ByteBudget(capacity=100))
+    destination = io.BytesIO()
+    transfer = threading.Thread(
+        target=mfdl.stream_page_content, args=(f"{local_server}/large.jpg", destination)
+    )
+
+    with mfdl.BYTE_BUDGET.reserve(100):
+        transfer.start()
+        transfer.join(0.2)
+        assert transfer.is_alive()
+        assert pool.connections_opened == 0
+    transfer.join()
+
+    assert pool.connections_opened == 1
+    assert destination.getvalue() == LARGE_IMAGE
+    assert mfdl.BYTE_BUDGET.in_flight == 0
+
+
+def test_stream_page_content_rejects_truncated_body(
+    monkeypatch: pytest.MonkeyPatch,
+    local_server: str,
+) -> None:
+    monkeypatch.setattr(mfdl, "HTTP_POOL", mfdl.HTTPConnectionPool())
+    destination = io.BytesIO()
+
+    with pytest.raises(mfdl.urllib.error.URLError):
+        mfdl.stream_page_content(f"{local_server}/truncated.jpg", destination)
+
+    assert len(destination.getvalue()) == len(LARGE_IMAGE) // 2
+
+
+def test_async_client_streams_decoded_chunks(local_server: str) -> None:
+    async def stream() -> tuple[tuple[int, str, int], RecordingFile]:
+        client = mfdl.AsyncHTTPClient()
+        destination = RecordingFile()
+        try:
+            result = await client.stream(mfdl.request_url(f"{local_server}/large.jpg"), destination)
+        finally:
+            client.close()
+        return result, destination
+
+    result, destination = asyncio.run(stream())
+
+    assert result == (200, "image/jpeg", len(LARGE_IMAGE))
+    assert destination.getvalue() == LARGE_IMAGE
+    assert destination.largest_write <= mfdl.CHUNK_SIZE
+
+
+def test_http_pool_reuses_keep_alive_connections(
+    monkeypatch: pytest.MonkeyPatch,
+    local_server: str,
+) -> None:
+    pool = mfdl.HTTPConnectionPool(max_connections_per_host=2)
+    monkeypatch.setattr(mfdl, "HTTP_POOL", pool)
+
+    payloads = [mfdl.get_page_content(f"{local_server}/page/{page}")[2] for page in range(3)]
+    status, _, payload = mfdl.get_page_content(f"{local_server}/moved")
+    pool.close()
+
+    assert payloads == [b"served /page/0", b"served /page/1", b"served /page/2"]
+    assert (status, payload) == (200, b"served /page")
+    assert pool.connections_opened == 1
+    assert pool.requests_served == 5
+
+
+def test_http_pool_raises_http_error_for_error_status(
+    monkeypatch: pytest.MonkeyPatch,
+    local_server: str,
+) -> None:
+    pool = mfdl.HTTPConnectionPool()
+    monkeypatch.setattr(mfdl, "HTTP_POOL", pool)
+
+    with pytest.raises(mfdl.urllib.error.HTTPError) as error_info:
+        mfdl.get_page_content(f"{local_server}/missing")
+    status, _, _ = mfdl.get_page_content(f"{local_server}/page")
+    pool.close()
+
+    assert error_info.value.code == 404
+    assert status == 200
+    assert pool.connections_opened == 1
+
+
+def test_async_client_reuses_connections_and_follows_redirects(local_server: str) -> None:
+    async def fetch_all() -> tuple[list[bytes], mfdl.AsyncHTTPClient]:
+        client = mfdl.AsyncHTTPClient()
+        payloads = [
+            (await client.fetch(mfdl.request_url(f"{local_server}{path}")))[2]
+            for path in ("/page/0", "/page/1", "/moved")
+        ]
+        with pytest.raises(mfdl.urllib.error.HTTPError):
+            await client.fetch(mfdl.request_url(f"{local_server}/missing"))
+        client.close()
+        return payloads, client
+
+    payloads, client = mfdl.asyncio.run(fetch_all())
+
+    assert payloads == [b"served /page/0", b"served /page/1", b"served /page"]
+    assert client.connections_opened == 1
+    assert client.requests_served == 5
+
+
+class ChapterHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:
+        if self.path.startswith("/img/"):
+            if self.path == "/img/3.jpg":
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            content_type, body = "image/jpeg", self.path.encode()
+        else:
+            page = self.path.rsplit("/", 1)[-1].split(".")[0]
+            pages = "".join(f"<option>{number}</option>" for number in range(1, 4))
+            host = f"http://{self.headers['Host']}"
+            body = (
+                f"<select class='mangaread-page'>{pages}</select>"
+                f"<img id='image' src='{host}/img/{page}.jpg' />"
+            ).encode()
+            content_type = "text/html"
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        self.wfile.write(f"{len(body):x}\r\n".encode() + body + b"\r\n0\r\n\r\n")
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+
+@pytest.fixture
+def chapter_server() -> Iterator[str]:
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), ChapterHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_async_engine_downloads_chapter_and_summarizes_failures(
+    chapter_server: str,
+    tmp_path: Path,
+) -> None:
+    pending = [
+        (1.0, f"{chapter_server}/manga/demo/c001/1.html"),
+    ]
+
+    failure = mfdl.asyncio.run(
+        mfdl.download_chapters_async(
+            pending, "Demo", output_dir=tmp_path, avg_delay=0.0, max_retries=2, workers=4
+        )
+    )
+
+    chapter_dir = tmp_path / "Demo" / "1"
+    assert failure is not None
+    assert "failed to download 1 image(s) for chapter 1: 002.jpg" in failure
+    assert (chapter_dir / "000.jpg").read_bytes() == b"/img/1.jpg"
+    assert (chapter_dir / "001.jpg").read_bytes() == b"/img/2.jpg"
+    assert not (chapter_dir / "002.jpg").exists()
+
+
+def test_async_engine_opens_part_files_only_for_transfers_with_a_slot(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    config = FakeFanfoxConfig(
+        chapters=1, pages=8, image_size=4096, bandwidth=40_000, mode="desktop"
+    )
+    lock = threading.Lock()
+    open_transfers = 0
+    most_open = 0
+    start = mfdl.ChapterDirectory.start
+    save = mfdl.ChapterDirectory.save
+
+    def counting_start(self: mfdl.ChapterDirectory, index: int) -> mfdl.ImageTransfer:
+        nonlocal open_transfers, most_open
+        with lock:
+            open_transfers += 1
+            most_open = max(most_open, open_transfers)
+        return start(self, index)
+
+    def counting_save(self: mfdl.ChapterDirectory, transfer: mfdl.ImageTransfer, url: str) -> None:
+        nonlocal open_transfers
+        save(self, transfer, url)
+        with lock:
+            open_transfers -= 1
+
+    monkeypatch.setattr(mfdl.ChapterDirectory, "start", counting_start)
+    monkeypatch.setattr(mfdl.ChapterDirectory, "save", counting_save)
+
+    with FakeFanfox(config) as site, patched_site(site):
+        pending = list(mfdl.get_chapter_urls(site.manga_name).items())
+        failure = mfdl.asyncio.run(
+            mfdl.download_chapters_async(
+                pending, site.manga_name, output_dir=tmp_path, avg_delay=0.0, workers=2
+            )
+        )
+
+    assert failure is None
+    assert len(list(tmp_path.rglob("*.jpg"))) == 8
+    assert 1 <= most_open <= 2
+
+
+def test_download_manga_async_engine_raises_failure_summary(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    monkeypatch.setattr(
+        mfdl,
+        "get_chapter_urls",
+        lambda _manga, **_kwargs: mfdl.OrderedDict([(1.0, "/demo/c001/1.html")]),
+    )
+
+    async def fake_download_chapters_async(
+        pending_chapters: list[tuple[float, str]], *_args: object, **_kwargs: object
+    ) -> str | None:
+        assert pending_chapters == [(1.0, "/demo/c001/1.html")]
+        return "Error: failed to download 1 image(s) for chapter 1: 000.jpg"
+
+    monkeypatch.setattr(mfdl, "download_chapters_async", fake_download_chapters_async)
+
+    with pytest.raises(SystemExit, match="for chapter 1: 000.jpg"):
+        mfdl.download_manga("Demo", output_dir=tmp_path, engine="async")
+
+
+def test_token_bucket_paces_requests_after_burst(monkeypatch: pytest.MonkeyPatch) -> None:
+    now = [100.0]
+    monkeypatch.setattr(mfdl.time, "monotonic", lambda: now[0])
+    bucket = mfdl.TokenBucket(rate=2.0, burst=2)
+
+    delays = [bucket.reserve() for _ in range(4)]
+    now[0] += 2.0
+
+    assert delays == [0.0, 0.0, 0.5, 1.0]
+    assert bucket.reserve() == 0.0
+
+
+def test_host_rate_limiter_separates_page_hosts_from_image_hosts() -> None:
+    limiter = mfdl.HostRateLimiter(html_rate=1.0, image_rate=None, burst=1)
+
+    mobile_bucket = limiter.bucket_for("https://m.fanfox.net/manga/demo/")
+    chapter_bucket = limiter.bucket_for("//m.fanfox.net/manga/demo/c001/2.html")
+    desktop_bucket = limiter.bucket_for("https://fanfox.net/chapterfun.ashx?cid=1")
+
+    assert mobile_bucket is not None and mobile_bucket is chapter_bucket
+    assert desktop_bucket is not None and desktop_bucket is not mobile_bucket
+    assert limiter.bucket_for("https://zjcdn.mangafox.me/store/1.jpg") is None
+    assert limiter.reserve("https://zjcdn.mangafox.me/store/1.jpg") == 0.0
+
+
+def test_resolve_rate_limits_uses_profile_and_allows_unlimited() -> None:
+    args = argparse.Namespace(profile="balanced", html_rate=None, image_rate=0, burst=None)
+
+    assert mfdl.resolve_rate_limits(args, workers=4) == (4.0, None, 4)
+
+
+def test_byte_budget_blocks_until_bytes_are_released() -> None:
+    budget = mfdl.ByteBudget(capacity=100)
+    entered = threading.Event()
+
+    def reserve_more() -> None:
+        with budget.reserve(60):
+            entered.set()
+
+    with budget.reserve(60):
+        worker = threading.Thread(target=reserve_more)
+        worker.start()
+        assert not entered.wait(0.1)
+    worker.join(timeout=5)
+
+    assert entered.is_set()
+    assert (budget.in_flight, budget.peak, budget.waits) == (0, 60, 1)
+
+
+def test_byte_budget_lets_oversized_transfer_run_alone() -> None:
+    budget = mfdl.ByteBudget(capacity=100)
+
+    with budget.reserve(500):
+        assert budget.in_flight == 100
+
+
+def test_byte_budget_wakes_async_waiters() -> None:
+    budget = mfdl.ByteBudget(capacity=100)
+    order: list[str] = []
+
+    async def transfer(name: str, size: int, hold: float) -> None:
+        async with budget.reserve_async(size):
+            order.append(f"start {name}")
+            await asyncio.sleep(hold)
+        order.append(f"end {name}")
+
+    async def run() -> None:
+        await asyncio.gather(transfer("a", 80, 0.05), transfer("b", 80, 0))
+
+    asyncio.run(run())
+
+    assert order == ["start a", "end a", "start b", "end b"]
+    assert budget.waits == 1
+
+
+def test_resolve_inflight_budget_uses_profile_and_allows_unlimited() -> None:
+    balanced = argparse.Namespace(profile="balanced", max_inflight_mb=None)
+    unlimited = argparse.Namespace(profile="safe", max_inflight_mb=0)
+
+    assert mfdl.resolve_inflight_budget(balanced) == 64 * 1024 * 1024
+    assert mfdl.resolve_inflight_budget(unlimited) is None
+
+
+def test_adaptive_concurrency_grows_additively_and_halves_on_congestion() -> None:
+    controller = mfdl.AdaptiveConcurrency(max_limit=4)
+
+    for _ in range(3):
+        controller.acquire()
+        controller.release(0.1)
+    assert controller.limit == 3
+
+    for _ in range(3):
+        controller.acquire()
+    controller.release(None, "HTTP 429")
+    controller.release(None, "HTTP 503")
+    controller.release(None, "timeout")
+
+    assert controller.limit == 1
+    assert controller.trajectory == [1, 2, 3, 1]
+
+
+def test_adaptive_concurrency_backs_off_on_latency_spike() -> None:
+    controller = mfdl.AdaptiveConcurrency(max_limit=8, initial_limit=4)
+
+    for latency in (0.1, 0.1, 0.1, 1.0):
+        controller.acquire()
+        controller.release(latency)
+
+    assert controller.trajectory == [4, 2]
+
+
+def test_adaptive_concurrency_ignores_rate_limiter_waits(
+    monkeypatch: pytest.MonkeyPatch,
+    local_server: str,
+) -> None:
+    monkeypatch.setattr(mfdl, "HTTP_POOL", mfdl.HTTPConnectionPool())
+    monkeypatch.setattr(mfdl, "RATE_LIMITER", mfdl.HostRateLimiter(image_rate=5))
+    controller = mfdl.AdaptiveConcurrency(max_limit=2, initial_limit=2, latency_factor=10)
+
+    for _ in range(4):
+        with controller.track() as timing:
+            mfdl.stream_page_content(f"{local_server}/large.jpg", io.BytesIO(), timing=timing)
+
+    assert timing.phases["throttle"] > 0.1
+    assert controller.trajectory == [2]
+
+
+def test_adaptive_concurrency_track_async_waits_for_a_free_slot() -> None:
+    controller = mfdl.AdaptiveConcurrency(max_limit=1)
+    events: list[str] = []
+
+    async def transfer(name: str) -> None:
+        async with controller.track_async():
+            events.append(f"{name} start")
+            await asyncio.sleep(0.01)
+            events.append(f"{name} end")
+
+    async def run() -> None:
+        await asyncio.gather(transfer("a"), transfer("b"))
+
+    asyncio.run(run())
+    asyncio.run(run())
+
+    assert events == ["a start", "a end", "b start", "b end"] * 2
+
+
+def test_congestion_reason_classifies_errors() -> None:
+    def http_error(code: int) -> mfdl.urllib.error.HTTPError:
+        return mfdl.urllib.error.HTTPError("https://cdn.example/1.jpg", code, "", Message(), None)
+
+    assert mfdl.congestion_reason(http_error(429)) == "HTTP 429"
+    assert mfdl.congestion_reason(http_error(502)) == "HTTP 502"
+    assert mfdl.congestion_reason(http_error(404)) is None
+    assert mfdl.congestion_reason(mfdl.urllib.error.URLError(TimeoutError())) == "timeout"
+
+
+def test_download_urls_reports_outcomes_to_adaptive_controller(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    monkeypatch.setattr(mfdl.time, "sleep", lambda _: None)
+    responses: list[Exception | tuple[int, str, bytes]] = [
+        mfdl.urllib.error.HTTPError("https://cdn.example/1.jpg", 429, "", Message(), None),
+        (200, "image/jpeg", b"jpegbytes"),
+    ]
+
+    def fake_get_page_content(_url: str, **_kwargs: object) -> tuple[int, str, bytes]:
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    monkeypatch.setattr(mfdl, "stream_page_content", streamed(fake_get_page_content))
+    controller = mfdl.AdaptiveConcurrency(max_limit=4, initial_limit=2)
+
+    mfdl.download_urls(
+        ["https://cdn.example/1.jpg"],
+        "Demo",
+        1.0,
+        output_dir=tmp_path,
+        avg_delay=0.0,
+        max_retries=2,
+        adaptive=controller,
+    )
+
+    assert controller.trajectory == [2, 1, 2]
+    assert (tmp_path / "Demo" / "1" / "000.jpg").read_bytes() == b"jpegbytes"
+
+
 def test_make_cbz_flattens_paths(tmp_path: Path) -> None:
     chapter_dir = tmp_path / "Demo" / "1"
     chapter_dir.mkdir(parents=True)
@@ -97,6 +865,96 @@ def test_make_cbz_flattens_paths(tmp_path: Path) -> None:
         assert archive.namelist() == ["000.jpg"]
 
 
+def test_cbz_writer_writes_entries_in_page_order(tmp_path: Path) -> None:
+    writer = mfdl.CbzWriter(tmp_path / "Demo" / "1.cbz")
+
+    def save(index: int, data: bytes) -> None:
+        transfer = writer.start(index)
+        transfer.write(data)
+        writer.save(transfer, f"https://cdn.example/{index}.jpg")
+
+    save(2, b"two")
+    save(0, b"zero")
+    writer.fail(1, "https://cdn.example/1.jpg")
+    save(4, b"four")
+    writer.close(True)
+
+    with ZipFile(tmp_path / "Demo" / "1.cbz") as archive:
+        assert archive.namelist() == ["000.jpg", "002.jpg", "004.jpg"]
+        assert archive.read("002.jpg") == b"two"
+    assert list((tmp_path / "Demo").glob("*.part")) == []
+
+
+def test_two_owners_of_a_chapter_do_not_share_temporary_files(tmp_path: Path) -> None:
+    old_directory = mfdl.ChapterDirectory(tmp_path)
+    new_directory = mfdl.ChapterDirectory(tmp_path)
+    stale = old_directory.start(0)
+    current = new_directory.start(0)
+    current.write(b"jpegbytes")
+    old_directory.discard(stale)
+    new_directory.save(current, "https://cdn.example/0.jpg")
+
+    old_writer = mfdl.CbzWriter(tmp_path / "Demo" / "1.cbz")
+    new_writer = mfdl.CbzWriter(tmp_path / "Demo" / "1.cbz")
+    transfer = new_writer.start(0)
+    transfer.write(b"zero")
+    new_writer.save(transfer, "https://cdn.example/0.jpg")
+    old_writer.close(False)
+    new_writer.close(True)
+
+    assert (tmp_path / "000.jpg").read_bytes() == b"jpegbytes"
+    with ZipFile(tmp_path / "Demo" / "1.cbz") as archive:
+        assert archive.read("000.jpg") == b"zero"
+    assert list(tmp_path.rglob("*.part")) == []
+
+
+def test_cbz_writer_discards_partial_archive_on_failure(tmp_path: Path) -> None:
+    (tmp_path / "Demo").mkdir()
+    (tmp_path / "Demo" / "1.cbz").write_bytes(b"existing")
+    writer = mfdl.CbzWriter(tmp_path / "Demo" / "1.cbz")
+
+    transfer = writer.start(0)
+    transfer.write(b"zero")
+    writer.save(transfer, "https://cdn.example/0.jpg")
+    writer.close(False)
+
+    assert (tmp_path / "Demo" / "1.cbz").read_bytes() == b"existing"
+    assert list((tmp_path / "Demo").glob("*.part")) == []
+
+
+def test_download_chapter_writes_cbz_directly_when_removing_images(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    monkeypatch.setattr(
+        mfdl,
+        "iter_chapter_image_urls",
+        lambda _url, **_kwargs: iter(
+            [(1, "https://cdn.example/1.jpg"), (0, "https://cdn.example/0.jpg")]
+        ),
+    )
+    monkeypatch.setattr(
+        mfdl,
+        "stream_page_content",
+        streamed(lambda url, **_kwargs: (200, "image/jpeg", url.encode())),
+    )
+
+    mfdl.download_chapter(
+        "/demo/c001/1.html",
+        "Demo",
+        1.0,
+        output_dir=tmp_path,
+        create_cbz=True,
+        remove_images=True,
+        workers=2,
+    )
+
+    assert sorted(path.name for path in (tmp_path / "Demo").iterdir()) == ["1.cbz"]
+    with ZipFile(tmp_path / "Demo" / "1.cbz") as archive:
+        assert archive.namelist() == ["000.jpg", "001.jpg"]
+        assert archive.read("001.jpg") == b"https://cdn.example/1.jpg"
+
+
 def test_download_urls_retries_until_image(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
     monkeypatch.chdir(tmp_path)
     monkeypatch.setattr(mfdl.time, "sleep", lambda _: None)
@@ -110,7 +968,7 @@ def test_download_urls_retries_until_image(monkeypatch: pytest.MonkeyPatch, tmp_
     def fake_get_page_content(_url: str, **_kwargs: object) -> tuple[int, str, bytes]:
         return responses.pop(0)
 
-    monkeypatch.setattr(mfdl, "get_page_content", fake_get_page_content)
+    monkeypatch.setattr(mfdl, "stream_page_content", streamed(fake_get_page_content))
 
     mfdl.download_urls(["https://cdn.example/1.jpg"], "Demo", 1.0, avg_delay=0.0, max_retries=3)
 
@@ -124,7 +982,7 @@ def test_download_urls_skips_404(monkeypatch: pytest.MonkeyPatch, tmp_path: Path
     def fake_get_page_content(_url: str, **_kwargs: object) -> tuple[int, str, bytes]:
         raise mfdl.urllib.error.HTTPError(_url, 404, "Not Found", Message(), None)
 
-    monkeypatch.setattr(mfdl, "get_page_content", fake_get_page_content)
+    monkeypatch.setattr(mfdl, "stream_page_content", streamed(fake_get_page_content))
 
     with pytest.raises(SystemExit, match=r"failed to download 1 image\(s\).*000.jpg"):
         mfdl.download_urls(["https://cdn.example/1.jpg"], "Demo", 1.0, avg_delay=0.0, max_retries=3)
@@ -132,6 +990,135 @@ def test_download_urls_skips_404(monkeypatch: pytest.MonkeyPatch, tmp_path: Path
     assert not (tmp_path / "Demo" / "1" / "000.jpg").exists()
 
 
+def test_resolution_cache_replays_and_expires_chapters(tmp_path: Path) -> None:
+    cache = mfdl.ResolutionCache(tmp_path / "resolution.sqlite3", ttl=60)
+    resolution = mfdl.ChapterResolution()
+    resolution.image_urls = [(1, "https://cdn.example/1.jpg"), (0, "https://cdn.example/0.jpg")]
+
+    cache.store("/manga/demo/c001/1.html", resolution)
+
+    assert cache.lookup("/manga/demo/c001/1.html") == [
+        (0, "https://cdn.example/0.jpg"),
+        (1, "https://cdn.example/1.jpg"),
+    ]
+    cache.ttl = 0
+    assert cache.lookup("/manga/demo/c001/1.html") is None
+
+
+def test_resolution_cache_skips_incomplete_chapters(tmp_path: Path) -> None:
+    cache = mfdl.ResolutionCache(tmp_path / "resolution.sqlite3")
+    resolution = mfdl.ChapterResolution()
+    resolution.image_urls = [(0, "https://cdn.example/0.jpg")]
+    resolution.complete = False
+
+    cache.store("/manga/demo/c001/1.html", resolution)
+
+    assert cache.lookup("/manga/demo/c001/1.html") is None
+
+
+def test_iter_chapter_image_urls_reuses_cached_resolution(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    monkeypatch.setattr(
+        mfdl, "RESOLUTION_CACHE", mfdl.ResolutionCache(tmp_path / "resolution.sqlite3")
+    )
+    calls: list[str] = []
+
+    def fake_resolve_chapter_image_urls(url: str, *_args: object) -> Iterator[tuple[int, str]]:
+        calls.append(url)
+        yield 1, "https://cdn.example/1.jpg"
+        yield 0, "https://cdn.example/0.jpg"
+
+    monkeypatch.setattr(mfdl, "resolve_chapter_image_urls", fake_resolve_chapter_image_urls)
+
+    first = list(mfdl.iter_chapter_image_urls("/manga/demo/c001/1.html"))
+    second = list(mfdl.iter_chapter_image_urls("/manga/demo/c001/1.html"))
+
+    assert sorted(first) == second
+    assert calls == ["/manga/demo/c001/1.html"]
+
+
+def test_download_urls_invalidates_cached_resolution_on_403(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    monkeypatch.setattr(mfdl.time, "sleep", lambda _: None)
+    cache = mfdl.ResolutionCache(tmp_path / "resolution.sqlite3")
+    monkeypatch.setattr(mfdl, "RESOLUTION_CACHE", cache)
+    resolution = mfdl.ChapterResolution()
+    resolution.image_urls = [(0, "https://cdn.example/0.jpg")]
+    cache.store("/manga/demo/c001/1.html", resolution)
+
+    def fake_get_page_content(url: str, **_kwargs: object) -> tuple[int, str, bytes]:
+        raise mfdl.urllib.error.HTTPError(url, 403, "Forbidden", Message(), None)
+
+    monkeypatch.setattr(mfdl, "stream_page_content", streamed(fake_get_page_content))
+
+    with pytest.raises(SystemExit, match="failed to download 1 image"):
+        mfdl.download_urls(
+            cache.lookup("/manga/demo/c001/1.html") or [],
+            "Demo",
+            1.0,
+            output_dir=tmp_path,
+            avg_delay=0.0,
+            max_retries=1,
+        )
+
+    assert cache.lookup("/manga/demo/c001/1.html") is None
+    assert cache.invalidations == 1
+
+
+def test_download_urls_links_duplicate_images_from_content_store(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    monkeypatch.setattr(
+        mfdl,
+        "stream_page_content",
+        streamed(lambda url, **_kwargs: (200, "image/jpeg", url.rsplit("/", 1)[1].encode())),
+    )
+    store = mfdl.ContentStore(tmp_path / mfdl.STORE_NAME)
+
+    for chapter in (1.0, 2.0):
+        mfdl.download_urls(
+            ["https://cdn.example/credits", f"https://cdn.example/page{chapter:g}"],
+            "Demo",
+            chapter,
+            output_dir=tmp_path,
+            store=store,
+        )
+
+    first = tmp_path / "Demo" / "1" / "000.jpg"
+    second = tmp_path / "Demo" / "2" / "000.jpg"
+    assert second.read_bytes() == b"credits"
+    assert first.stat().st_ino == second.stat().st_ino
+    assert (store.deduplicated_images, store.deduplicated_bytes) == (1, len(b"credits"))
+    assert store.stored_bytes == len(b"credits") + 2 * len(b"page1")
+    assert mfdl.ChapterManifest(second.parent).is_complete(second)
+
+
+def test_content_store_does_not_count_copied_duplicates(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    def refuse_link(source: Path, destination: Path) -> None:
+        raise OSError("cross-device link")
+
+    monkeypatch.setattr(mfdl.os, "link", refuse_link)
+    store = mfdl.ContentStore(tmp_path / mfdl.STORE_NAME)
+    digest = hashlib.sha256(b"credits").hexdigest()
+
+    for name in ("first", "second"):
+        source = tmp_path / f"{name}.part"
+        source.write_bytes(b"credits")
+        store.add(source, digest, len(b"credits"), tmp_path / f"{name}.jpg")
+
+    assert (tmp_path / "second.jpg").read_bytes() == b"credits"
+    assert (store.deduplicated_images, store.deduplicated_bytes) == (0, 0)
+    assert store.stored_bytes == len(b"credits")
+
+
 def test_download_urls_summarizes_failed_images(
     monkeypatch: pytest.MonkeyPatch,
     tmp_path: Path,
@@ -144,7 +1131,7 @@ def test_download_urls_summarizes_failed_images(
             return 200, "image/jpeg", b"jpegbytes"
         return 200, "text/html", b"not an image"
 
-    monkeypatch.setattr(mfdl, "get_page_content", fake_get_page_content)
+    monkeypatch.setattr(mfdl, "stream_page_content", streamed(fake_get_page_content))
 
     with pytest.raises(SystemExit, match=r"failed to download 2 image\(s\).*001.jpg.*002.jpg"):
         mfdl.download_urls(
@@ -174,7 +1161,7 @@ def test_download_urls_writes_to_output_dir(
     def fake_get_page_content(_url: str, **_kwargs: object) -> tuple[int, str, bytes]:
         return 200, "image/jpeg", b"jpegbytes"
 
-    monkeypatch.setattr(mfdl, "get_page_content", fake_get_page_content)
+    monkeypatch.setattr(mfdl, "stream_page_content", streamed(fake_get_page_content))
 
     output_dir = tmp_path / "downloads"
     mfdl.download_urls(["https://cdn.example/1.jpg"], "Demo", 1.0, output_dir=output_dir)
@@ -193,24 +1180,249 @@ def test_unpack_eval_packer_extracts_payload() -> None:
         "'var|pix|cdn|pvalue|a.jpg'.split('|'),0,{}))"
     )
 
-    unpacked = mfdl.unpack_eval_packer(packed)
+    unpacked = mfdl.unpack_eval_packer(packed)
+
+    assert unpacked == 'var pix="//cdn";var pvalue=["/a.jpg"];'
+
+
+@pytest.mark.parametrize(("pages", "base"), [(1, 10), (2, 36), (12, 36), (40, 36), (40, 62)])
+def test_unpacker_matches_legacy_output(pages: int, base: int) -> None:
+    packed = pack(chapterfun_source(pages), base=min(base, 36)).replace(
+        f",{min(base, 36)},", f",{base},", 1
+    )
+
+    assert mfdl.unpack_eval_packer(packed) == legacy_unpack_eval_packer(packed)
+    assert mfdl.unpack_pix_pvalue(packed) is not None
+    assert mfdl.parse_chapterfun_payload(packed, 1) == legacy_parse_chapterfun_payload(packed)
+    assert len(mfdl.parse_chapterfun_payload(packed, 1)) == pages
+
+
+def test_unpacker_resolves_non_canonical_tokens_like_legacy() -> None:
+    packed = "}('0 1=\\'2\\';A 00 z _ 3',5,5,'var|pix|cdn||a'.split('|'),0,{}))"
+
+    assert mfdl.unpack_eval_packer(packed) == legacy_unpack_eval_packer(packed)
+    assert mfdl.unpack_pix_pvalue(packed) is None
+
+
+# A chapterfun.ashx body packed independently of benchmarks.chapterfun.pack():
+# frequency-ordered keywords and the packer's own base-62 decoder, as the site
+# serves it. It is not a captured response; the image URLs are made up.
+PACKED_CHAPTERFUN_RESPONSE = (
+    'eval(function(p,a,c,k,e,d){e=function(c){return(c<a?"":e(parseInt(c/a)))+((c=c%a'
+    ")>35?String.fromCharCode(c+29):c.toString(36))};if(!''.replace(/^/,String)){whil"
+    "e(c--)d[e(c)]=k[c]||e(c);k=[function(e){return d[e]}];e=function(){return'\\\\w+'}"
+    ";c=1;};while(c--)if(k[c])p=p.replace(new RegExp('\\\\b'+e(c)+'\\\\b','g'),k[c]);retu"
+    'rn p;}(\'g 5(){2 h=i;2 j=\\\'k\\\';2 6="//l.m.n/7/8/9/a.3/b";2 0=["/o.4?c=p&d=e","/q.'
+    '4?c=r&d=e","//s.t.u/7/8/9/a.3/b/v.4"];w(2 1=3;1<0.x;1++){y(0[1].z(\\\'//\\\')==3){0['
+    "1]=\\'10:\\'+0[1]}11{0[1]=6+0[1]}}12 0}2 f;f=5();',36,39,'pvalue|i|var|0|jpg|dm5im"
+    "agefun|pix|store|manga|33221|002|compressed|token|ttl|1713400000|d|function|cid|"
+    "512087|key|c4e1a7|zjcdn|mangafox|me|k001|9f2e|k002|41ab|img|fanfox|net|k003|for|"
+    "length|if|indexOf|https|else|return'.split('|'),0,{}))"
+)
+
+
+def test_unpacker_matches_legacy_output_on_independently_packed_response() -> None:
+    expected = [
+        "//zjcdn.mangafox.me/store/manga/33221/002.0/compressed/k001.jpg?token=9f2e&ttl=1713400000",
+        "//zjcdn.mangafox.me/store/manga/33221/002.0/compressed/k002.jpg?token=41ab&ttl=1713400000",
+        "https://img.fanfox.net/store/manga/33221/002.0/compressed/k003.jpg",
+    ]
+    packed = PACKED_CHAPTERFUN_RESPONSE
+
+    assert mfdl.unpack_eval_packer(packed) == legacy_unpack_eval_packer(packed)
+    assert mfdl.unpack_pix_pvalue(packed) is not None
+    assert mfdl.parse_chapterfun_payload(packed, 1) == expected
+    assert legacy_parse_chapterfun_payload(packed) == expected
+
+
+def test_get_chapter_image_urls_falls_back_to_desktop(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(
+        mfdl, "get_page_content", lambda _url, **_kwargs: (200, "text/html", b"<html></html>")
+    )
+    monkeypatch.setattr(
+        mfdl,
+        "iter_chapter_image_urls_desktop",
+        lambda _fragment, **_kwargs: iter([(0, "https://img.example/001.jpg")]),
+    )
+
+    image_urls = mfdl.get_chapter_image_urls("//m.fanfox.net/manga/demo/v01/c001/1.html")
+
+    assert image_urls == ["https://img.example/001.jpg"]
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_get_chapter_image_urls_resolves_pages_in_order(
+    monkeypatch: pytest.MonkeyPatch,
+    workers: int,
+) -> None:
+    chapter_html = b"""
+    <select class='mangaread-page'><option>1</option><option>2</option><option>3</option></select>
+    <div id='viewer'><img src='https://img.example/001.jpg' /></div>
+    """
+    fetched: list[str] = []
+
+    def fake_get_page_content(url: str, **_kwargs: object) -> tuple[int, str, bytes]:
+        fetched.append(url)
+        if len(fetched) == 1:
+            return 200, "text/html", chapter_html
+        page = url.rsplit("/", 1)[-1].split(".")[0]
+        return (
+            200,
+            "text/html",
+            f"<img id='image' src='https://img.example/00{page}.jpg' />".encode(),
+        )
+
+    monkeypatch.setattr(mfdl, "get_page_content", fake_get_page_content)
+
+    image_urls = mfdl.get_chapter_image_urls(
+        "//m.fanfox.net/manga/demo/v01/c001/1.html", workers=workers
+    )
+
+    assert image_urls == [
+        "https://img.example/001.jpg",
+        "https://img.example/002.jpg",
+        "https://img.example/003.jpg",
+    ]
+    assert sorted(fetched) == [
+        "//m.fanfox.net/manga/demo/v01/c001/1.html",
+        "//m.fanfox.net/manga/demo/v01/c001/2.html",
+        "//m.fanfox.net/manga/demo/v01/c001/3.html",
+    ]
+
+
+def test_parser_pool_matches_inline_extraction() -> None:
+    chapter_html = (
+        b"<select class='m'><option value='1'>1</option><option value='2'>2</option></select>"
+        b"<div id='viewer'><img src='https://img.example/001.jpg'></div>"
+    )
+    inline = mfdl.ParserPool()
+    pool = mfdl.ParserPool(processes=1)
+    try:
+        for function, args in [
+            (mfdl.extract_chapter_page, (chapter_html,)),
+            (mfdl.extract_chapter_page, (b"<html></html>",)),
+            (mfdl.extract_page_image_url, (chapter_html,)),
+        ]:
+            assert pool.run(function, *args) == inline.run(function, *args)
+        with pytest.raises(SystemExit, match="chapter metadata"):
+            pool.run(mfdl.parse_desktop_chapter_metadata, "<html></html>")
+        assert (
+            asyncio.run(pool.run_async(mfdl.extract_page_image_url, chapter_html))
+            == "https://img.example/001.jpg"
+        )
+    finally:
+        pool.shutdown()
+
+
+def test_download_urls_streams_indexed_urls(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    submitted: list[int] = []
+
+    def resolve() -> Iterator[tuple[int, str]]:
+        for index in (2, 0, 1):
+            submitted.append(index)
+            yield index, f"https://cdn.example/{index}.jpg"
+
+    def fake_get_page_content(url: str, **_kwargs: object) -> tuple[int, str, bytes]:
+        return 200, "image/jpeg", url.encode()
+
+    monkeypatch.setattr(mfdl, "stream_page_content", streamed(fake_get_page_content))
+
+    mfdl.download_urls(resolve(), "Demo", 1.0, output_dir=tmp_path, workers=2)
+
+    assert submitted == [2, 0, 1]
+    assert sorted(path.name for path in (tmp_path / "Demo" / "1").glob("*.jpg")) == [
+        "000.jpg",
+        "001.jpg",
+        "002.jpg",
+    ]
+    assert (tmp_path / "Demo" / "1" / "002.jpg").read_bytes() == b"https://cdn.example/2.jpg"
+
+
+def test_download_urls_resume_fetches_only_missing_or_corrupt_images(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    monkeypatch.setattr(mfdl.time, "sleep", lambda _: None)
+    fetched: list[str] = []
+    failing = {"https://cdn.example/2.jpg"}
+
+    def fake_get_page_content(url: str, **_kwargs: object) -> tuple[int, str, bytes]:
+        fetched.append(url)
+        if url in failing:
+            return 200, "text/html", b"maintenance"
+        return 200, "image/jpeg", url.encode()
 
-    assert unpacked == 'var pix="//cdn";var pvalue=["/a.jpg"];'
+    monkeypatch.setattr(mfdl, "stream_page_content", streamed(fake_get_page_content))
+    urls = [f"https://cdn.example/{number}.jpg" for number in range(3)]
 
+    with pytest.raises(SystemExit, match="002.jpg"):
+        mfdl.download_urls(urls, "Demo", 1.0, output_dir=tmp_path, max_retries=1)
 
-def test_get_chapter_image_urls_falls_back_to_desktop(monkeypatch: pytest.MonkeyPatch) -> None:
-    monkeypatch.setattr(
-        mfdl, "get_page_soup", lambda _url, **_kwargs: BeautifulSoup("<html></html>", "html.parser")
-    )
+    chapter_dir = tmp_path / "Demo" / "1"
+    (chapter_dir / "001.jpg").write_bytes(b"corrupt")
+    fetched.clear()
+    failing.clear()
+
+    mfdl.download_urls(urls, "Demo", 1.0, output_dir=tmp_path, max_retries=1, resume=True)
+
+    manifest = mfdl.json.loads((chapter_dir / mfdl.MANIFEST_NAME).read_text())["images"]
+    assert fetched == ["https://cdn.example/1.jpg", "https://cdn.example/2.jpg"]
+    assert (chapter_dir / "001.jpg").read_bytes() == b"https://cdn.example/1.jpg"
+    assert {name: entry["status"] for name, entry in manifest.items()} == {
+        "000.jpg": "done",
+        "001.jpg": "done",
+        "002.jpg": "done",
+    }
+    assert manifest["002.jpg"]["size"] == len(b"https://cdn.example/2.jpg")
+
+
+def test_download_urls_writes_manifest_in_batches(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    writes: list[int] = []
+    write_json_atomically = mfdl.write_json_atomically
+
+    def counting_write(path: Path, data: dict[str, dict[str, object]]) -> None:
+        writes.append(len(data["images"]))
+        write_json_atomically(path, data)
+
+    monkeypatch.setattr(mfdl, "write_json_atomically", counting_write)
     monkeypatch.setattr(
         mfdl,
-        "get_chapter_image_urls_desktop",
-        lambda _fragment, **_kwargs: ["https://img.example/001.jpg"],
+        "stream_page_content",
+        streamed(lambda url, **_kwargs: (200, "image/jpeg", url.encode())),
     )
+    urls = [f"https://cdn.example/{number}.jpg" for number in range(100)]
 
-    image_urls = mfdl.get_chapter_image_urls("//m.fanfox.net/manga/demo/v01/c001/1.html")
+    mfdl.download_urls(urls, "Demo", 1.0, output_dir=tmp_path)
 
-    assert image_urls == ["https://img.example/001.jpg"]
+    manifest_path = tmp_path / "Demo" / "1" / mfdl.MANIFEST_NAME
+    assert len(mfdl.json.loads(manifest_path.read_text())["images"]) == 100
+    assert writes[-1] == 100
+    assert len(writes) <= 100 // mfdl.MANIFEST_FLUSH_RECORDS + 1
+
+
+def test_download_urls_without_resume_restarts_chapter(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    fetched: list[str] = []
+
+    def fake_get_page_content(url: str, **_kwargs: object) -> tuple[int, str, bytes]:
+        fetched.append(url)
+        return 200, "image/jpeg", url.encode()
+
+    monkeypatch.setattr(mfdl, "stream_page_content", streamed(fake_get_page_content))
+    urls = ["https://cdn.example/0.jpg"]
+
+    mfdl.download_urls(urls, "Demo", 1.0, output_dir=tmp_path)
+    mfdl.download_urls(urls, "Demo", 1.0, output_dir=tmp_path)
+
+    assert fetched == urls * 2
 
 
 def test_get_chapter_image_urls_desktop_parses_api_payload(monkeypatch: pytest.MonkeyPatch) -> None:
@@ -261,6 +1473,44 @@ def test_get_chapter_image_urls_desktop_parses_api_payload(monkeypatch: pytest.M
     assert all(query["key"] == ["demo-key"] for _, query in api_calls)
 
 
+@pytest.mark.parametrize("workers", [1, 2])
+def test_get_chapter_image_urls_desktop_uses_every_payload_value(
+    monkeypatch: pytest.MonkeyPatch,
+    workers: int,
+) -> None:
+    chapter_html = """
+    <input id="dm5_key" value="demo-key" />
+    <script>var chapterid =398501; var imagecount=5;</script>
+    """
+    requested_pages: list[int] = []
+
+    def fake_get_page_content_with_headers(
+        url: str,
+        _headers: dict[str, str],
+        **_kwargs: object,
+    ) -> tuple[int, str, bytes]:
+        if "chapterfun.ashx" not in url:
+            return 200, "text/html", chapter_html.encode()
+        page = int(urllib.parse.parse_qs(urllib.parse.urlparse(url).query)["page"][0])
+        requested_pages.append(page)
+        return 200, "text/plain", f"packed-page-{page}".encode()
+
+    def fake_unpack_eval_packer(payload: str) -> str:
+        page = int(payload.rsplit("-", 1)[-1])
+        values = ",".join(f'"/p{number}.jpg"' for number in (page, page + 1))
+        return f'var pix="https://cdn.example";var pvalue=[{values}];'
+
+    monkeypatch.setattr(mfdl, "get_page_content_with_headers", fake_get_page_content_with_headers)
+    monkeypatch.setattr(mfdl, "unpack_eval_packer", fake_unpack_eval_packer)
+
+    image_urls = mfdl.get_chapter_image_urls_desktop(
+        "//m.fanfox.net/manga/demo/v01/c001/1.html", workers=workers
+    )
+
+    assert image_urls == [f"https://cdn.example/p{page}.jpg" for page in range(1, 6)]
+    assert sorted(requested_pages) == [1, 3, 5]
+
+
 def test_resolve_runtime_settings_safe_defaults() -> None:
     args = argparse.Namespace(
         profile="safe",
@@ -370,13 +1620,15 @@ def test_download_manga_skips_existing_cbz_by_default(
         ),
     )
     monkeypatch.setattr(
-        mfdl, "get_chapter_image_urls", lambda _url, **_kwargs: ["https://img.example/1.jpg"]
+        mfdl,
+        "iter_chapter_image_urls",
+        lambda _url, **_kwargs: iter([(0, "https://img.example/1.jpg")]),
     )
 
     downloaded_chapters: list[float] = []
 
     def fake_download_urls(
-        _image_urls: list[str],
+        _image_urls: Iterable[tuple[int, str]],
         _manga_name: str,
         chapter_number: float,
         **_kwargs: object,
@@ -405,13 +1657,15 @@ def test_download_manga_latest_downloads_only_latest_chapters(
         ),
     )
     monkeypatch.setattr(
-        mfdl, "get_chapter_image_urls", lambda _url, **_kwargs: ["https://img.example/1.jpg"]
+        mfdl,
+        "iter_chapter_image_urls",
+        lambda _url, **_kwargs: iter([(0, "https://img.example/1.jpg")]),
     )
 
     downloaded_chapters: list[float] = []
 
     def fake_download_urls(
-        _image_urls: list[str],
+        _image_urls: Iterable[tuple[int, str]],
         _manga_name: str,
         chapter_number: float,
         **_kwargs: object,
@@ -441,13 +1695,15 @@ def test_download_manga_force_redownloads_existing_cbz(
         ),
     )
     monkeypatch.setattr(
-        mfdl, "get_chapter_image_urls", lambda _url, **_kwargs: ["https://img.example/1.jpg"]
+        mfdl,
+        "iter_chapter_image_urls",
+        lambda _url, **_kwargs: iter([(0, "https://img.example/1.jpg")]),
     )
 
     downloaded_chapters: list[float] = []
 
     def fake_download_urls(
-        _image_urls: list[str],
+        _image_urls: Iterable[tuple[int, str]],
         _manga_name: str,
         chapter_number: float,
         **_kwargs: object,
@@ -461,6 +1717,32 @@ def test_download_manga_force_redownloads_existing_cbz(
     assert downloaded_chapters == [1.0, 2.0]
 
 
+def test_download_manga_resumes_unless_forced(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    (tmp_path / "Demo" / "1").mkdir(parents=True)
+    (tmp_path / "Demo" / "1" / mfdl.MANIFEST_NAME).write_text('{"images": {}}')
+    monkeypatch.setattr(
+        mfdl,
+        "get_chapter_urls",
+        lambda _manga, **_kwargs: mfdl.OrderedDict([(1.0, "/demo/c001/1.html")]),
+    )
+    resume_flags: list[object] = []
+
+    def fake_download_chapter(_url: str, _manga: str, _chapter: float, **kwargs: object) -> None:
+        resume_flags.append(kwargs["resume"])
+
+    monkeypatch.setattr(mfdl, "download_chapter", fake_download_chapter)
+
+    mfdl.download_manga("Demo", output_dir=tmp_path)
+    mfdl.download_manga("Demo", output_dir=tmp_path, force=True)
+
+    assert resume_flags == [True, False]
+    assert "Resuming chapter 1" in capsys.readouterr().out
+
+
 def test_download_manga_uses_output_dir_for_existing_cbz(
     monkeypatch: pytest.MonkeyPatch,
     tmp_path: Path,
@@ -477,13 +1759,15 @@ def test_download_manga_uses_output_dir_for_existing_cbz(
         ),
     )
     monkeypatch.setattr(
-        mfdl, "get_chapter_image_urls", lambda _url, **_kwargs: ["https://img.example/1.jpg"]
+        mfdl,
+        "iter_chapter_image_urls",
+        lambda _url, **_kwargs: iter([(0, "https://img.example/1.jpg")]),
     )
 
     downloaded_chapters: list[float] = []
 
     def fake_download_urls(
-        _image_urls: list[str],
+        _image_urls: Iterable[tuple[int, str]],
         _manga_name: str,
         chapter_number: float,
         **_kwargs: object,
@@ -500,26 +1784,31 @@ def test_download_manga_uses_output_dir_for_existing_cbz(
 def test_download_manga_passes_timeout(monkeypatch: pytest.MonkeyPatch) -> None:
     calls: dict[str, float] = {}
 
-    def fake_get_chapter_urls(_manga_name: str, timeout: float) -> mfdl.OrderedDict[float, str]:
+    def fake_get_chapter_urls(
+        _manga_name: str, timeout: float, **_kwargs: object
+    ) -> mfdl.OrderedDict[float, str]:
         calls["chapter_urls"] = timeout
         return mfdl.OrderedDict([(1.0, "/demo/c001/1.html")])
 
-    def fake_get_chapter_image_urls(_url: str, timeout: float) -> list[str]:
+    def fake_iter_chapter_image_urls(
+        _url: str, timeout: float, **_kwargs: object
+    ) -> Iterator[tuple[int, str]]:
         calls["image_urls"] = timeout
-        return ["https://img.example/1.jpg"]
+        yield 0, "https://img.example/1.jpg"
 
     def fake_download_urls(
-        _image_urls: list[str],
+        image_urls: Iterable[tuple[int, str]],
         _manga_name: str,
         _chapter_number: float,
         **kwargs: object,
     ) -> None:
+        list(image_urls)
         timeout = kwargs["timeout"]
         assert isinstance(timeout, float)
         calls["download_urls"] = timeout
 
     monkeypatch.setattr(mfdl, "get_chapter_urls", fake_get_chapter_urls)
-    monkeypatch.setattr(mfdl, "get_chapter_image_urls", fake_get_chapter_image_urls)
+    monkeypatch.setattr(mfdl, "iter_chapter_image_urls", fake_iter_chapter_image_urls)
     monkeypatch.setattr(mfdl, "download_urls", fake_download_urls)
 
     mfdl.download_manga("Demo", timeout=9.5)
@@ -527,6 +1816,440 @@ def test_download_manga_passes_timeout(monkeypatch: pytest.MonkeyPatch) -> None:
     assert calls == {"chapter_urls": 9.5, "image_urls": 9.5, "download_urls": 9.5}
 
 
+def test_download_manga_shares_one_pool_across_chapters(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    monkeypatch.setattr(
+        mfdl,
+        "get_chapter_urls",
+        lambda _manga, **_kwargs: mfdl.OrderedDict(
+            [(1.0, "/demo/c001/1.html"), (2.0, "/demo/c002/1.html"), (3.0, "/demo/c003/1.html")]
+        ),
+    )
+    executors: dict[float, object] = {}
+
+    def fake_download_chapter(
+        _url: str,
+        _manga_name: str,
+        chapter: float,
+        **kwargs: object,
+    ) -> None:
+        executors[chapter] = kwargs["executor"]
+
+    monkeypatch.setattr(mfdl, "download_chapter", fake_download_chapter)
+
+    mfdl.download_manga("Demo", output_dir=tmp_path, workers=3, chapters_in_flight=2)
+
+    assert sorted(executors) == [1.0, 2.0, 3.0]
+    assert len({id(executor) for executor in executors.values()}) == 1
+    assert isinstance(executors[1.0], mfdl.concurrent.futures.ThreadPoolExecutor)
+
+
+def test_parse_watchlist_reads_series_and_chapter_selection(tmp_path: Path) -> None:
+    watchlist = tmp_path / "watchlist.txt"
+    watchlist.write_text(
+        "# series to follow\n"
+        "One Piece --latest 3\n"
+        "\n"
+        '"The World God Only Knows" -s 190 --end 205  # finished\n'
+        "Naruto\n"
+    )
+
+    entries = mfdl.parse_watchlist(watchlist, range_start=1, latest=10)
+
+    assert [
+        (entry.manga_name, entry.range_start, entry.range_end, entry.latest) for entry in entries
+    ] == [
+        ("One Piece", 1, None, 3),
+        ("The World God Only Knows", 190.0, 205.0, 10),
+        ("Naruto", 1, None, 10),
+    ]
+
+    watchlist.write_text("Naruto --latest many\n")
+    with pytest.raises(SystemExit, match="watchlist.txt:1: invalid chapter selection"):
+        mfdl.parse_watchlist(watchlist)
+
+
+def test_interleave_series_round_robins_chapters() -> None:
+    assert mfdl.interleave_series([["a1", "a2", "a3"], [], ["b1"], ["c1", "c2"]]) == [
+        "a1",
+        "b1",
+        "c1",
+        "a2",
+        "c2",
+        "a3",
+    ]
+
+
+def test_download_watchlist_interleaves_series_and_summarizes_failures(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    series = {
+        "Alpha": mfdl.OrderedDict([(1.0, "/alpha/c001/1.html"), (2.0, "/alpha/c002/1.html")]),
+        "Beta": mfdl.OrderedDict([(1.0, "/beta/c001/1.html"), (2.0, "/beta/c002/1.html")]),
+    }
+
+    def fake_get_chapter_urls(manga_name: str, **_kwargs: object) -> object:
+        if manga_name not in series:
+            raise SystemExit(f"Error: {manga_name} not found")
+        return series[manga_name]
+
+    downloaded: list[tuple[str, float]] = []
+
+    def fake_download_chapter(_url: str, manga: str, chapter: float, **_kwargs: object) -> None:
+        downloaded.append((manga, chapter))
+        if (manga, chapter) == ("Beta", 2.0):
+            raise SystemExit("Error: failed to download 1 image(s) for chapter 2: 002.jpg")
+
+    monkeypatch.setattr(mfdl, "get_chapter_urls", fake_get_chapter_urls)
+    monkeypatch.setattr(mfdl, "download_chapter", fake_download_chapter)
+    (tmp_path / "Alpha").mkdir()
+    (tmp_path / "Alpha" / "1.cbz").write_bytes(b"")
+    entries = [
+        mfdl.WatchlistEntry("Alpha"),
+        mfdl.WatchlistEntry("Gamma"),
+        mfdl.WatchlistEntry("Beta"),
+    ]
+
+    with pytest.raises(SystemExit, match="2 watchlist failure"):
+        mfdl.download_watchlist(entries, output_dir=tmp_path)
+
+    assert downloaded == [("Alpha", 2.0), ("Beta", 1.0), ("Beta", 2.0)]
+    output = capsys.readouterr().out
+    assert "  Alpha: new: 2\n" in output
+    assert "  Gamma: check failed: Error: Gamma not found\n" in output
+    assert "  Beta: new: 1\n    failed chapter 2: Error: failed to download" in output
+
+
+def test_download_watchlist_reports_http_errors_and_continues(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    series = {
+        "Alpha": mfdl.OrderedDict([(1.0, "/alpha/c001/1.html"), (2.0, "/alpha/c002/1.html")]),
+    }
+
+    def fake_get_chapter_urls(manga_name: str, **_kwargs: object) -> object:
+        if manga_name not in series:
+            raise urllib.error.HTTPError(
+                f"https://fanfox.test/{manga_name}", 503, "Service Unavailable", Message(), None
+            )
+        return series[manga_name]
+
+    downloaded: list[tuple[str, float]] = []
+
+    def fake_download_chapter(_url: str, manga: str, chapter: float, **_kwargs: object) -> None:
+        if chapter == 1.0:
+            raise urllib.error.URLError("timed out")
+        downloaded.append((manga, chapter))
+
+    monkeypatch.setattr(mfdl, "get_chapter_urls", fake_get_chapter_urls)
+    monkeypatch.setattr(mfdl, "download_chapter", fake_download_chapter)
+    entries = [mfdl.WatchlistEntry("Beta"), mfdl.WatchlistEntry("Alpha")]
+
+    with pytest.raises(SystemExit, match="2 watchlist failure"):
+        mfdl.download_watchlist(entries, output_dir=tmp_path)
+
+    assert downloaded == [("Alpha", 2.0)]
+    output = capsys.readouterr().out
+    assert "  Beta: check failed: HTTP Error 503: Service Unavailable\n" in output
+    assert "  Alpha: new: 2\n    failed chapter 1: <urlopen error timed out>" in output
+
+
+def test_chapter_queue_leases_expire_and_requeue(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    now = [1000.0]
+    monkeypatch.setattr(mfdl.time, "time", lambda: now[0])
+    queue = mfdl.ChapterQueue(tmp_path / "queue.sqlite3", max_attempts=2)
+    chapters = [("Demo", 1.0, "/demo/c001/1.html"), ("Demo", 2.0, "/demo/c002/1.html")]
+
+    assert queue.enqueue(chapters) == 2
+    assert queue.enqueue(chapters) == 0
+    assert queue.lease("a", 60) == chapters[0]
+    assert queue.lease("b", 60) == chapters[1]
+    assert queue.lease("c", 60) is None
+    assert not queue.renew("Demo", 1.0, "c", 60)
+
+    now[0] += 50
+    assert queue.renew("Demo", 1.0, "a", 60)
+    now[0] += 30
+    # b's worker died: its chapter goes to the next worker, a's lease was renewed.
+    assert queue.lease("c", 60) == chapters[1]
+    assert queue.finish("Demo", 1.0, "a")
+    assert not queue.finish("Demo", 2.0, "b")
+
+    now[0] += 61
+    assert queue.lease("d", 60) is None
+    assert queue.counts() == {"pending": 0, "leased": 0, "done": 1, "failed": 1}
+    assert queue.failures() == [("Demo", 2.0, "lease expired 2 time(s)")]
+
+    assert queue.enqueue(chapters) == 1
+    assert queue.enqueue(chapters, force=True) == 1
+    assert queue.counts()["pending"] == 2
+
+
+def test_chapter_queue_hands_each_chapter_to_one_of_many_workers(tmp_path: Path) -> None:
+    path = tmp_path / "queue.sqlite3"
+    chapters = [("Demo", float(number), f"/demo/c{number:03d}/1.html") for number in range(40)]
+    mfdl.ChapterQueue(path).enqueue(chapters)
+    leased: list[tuple[str, float, str]] = []
+
+    def worker(name: str) -> None:
+        queue = mfdl.ChapterQueue(path)
+        while (job := queue.lease(name, 60)) is not None:
+            leased.append(job)
+            assert queue.finish(job[0], job[1], name)
+        queue.close()
+
+    threads = [threading.Thread(target=worker, args=(f"w{number}",)) for number in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(leased) == chapters
+    assert mfdl.ChapterQueue(path).counts()["done"] == 40
+
+
+def test_run_queue_worker_resumes_leased_chapters_and_records_failures(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    queue = mfdl.ChapterQueue(tmp_path / "queue.sqlite3")
+    queue.enqueue([("Demo", 1.0, "/demo/c001/1.html"), ("Demo", 2.0, "/demo/c002/1.html")])
+    resume_flags: list[object] = []
+
+    def fake_download_chapter(_url: str, _manga: str, chapter: float, **kwargs: object) -> None:
+        resume_flags.append(kwargs["resume"])
+        if chapter == 2.0:
+            raise SystemExit("Error: failed to download 1 image(s) for chapter 2: 001.jpg")
+
+    monkeypatch.setattr(mfdl, "download_chapter", fake_download_chapter)
+
+    with pytest.raises(SystemExit, match="1 chapter"):
+        mfdl.run_queue_worker(queue, output_dir=tmp_path, workers=2, chapters_in_flight=2)
+
+    assert resume_flags == [True, True]
+    assert queue.counts() == {"pending": 0, "leased": 0, "done": 1, "failed": 1}
+    assert queue.failures()[0][2].startswith("Error: failed to download 1 image(s)")
+    assert "failed: Demo chapter 2" in capsys.readouterr().out
+
+
+def test_run_queue_worker_records_network_errors_and_keeps_leasing(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    queue = mfdl.ChapterQueue(tmp_path / "queue.sqlite3")
+    queue.enqueue([("Demo", 1.0, "/demo/c001/1.html"), ("Demo", 2.0, "/demo/c002/1.html")])
+    downloaded: list[float] = []
+
+    def fake_download_chapter(_url: str, _manga: str, chapter: float, **_kwargs: object) -> None:
+        if chapter == 1.0:
+            raise urllib.error.URLError("connection reset")
+        downloaded.append(chapter)
+
+    monkeypatch.setattr(mfdl, "download_chapter", fake_download_chapter)
+
+    with pytest.raises(SystemExit, match="1 chapter"):
+        mfdl.run_queue_worker(queue, output_dir=tmp_path)
+
+    assert downloaded == [2.0]
+    assert queue.failures() == [("Demo", 1.0, "<urlopen error connection reset>")]
+
+
+def test_run_queue_worker_shares_adaptive_controller_across_async_runs(
+    tmp_path: Path,
+) -> None:
+    config = FakeFanfoxConfig(chapters=3, pages=4, image_size=2048, latency=0.005, mode="mobile")
+    queue = mfdl.ChapterQueue(tmp_path / "queue.sqlite3")
+
+    with FakeFanfox(config) as site, patched_site(site):
+        chapters = mfdl.get_chapter_urls(site.manga_name)
+        queue.enqueue([(site.manga_name, chapter, url) for chapter, url in chapters.items()])
+        mfdl.run_queue_worker(
+            queue,
+            output_dir=tmp_path,
+            avg_delay=0.0,
+            workers=2,
+            chapters_in_flight=2,
+            engine="async",
+            adaptive=True,
+        )
+
+    assert queue.counts() == {"pending": 0, "leased": 0, "done": 3, "failed": 0}
+    assert len(list(tmp_path.rglob("*.jpg"))) == 12
+
+
+def test_run_queue_worker_abandons_chapter_after_losing_its_lease(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    queue = mfdl.ChapterQueue(tmp_path / "queue.sqlite3")
+    queue.enqueue([("Demo", 1.0, "/demo/c001/1.html")])
+    renewals = iter([sqlite3.OperationalError("database is locked"), False])
+
+    def flaky_renew(*_args: object) -> bool:
+        outcome = next(renewals)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    def fake_download_chapter(_url: str, _manga: str, chapter: float, **kwargs: object) -> None:
+        cancelled = kwargs["cancelled"]
+        assert isinstance(cancelled, threading.Event)
+        assert cancelled.wait(5)
+        mfdl.raise_if_cancelled(f"{chapter:g}", cancelled)
+
+    monkeypatch.setattr(queue, "renew", flaky_renew)
+    monkeypatch.setattr(mfdl, "download_chapter", fake_download_chapter)
+
+    mfdl.run_queue_worker(queue, output_dir=tmp_path, lease_seconds=0.03)
+
+    output = capsys.readouterr().out
+    assert "unable to renew the lease on Demo chapter 1: database is locked" in output
+    assert "abandoned Demo chapter 1 after losing its lease" in output
+    assert queue.counts()["leased"] == 1
+
+
+def test_download_urls_stops_once_cancelled(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    requested: list[str] = []
+    cancelled = threading.Event()
+
+    def fetch(url: str, **_kwargs: object) -> tuple[int, str, bytes]:
+        requested.append(url)
+        cancelled.set()
+        return 200, "image/jpeg", b"jpegbytes"
+
+    monkeypatch.setattr(mfdl, "stream_page_content", streamed(fetch))
+
+    with pytest.raises(mfdl.ChapterCancelled):
+        mfdl.download_urls(
+            ["https://cdn.example/0.jpg", "https://cdn.example/1.jpg"],
+            "Demo",
+            1.0,
+            output_dir=tmp_path,
+            cancelled=cancelled,
+        )
+
+    assert requested == ["https://cdn.example/0.jpg"]
+    assert list((tmp_path / "Demo" / "1").glob("*.jpg")) == []
+
+
+def test_download_urls_stops_remaining_images_once_the_chapter_fails(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    requested: list[str] = []
+
+    def fetch(url: str, **_kwargs: object) -> tuple[int, str, bytes]:
+        requested.append(url)
+        if url.endswith("/0.jpg"):
+            raise RuntimeError("disk on fire")
+        time.sleep(0.05)
+        return 200, "image/jpeg", b"jpegbytes"
+
+    monkeypatch.setattr(mfdl, "stream_page_content", streamed(fetch))
+    urls = [f"https://cdn.example/{number}.jpg" for number in range(8)]
+
+    with pytest.raises(RuntimeError, match="disk on fire"):
+        mfdl.download_urls(urls, "Demo", 1.0, output_dir=tmp_path, workers=2)
+    fetched = len(requested)
+    time.sleep(0.1)
+
+    assert fetched <= 3
+    assert len(requested) == fetched
+    assert list((tmp_path / "Demo" / "1").glob("*.part")) == []
+
+
+def test_async_engine_stops_remaining_images_once_the_chapter_fails(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    requested: list[str] = []
+
+    async def resolve(
+        _client: mfdl.AsyncHTTPClient,
+        _url: str,
+        on_image: Callable[[int, str], None],
+        **_kwargs: object,
+    ) -> None:
+        for index in range(6):
+            on_image(index, f"https://cdn.example/{index}.jpg")
+        await mfdl.asyncio.sleep(0.01)
+        raise urllib.error.URLError("page gone")
+
+    async def stream(
+        request: urllib.request.Request, destination: mfdl.ByteSink, **_kwargs: object
+    ) -> tuple[int, str, int]:
+        requested.append(request.full_url)
+        await mfdl.asyncio.sleep(0.05)
+        return 200, "image/jpeg", destination.write(b"jpegbytes")
+
+    async def download() -> None:
+        client = mfdl.AsyncHTTPClient()
+        monkeypatch.setattr(client, "stream", stream)
+        await mfdl.download_chapter_images_async(
+            client, "/demo/c001/1.html", "Demo", 1.0, output_dir=tmp_path, avg_delay=0.0
+        )
+
+    monkeypatch.setattr(mfdl, "resolve_chapter_async", resolve)
+
+    with pytest.raises(urllib.error.URLError, match="page gone"):
+        mfdl.asyncio.run(download())
+
+    assert requested == ["https://cdn.example/0.jpg"]
+    assert list((tmp_path / "Demo" / "1").glob("*.part")) == []
+
+
+def test_run_chapter_jobs_caps_chapters_in_flight() -> None:
+    lock = threading.Lock()
+    active = 0
+    peak = 0
+    release = threading.Event()
+
+    def job() -> None:
+        nonlocal active, peak
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        release.wait(0.05)
+        with lock:
+            active -= 1
+
+    mfdl.run_chapter_jobs([job] * 6, chapters_in_flight=2)
+
+    assert peak == 2
+
+
+def test_run_chapter_jobs_stops_scheduling_after_failure() -> None:
+    started: list[int] = []
+
+    def make_job(number: int) -> mfdl.Callable[[], None]:
+        def job() -> None:
+            started.append(number)
+            if number == 0:
+                raise SystemExit("Error: chapter 0 failed")
+            threading.Event().wait(0.02)
+
+        return job
+
+    with pytest.raises(SystemExit, match="chapter 0 failed"):
+        mfdl.run_chapter_jobs([make_job(number) for number in range(20)], chapters_in_flight=2)
+
+    assert len(started) < 20
+
+
 def test_main_list_honors_latest(
     monkeypatch: pytest.MonkeyPatch,
     capsys: pytest.CaptureFixture[str],
@@ -542,6 +2265,8 @@ def test_main_list_honors_latest(
             list=True,
             debug=False,
             timeout=mfdl.DEFAULT_TIMEOUT,
+            no_cache=True,
+            watchlist=None,
         ),
     )
     monkeypatch.setattr(
@@ -559,3 +2284,201 @@ def test_main_list_honors_latest(
     mfdl.main()
 
     assert capsys.readouterr().out.splitlines() == ["2.0", "3.0"]
+
+
+@pytest.mark.parametrize("engine", ["thread", "async"])
+def test_throughput_benchmark_downloads_fake_series_end_to_end(engine: str) -> None:
+    config = FakeFanfoxConfig(chapters=2, pages=3, image_size=4096, mode="mixed")
+
+    result = run_profile("aggressive", config, engine=engine, unpaced=True)
+
+    assert result["images"] == 6
+    assert result["requests"]["cdn"] == 6
+    assert result["requests"]["chapterfun"] >= 1
+    assert result["images_per_second"] > 0
+    assert mfdl.URL_BASE == "https://m.fanfox.net/"
+
+
+def test_fault_injector_sends_503s_in_bursts() -> None:
+    injector = FaultInjector(FaultConfig(rate_503=0.2, burst_503=3, seed=1))
+
+    faults = [injector.draw() for _ in range(200)]
+
+    # A burst cut short by the end of the draws is the only one allowed to be shorter.
+    runs = "".join("5" if fault == "503" else "." for fault in faults).split(".")[:-1]
+    assert {len(run) % 3 for run in runs if run} == {0}
+    assert injector.injected["503"] == faults.count("503") > 0
+
+
+def test_fake_cdn_truncated_body_fails_the_transfer() -> None:
+    config = FakeFanfoxConfig(chapters=1, pages=1, image_size=4 * mfdl.CHUNK_SIZE)
+
+    with FakeFanfox(config, faults=FaultConfig(rate_truncate=1.0)) as site, patched_site(site):
+        destination = io.BytesIO()
+        with pytest.raises(mfdl.urllib.error.URLError):
+            mfdl.stream_page_content(f"{site.image_base(1)}/q001.jpg", destination)
+
+    assert site.faults is not None and site.faults.injected["truncate"] == 1
+    assert len(destination.getvalue()) == 2 * mfdl.CHUNK_SIZE
+
+
+def test_hotpath_benchmarks_report_ops_and_gate_regressions() -> None:
+    results = run_cases(min_time=0, repeat=1, only=["select_chapters", "unpack_eval_packer"])
+
+    assert set(results) == {
+        "select_chapters_range",
+        "select_chapters_latest",
+        "unpack_eval_packer",
+        "unpack_eval_packer_40_values",
+    }
+    assert all(result["ops_per_second"] > 0 for result in results.values())
+    assert results["select_chapters_range"]["peak_bytes"] > 0
+
+    baseline = {
+        name: {"ops_per_second": result["ops_per_second"]} for name, result in results.items()
+    }
+    faster = {
+        name: {"ops_per_second": 2 * result["ops_per_second"]} for name, result in results.items()
+    }
+    assert regressions(results, baseline, threshold=0.25) == []
+    assert len(regressions(results, faster, threshold=0.25)) == 4
+
+
+def test_request_stage_classifies_fanfox_and_image_urls() -> None:
+    assert mfdl.request_stage("https://m.fanfox.net/manga/one_piece/") == "series"
+    assert mfdl.request_stage("https://m.fanfox.net/search?k=one+piece") == "series"
+    assert mfdl.request_stage("https://m.fanfox.net/manga/one_piece/c001/1.html") == "page"
+    assert mfdl.request_stage("https://fanfox.net/manga/one_piece/c001/chapterfun.ashx?cid=1") == (
+        "chapterfun"
+    )
+    assert mfdl.request_stage("//zjcdn.mangafox.me/store/manga/1/q001.jpg") == "image"
+
+
+def test_metrics_registry_exports_prometheus_histograms() -> None:
+    registry = mfdl.MetricsRegistry()
+    url = "https://zjcdn.mangafox.me/q001.jpg"
+    with pytest.raises(mfdl.urllib.error.HTTPError), registry.track(url) as timing:
+        raise mfdl.urllib.error.HTTPError(url, 503, "Service Unavailable", Message(), None)
+    with registry.track(url, attempt=2) as timing:
+        with timing.phase("ttfb"):
+            timing.status, timing.bytes = 200, 4096
+    registry.observe_retry_sleep(1.5)
+
+    text = registry.to_prometheus(success=True)
+
+    assert 'mfdl_requests_total{stage="image",status="503"} 1' in text
+    assert 'mfdl_requests_total{stage="image",status="200"} 1' in text
+    assert 'mfdl_request_attempts_total{stage="image",attempt="2"} 1' in text
+    assert 'mfdl_response_bytes_total{stage="image"} 4096' in text
+    assert 'mfdl_request_seconds_count{stage="image",phase="total"} 2' in text
+    assert 'mfdl_request_seconds_count{stage="image",phase="ttfb"} 1' in text
+    assert 'phase="connect"' not in text
+    assert 'mfdl_retry_sleep_seconds_bucket{le="1"} 0' in text
+    assert 'mfdl_retry_sleep_seconds_bucket{le="2.5"} 1' in text
+    assert "mfdl_run_success 1" in text
+    assert registry.to_json()["stages"]["image"]["requests"] == {"200": 1, "503": 1}
+
+
+@pytest.mark.parametrize("engine", ["thread", "async"])
+def test_download_records_metrics_per_stage(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path, engine: str
+) -> None:
+    monkeypatch.setattr(mfdl, "METRICS", mfdl.MetricsRegistry())
+    config = FakeFanfoxConfig(chapters=2, pages=3, image_size=4096, mode="mixed")
+
+    run_profile("aggressive", config, engine=engine, unpaced=True)
+    mfdl.export_metrics(tmp_path / "run.json", tmp_path / "run.prom", True)
+
+    stages = mfdl.json.loads((tmp_path / "run.json").read_text())["stages"]
+    assert stages["series"]["requests"] == {"200": 1}
+    assert stages["image"]["requests"] == {"200": 6}
+    assert stages["image"]["bytes"] == 6 * 4096
+    assert stages["chapterfun"]["requests"]["200"] >= 1
+    assert stages["page"]["seconds"]["ttfb"]["count"] >= 1
+    assert "throttle" not in stages["image"]["seconds"]
+    assert set(stages) == {"series", "page", "chapterfun", "image"}
+    assert (
+        'mfdl_requests_total{stage="image",status="200"} 6' in (tmp_path / "run.prom").read_text()
+    )
+
+
+def test_export_metrics_warns_instead_of_raising_on_write_errors(
+    tmp_path: Path, capsys: pytest.CaptureFixture[str]
+) -> None:
+    mfdl.export_metrics(tmp_path / "missing" / "run.json", None, True)
+
+    assert "Warning: unable to write metrics:" in capsys.readouterr().out
+
+
+def test_run_profiler_writes_pstats_steps_and_speedscope(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path, capsys: pytest.CaptureFixture[str]
+) -> None:
+    monkeypatch.setattr(mfdl, "METRICS", mfdl.MetricsRegistry())
+    config = FakeFanfoxConfig(chapters=2, pages=3, image_size=4096, latency=0.01, mode="mixed")
+    profiler = mfdl.RunProfiler(tmp_path / "run.prof", sample_interval=0.002)
+
+    profiler.start()
+    try:
+        run_profile("aggressive", config, unpaced=True)
+    finally:
+        profiler.stop()
+
+    functions = set(pstats.Stats(str(tmp_path / "run.prof")).get_stats_profile().func_profiles)
+    assert {"download_manga", "stream_page_content"} <= functions
+    steps = mfdl.json.loads((tmp_path / "run.prof.steps.json").read_text())["steps"]
+    assert {"get_chapter_urls", "get_chapter_image_urls", "download_urls"} <= set(steps)
+    assert steps["download_urls"]["count"] == 2
+    speedscope = mfdl.json.loads((tmp_path / "run.prof.speedscope.json").read_text())
+    assert speedscope["profiles"] and speedscope["shared"]["frames"]
+    assert all(
+        len(profile["samples"]) == len(profile["weights"]) for profile in speedscope["profiles"]
+    )
+    assert "CPU profile written to" in capsys.readouterr().out
+
+
+def test_timed_generator_leaves_out_time_suspended_at_yield(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(mfdl, "METRICS", mfdl.MetricsRegistry())
+
+    @mfdl.timed_generator("resolve")
+    def resolve() -> Iterator[int]:
+        for item in range(2):
+            time.sleep(0.01)
+            yield item
+
+    for _ in resolve():
+        time.sleep(0.1)
+
+    step = mfdl.METRICS.steps["resolve"].to_json()
+    assert step["count"] == 1
+    assert 0.02 <= step["sum"] < 0.1
+
+
+def test_nested_steps_are_left_out_of_the_step_that_runs_them(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(mfdl, "METRICS", mfdl.MetricsRegistry())
+
+    @mfdl.timed_generator("desktop")
+    def resolve_desktop() -> Iterator[int]:
+        time.sleep(0.05)
+        yield 1
+
+    @mfdl.timed_generator("resolve")
+    def resolve() -> Iterator[int]:
+        time.sleep(0.01)
+        yield 0
+        yield from resolve_desktop()
+
+    @mfdl.timed_step("download")
+    def download() -> None:
+        for _ in resolve():
+            time.sleep(0.02)
+
+    download()
+
+    steps = {name: hist.to_json()["sum"] for name, hist in mfdl.METRICS.steps.items()}
+    assert 0.05 <= steps["desktop"] < 0.1
+    assert 0.01 <= steps["resolve"] < 0.05
+    assert 0.04 <= steps["download"] < 0.09